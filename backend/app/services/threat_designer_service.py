@@ -6,6 +6,7 @@ import uuid
 
 import boto3
 from aws_lambda_powertools import Logger, Tracer
+from boto3.dynamodb.conditions import Key
 from botocore.config import Config
 from botocore.exceptions import ClientError
 from exceptions.exceptions import (InternalError, NotFoundError,
@@ -16,6 +17,7 @@ STATE = os.environ.get("JOB_STATUS_TABLE")
 FUNCTION = os.environ.get("THREAT_MODELING_LAMBDA")
 AGENT_TABLE = os.environ.get("AGENT_STATE_TABLE")
 AGENT_TRAIL_TABLE = os.environ.get("AGENT_TRAIL_TABLE")
+CHECKPOINT_TABLE = os.environ.get("CHECKPOINT_TABLE")
 ARCHITECTURE_BUCKET = os.environ.get("ARCHITECTURE_BUCKET")
 REGION = os.environ.get("REGION")
 dynamodb = boto3.resource("dynamodb")
@@ -205,6 +207,35 @@ def delete_dynamodb_item(table, key, owner):
         raise
 
 
+def delete_checkpoints(job_id):
+    """
+    Delete the workflow checkpoints of a job
+
+    Parameters:
+    job_id (str): Job whose checkpoints, writes and chunks are deleted
+    """
+    if not CHECKPOINT_TABLE:
+        return
+
+    checkpoint_table = dynamodb.Table(CHECKPOINT_TABLE)
+    kwargs = {
+        "KeyConditionExpression": Key("thread_id").eq(job_id),
+        "ProjectionExpression": "sk",
+    }
+    try:
+        with checkpoint_table.batch_writer() as batch:
+            while True:
+                response = checkpoint_table.query(**kwargs)
+                for item in response.get("Items", []):
+                    batch.delete_item(Key={"thread_id": job_id, "sk": item["sk"]})
+                if "LastEvaluatedKey" not in response:
+                    break
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    except ClientError as e:
+        # Checkpoints also expire through their TTL
+        LOG.warning(f"Error deleting checkpoints of job {job_id}: {e}")
+
+
 @tracer.capture_method
 def invoke_lambda(owner, payload):
     s3_location = payload.get("s3_location")
@@ -218,6 +249,18 @@ def invoke_lambda(owner, payload):
     assumptions = payload.get("assumptions", [])
     title = payload.get("title", " ")
     try:
+        agent_state = {
+            "job_id": id,
+            "s3_location": s3_location,
+            "owner": owner,
+            "title": title,
+            "retry": reasoning,
+        }
+        # Written before invoking, a job served from cache completes right away
+        if not payload.get("replay", False):
+            create_dynamodb_item(agent_state, AGENT_TABLE)
+        item = {"id": id, "state": "START", "owner": owner}
+        table.put_item(Item=item)
         lambda_client.invoke(
             FunctionName=FUNCTION,
             InvocationType="Event",
@@ -232,20 +275,10 @@ def invoke_lambda(owner, payload):
                     "owner": owner,
                     "title": title,
                     "replay": payload.get("replay", False),
+                    "bypass_cache": payload.get("bypass_cache", False),
                 }
             ),
         )
-        agent_state = {
-            "job_id": id,
-            "s3_location": s3_location,
-            "owner": owner,
-            "title": title,
-            "retry": reasoning,
-        }
-        if not payload.get("replay", False):
-            create_dynamodb_item(agent_state, AGENT_TABLE)
-        item = {"id": id, "state": "START", "owner": owner}
-        table.put_item(Item=item)
         return {"id": id}
     except Exception as e:
         LOG.error(e)
@@ -409,6 +442,7 @@ def delete_tm(job_id, owner):
             raise InternalError()
         delete_dynamodb_item(table, key, owner)
         delete_s3_object(object_key)
+        delete_checkpoints(job_id)
         return {"job_id": job_id, "state": "Deleted"}
     except Exception as e:
         LOG.error(e)
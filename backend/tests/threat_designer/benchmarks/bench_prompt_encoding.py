@@ -0,0 +1,159 @@
+"""Token-count comparison of the prompt encodings of a threat catalog.
+
+Encodes synthetic assets, flows and threats with the compact formats used in
+prompts and with the pydantic ``repr`` they replace, and reports the savings
+of each part and of a whole gap analysis message. Two counts are reported:
+the character-based estimate of the rate limiter, and the number of words and
+punctuation marks, closer to how tokenizers split these formats.
+
+Usage: python bench_prompt_encoding.py [--threats 40 150 400]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+
+os.environ.setdefault("AGENT_STATE_TABLE", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "threat_designer")
+)
+
+# isort: off
+from message_builder import (  # noqa: E402
+    MessageBuilder,
+    format_assets,
+    format_flows,
+    format_threats,
+)
+from rate_limiter import estimate_tokens  # noqa: E402
+from state import AssetsList, FlowsList, ThreatsList  # noqa: E402
+
+# isort: on
+
+WORDS = (
+    "attacker database credentials session token api gateway user service "
+    "encrypt access unauthorized data storage network request validation "
+    "injection privilege logs audit"
+).split()
+STRIDE = [
+    "Spoofing",
+    "Tampering",
+    "Repudiation",
+    "Information Disclosure",
+    "Denial of Service",
+    "Elevation of Privilege",
+]
+
+
+def make_catalog(threats: int, seed: int = 0):
+    """Assets, flows and threats of a model with ``threats`` threats."""
+    rng = random.Random(seed)
+    components = max(threats // 8, 4)
+    flows = max(threats // 4, 3)
+
+    def text(words: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    assets = AssetsList(
+        assets=[
+            {
+                "type": rng.choice(["Asset", "Entity"]),
+                "name": f"Component {i}",
+                "description": text(12),
+            }
+            for i in range(components)
+        ]
+    )
+    flows = FlowsList(
+        data_flows=[
+            {
+                "flow_description": text(15),
+                "source_entity": f"Component {i % components}",
+                "target_entity": f"Component {(i + 1) % components}",
+            }
+            for i in range(flows)
+        ],
+        trust_boundaries=[
+            {
+                "purpose": text(8),
+                "source_entity": f"Component {i % components}",
+                "target_entity": f"Component {(i + 2) % components}",
+            }
+            for i in range(flows // 3)
+        ],
+        threat_sources=[
+            {"category": category, "description": text(10), "example": text(6)}
+            for category in ["External", "Insider", "Supply chain"]
+        ],
+    )
+    threats = ThreatsList(
+        threats=[
+            {
+                "name": f"Threat {i} {text(3)}",
+                "stride_category": STRIDE[i % len(STRIDE)],
+                "description": text(40),
+                "target": f"Component {i % components}",
+                "impact": text(10),
+                "likelihood": rng.choice(["Low", "Medium", "High"]),
+                "mitigations": [text(8) for _ in range(3)],
+            }
+            for i in range(threats)
+        ]
+    )
+    return assets, flows, threats
+
+
+def pieces(text: str) -> int:
+    """Number of words and punctuation marks of a text."""
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def message_text(message) -> str:
+    return "".join(part["text"] for part in message.content if "text" in part)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threats", type=int, nargs="+", default=[40, 150, 400])
+    args = parser.parse_args()
+
+    builder = MessageBuilder("", "description", "assumptions")
+    print(
+        f"{'threats':>7} {'part':>8} {'estimate repr':>14} {'compact':>8} {'saved':>6}"
+        f" {'pieces repr':>12} {'compact':>8} {'saved':>6}"
+    )
+    for count in args.threats:
+        assets, flows, threats = make_catalog(count)
+        rows = [
+            ("assets", str(assets), format_assets(assets)),
+            ("flows", str(flows), format_flows(flows)),
+            ("threats", str(threats), format_threats(threats)),
+            (
+                "gap msg",
+                message_text(
+                    builder.create_gap_analysis_message(
+                        str(assets), str(flows), str(threats), ["gap"]
+                    )
+                ),
+                message_text(
+                    builder.create_gap_analysis_message(assets, flows, threats, ["gap"])
+                ),
+            ),
+        ]
+        for part, verbose, compact in rows:
+            estimate_before = estimate_tokens([verbose])
+            estimate_after = estimate_tokens([compact])
+            pieces_before, pieces_after = pieces(verbose), pieces(compact)
+            print(
+                f"{count:>7} {part:>8} {estimate_before:>14} {estimate_after:>8}"
+                f" {1 - estimate_after / estimate_before:>6.0%}"
+                f" {pieces_before:>12} {pieces_after:>8}"
+                f" {1 - pieces_after / pieces_before:>6.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
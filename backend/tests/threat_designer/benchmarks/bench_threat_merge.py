@@ -0,0 +1,99 @@
+"""Micro-benchmark of the threat_list reducer.
+
+Merges iterations of synthetic threats, with and without near-duplicate
+detection. The append-only accumulator is compared with rebuilding the whole
+collection on every merge, which re-validates and re-indexes every threat
+already accumulated.
+
+Usage: python bench_threat_merge.py [--iterations 15] [--threats 30]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("AGENT_STATE_TABLE", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "threat_designer")
+)
+
+# isort: off
+import state  # noqa: E402
+from state import Threat, ThreatAccumulator, ThreatsList  # noqa: E402
+from state import merge_threat_lists  # noqa: E402
+
+# isort: on
+
+STRIDE = ["Spoofing", "Tampering", "Repudiation", "Information Disclosure"]
+
+
+def make_batches(iterations: int, per_iteration: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(3000)]
+    batches = []
+    for iteration in range(iterations):
+        threats = []
+        for offset in range(per_iteration):
+            index = iteration * per_iteration + offset
+            threats.append(
+                Threat(
+                    name=f"Threat {index} " + " ".join(rng.sample(words, 3)),
+                    stride_category=STRIDE[index % len(STRIDE)],
+                    description=" ".join(rng.sample(words, 40)),
+                    target=f"Component {index % 7}",
+                    impact="impact",
+                    likelihood="High",
+                    mitigations=["first mitigation", "second mitigation"],
+                )
+            )
+        batches.append(ThreatsList(threats=threats))
+    return batches
+
+
+def append_only(value, batch):
+    return merge_threat_lists(value, batch)
+
+
+def rebuild(value, batch):
+    return ThreatAccumulator(threats=[*value.threats, *batch.threats])
+
+
+def run(merge, batches, repeats: int):
+    """Best total and last merge duration over ``repeats`` runs, in seconds."""
+    best_total = best_last = None
+    for _ in range(repeats):
+        value = ThreatAccumulator()
+        durations = []
+        for batch in batches:
+            start = time.perf_counter()
+            value = merge(value, batch)
+            durations.append(time.perf_counter() - start)
+        if best_total is None or sum(durations) < best_total:
+            best_total, best_last = sum(durations), durations[-1]
+    return best_total, best_last, len(value)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=15)
+    parser.add_argument("--threats", type=int, default=30)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    batches = make_batches(args.iterations, args.threats)
+    print(f"{args.iterations} merges of {args.threats} threats, best of {args.repeats}")
+    for dedup in (True, False):
+        state.config.threat_dedup_enabled = dedup
+        for name, merge in (("rebuild", rebuild), ("append-only", append_only)):
+            total, last, count = run(merge, batches, args.repeats)
+            print(
+                f"dedup={'on' if dedup else 'off':3} {name:12} total={total * 1000:8.1f} ms"
+                f" last merge={last * 1000:7.2f} ms threats={count}"
+            )
+
+
+if __name__ == "__main__":
+    main()
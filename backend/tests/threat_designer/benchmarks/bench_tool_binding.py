@@ -0,0 +1,71 @@
+"""Micro-benchmark of the tool bindings of structured model calls.
+
+Compares binding the tool classes on every call, which converts them to
+function declarations each time, with the bindings reused by ModelService.
+
+Usage: python bench_tool_binding.py [--calls 200] [--repeats 5]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+os.environ.setdefault("AGENT_STATE_TABLE", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "..", "..", "..", "threat_designer")
+)
+
+# isort: off
+from langchain_google_genai import ChatGoogleGenerativeAI  # noqa: E402
+from model_service import ModelService  # noqa: E402
+from state import (  # noqa: E402
+    AssetsList,
+    ContinueThreatModeling,
+    FlowsList,
+    SummaryState,
+    ThreatsList,
+)
+
+# isort: on
+
+TOOLS = [AssetsList, FlowsList, ThreatsList, ContinueThreatModeling, SummaryState]
+
+
+def per_call(statement, calls: int, repeats: int) -> float:
+    """Best duration of one call over ``repeats`` runs, in microseconds."""
+    return min(timeit.repeat(statement, number=calls, repeat=repeats)) / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    # No request is sent, binding only builds the function declarations
+    model = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+    service = ModelService()
+    print(f"{args.calls} bindings per tool, best of {args.repeats}")
+    for tool in TOOLS:
+        before = per_call(
+            lambda: model.bind_tools([tool], tool_choice="any"),
+            args.calls,
+            args.repeats,
+        )
+        service._bind_tools(model, [tool], "any")
+        after = per_call(
+            lambda: service._bind_tools(model, [tool], "any"),
+            args.calls,
+            args.repeats,
+        )
+        print(
+            f"{tool.__name__:24} bind_tools={before:8.1f} us"
+            f" reused={after:6.2f} us per call"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Shared fixtures of the threat designer tests.
+
+The Lambda modules import each other as top-level modules, so their directory
+is put on the path the way the Lambda runtime does.
+"""
+
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("AGENT_STATE_TABLE", "test-agent-state")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "..", "threat_designer"),
+)
+
+
+@pytest.fixture
+def dynamodb():
+    """DynamoDB resource backed by moto."""
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+
+    with moto.mock_aws():
+        yield boto3.resource("dynamodb", region_name="us-east-1")
@@ -0,0 +1,125 @@
+"""Tests of the deadlines and hedging of model calls."""
+
+import asyncio
+import contextvars
+import time
+
+import call_policy
+import pytest
+from call_policy import CallPolicy, start_deadline
+from config import ThreatModelingConfig
+from constants import CALL_DEADLINE_MARGIN_SECONDS, HEDGE_MIN_SAMPLES
+from exceptions import ModelTimeoutError, is_transient
+
+STAGE = "threats"
+USUAL_LATENCY = 0.05
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    monkeypatch.setattr(call_policy, "HEDGE_MIN_DELAY_SECONDS", 0.0)
+    policy = CallPolicy(ThreatModelingConfig(hedging_enabled=True))
+    policy.default_target = 2.0
+    policy.stage_targets = {}
+    for _ in range(HEDGE_MIN_SAMPLES):
+        policy.latencies.record(STAGE, USUAL_LATENCY)
+    return policy
+
+
+class FakeCalls:
+    """Calls answering ``results`` in order, each after its delay."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.started = []
+        self.cancelled = []
+
+    async def __call__(self):
+        index = len(self.started)
+        self.started.append(time.monotonic())
+        delay, result = self.results[index]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(index)
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_hedge_delay_follows_the_latency_quantile(policy):
+    assert policy.hedge_delay(STAGE) == USUAL_LATENCY
+    assert policy.hedge_delay("unseen") is None
+
+    policy.default_target = 0.04
+    assert policy.hedge_delay(STAGE) == pytest.approx(0.02)
+
+    policy.hedging_enabled = False
+    assert policy.hedge_delay(STAGE) is None
+
+
+def test_fast_call_is_not_hedged(policy):
+    calls = FakeCalls((0, "first"))
+
+    assert asyncio.run(policy.run(STAGE, calls)) == "first"
+    assert len(calls.started) == 1
+
+
+def test_slow_call_is_hedged_after_the_delay_and_cancelled(policy):
+    calls = FakeCalls((10, "first"), (0, "hedge"))
+
+    assert asyncio.run(policy.run(STAGE, calls)) == "hedge"
+    assert calls.started[1] - calls.started[0] >= USUAL_LATENCY
+    assert calls.cancelled == [0]
+
+
+def test_rejected_hedge_waits_for_the_first_call(policy):
+    calls = FakeCalls((0.2, "first"), (0, "empty"))
+
+    result = asyncio.run(policy.run(STAGE, calls, accept=lambda r: r != "empty"))
+
+    assert result == "first"
+    assert len(calls.started) == 2
+
+
+def test_rejected_result_is_returned_when_none_is_accepted(policy):
+    calls = FakeCalls((0.1, "empty"), (0.1, "empty"))
+
+    assert asyncio.run(policy.run(STAGE, calls, accept=lambda r: False)) == "empty"
+
+
+def test_failed_hedge_waits_for_the_first_call(policy):
+    calls = FakeCalls((0.2, "first"), (0, ConnectionError("reset")))
+
+    assert asyncio.run(policy.run(STAGE, calls)) == "first"
+
+
+def test_hedges_are_capped_to_a_share_of_the_calls(policy):
+    asyncio.run(policy.run(STAGE, FakeCalls((0.1, "first"), (0, "hedge"))))
+
+    calls = FakeCalls((0.1, "first"), (0, "hedge"))
+    assert asyncio.run(policy.run(STAGE, calls)) == "first"
+    assert len(calls.started) == 1
+
+
+def test_call_missing_its_deadline_times_out(policy):
+    policy.hedging_enabled = False
+    policy.default_target = 0.1
+    calls = FakeCalls((10, "first"))
+
+    with pytest.raises(ModelTimeoutError) as raised:
+        asyncio.run(policy.run(STAGE, calls))
+
+    assert is_transient(raised.value)
+    assert calls.cancelled == [0]
+
+
+def test_timeout_is_cut_short_by_the_invocation_deadline(policy):
+    def timeout():
+        start_deadline(CALL_DEADLINE_MARGIN_SECONDS + 0.5)
+        return policy.timeout(STAGE)
+
+    # The deadline is set in a copy of the context, like an invocation's
+    assert contextvars.copy_context().run(timeout) == pytest.approx(0.5, abs=0.05)
+    assert policy.timeout(STAGE) == 2.0
@@ -0,0 +1,141 @@
+"""Tests of the DynamoDB checkpoint saver."""
+
+import random
+
+import checkpointer as checkpointer_module
+import pytest
+from checkpointer import DynamoDBSaver
+from langgraph.checkpoint.base import empty_checkpoint
+
+TABLE_NAME = "test-checkpoints"
+
+
+@pytest.fixture
+def saver(dynamodb, monkeypatch):
+    monkeypatch.setattr(checkpointer_module, "CHECKPOINT_CHUNK_BYTES", 1024)
+    dynamodb.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[
+            {"AttributeName": "thread_id", "KeyType": "HASH"},
+            {"AttributeName": "sk", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "thread_id", "AttributeType": "S"},
+            {"AttributeName": "sk", "AttributeType": "S"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return DynamoDBSaver(TABLE_NAME, ttl_hours=1, region_name="us-east-1")
+
+
+def _config(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def _put(saver, thread_id, parent=None, **values):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = values
+    return saver.put(
+        _config(thread_id, parent),
+        checkpoint,
+        {"source": "loop", "step": len(values)},
+        {},
+    )
+
+
+def _items(saver, thread_id):
+    return saver.table.query(
+        KeyConditionExpression="thread_id = :thread_id",
+        ExpressionAttributeValues={":thread_id": thread_id},
+    )["Items"]
+
+
+def test_latest_checkpoint_round_trips(saver):
+    first = _put(saver, "job-1", summary="first")
+    second = _put(
+        saver, "job-1", parent=first["configurable"]["checkpoint_id"], summary="second"
+    )
+
+    latest = saver.get_tuple(_config("job-1"))
+
+    assert latest.config == second
+    assert latest.checkpoint["channel_values"] == {"summary": "second"}
+    assert latest.parent_config["configurable"]["checkpoint_id"] == (
+        first["configurable"]["checkpoint_id"]
+    )
+    assert saver.get_tuple(_config("job-2")) is None
+
+
+def test_payload_above_chunk_size_is_split_and_reassembled(saver):
+    # Random text does not compress below the chunk size
+    rng = random.Random(0)
+    text = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(20000))
+
+    config = _put(saver, "job-1", description=text)
+
+    chunk_items = [
+        item for item in _items(saver, "job-1") if item["sk"].startswith("chunk#")
+    ]
+    checkpoint_item = next(
+        item for item in _items(saver, "job-1") if item["sk"].startswith("checkpoint#")
+    )
+    assert len(chunk_items) > 1
+    assert int(checkpoint_item["chunks"]) == len(chunk_items) + 1
+    assert all(len(bytes(item["value"])) <= 1024 for item in chunk_items)
+
+    restored = saver.get_tuple(config)
+    assert restored.checkpoint["channel_values"]["description"] == text
+
+
+def test_put_writes_are_returned_in_task_and_index_order(saver):
+    config = _put(saver, "job-1", summary="s")
+
+    saver.put_writes(config, [("assets", "a0"), ("flows", "f1")], "task-b")
+    saver.put_writes(config, [("threats", "t0")], "task-a")
+    # Regular writes are only recorded once
+    saver.put_writes(config, [("assets", "changed")], "task-b")
+
+    pending = saver.get_tuple(config).pending_writes
+
+    assert pending == [
+        ("task-a", "threats", "t0"),
+        ("task-b", "assets", "a0"),
+        ("task-b", "flows", "f1"),
+    ]
+
+
+def test_list_is_newest_first_and_honours_before_and_limit(saver):
+    ids = []
+    parent = None
+    for step in range(3):
+        config = _put(saver, "job-1", parent=parent, step=str(step))
+        parent = config["configurable"]["checkpoint_id"]
+        ids.append(parent)
+
+    listed = [
+        item.config["configurable"]["checkpoint_id"]
+        for item in saver.list(_config("job-1"))
+    ]
+    assert listed == ids[::-1]
+
+    before = list(
+        saver.list(_config("job-1"), before=_config("job-1", ids[2]), limit=1)
+    )
+    assert [item.config["configurable"]["checkpoint_id"] for item in before] == [ids[1]]
+
+
+def test_delete_thread_removes_every_item_of_the_thread(saver):
+    rng = random.Random(1)
+    text = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(20000))
+    config = _put(saver, "job-1", description=text)
+    saver.put_writes(config, [("assets", text)], "task-a")
+    _put(saver, "job-2", summary="kept")
+
+    saver.delete_thread("job-1")
+
+    assert _items(saver, "job-1") == []
+    assert saver.get_tuple(_config("job-1")) is None
+    assert saver.get_tuple(_config("job-2")) is not None
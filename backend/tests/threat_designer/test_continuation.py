@@ -0,0 +1,119 @@
+"""Tests of the hand-over of long jobs to a new invocation."""
+
+import asyncio
+from datetime import datetime
+
+import continuation
+import pytest
+from config import ThreatModelingConfig
+from continuation import ContinuationPlanner
+
+MARGIN = 45
+
+
+class FakeContext:
+    """Lambda context with a settable remaining time."""
+
+    function_name = "threat-designer"
+    aws_request_id = "request-1"
+
+    def __init__(self, remaining_seconds):
+        self.remaining_seconds = remaining_seconds
+
+    def get_remaining_time_in_millis(self):
+        return int(self.remaining_seconds * 1000)
+
+
+@pytest.fixture
+def invocations(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        continuation,
+        "invoke_lambda_async",
+        lambda function_name, payload: calls.append((function_name, payload)),
+    )
+    return calls
+
+
+def planner(remaining_seconds, event=None, **config):
+    config.setdefault("continuation_margin_seconds", MARGIN)
+    return ContinuationPlanner(
+        FakeContext(remaining_seconds), ThreatModelingConfig(**config), event or {}
+    )
+
+
+def test_hands_over_when_the_next_step_could_outlive_the_invocation():
+    event = {"max_step_seconds": 100.0}
+
+    assert not planner(146, event).should_hand_over()
+    assert not planner(145, event).should_hand_over()
+    assert planner(144, event).should_hand_over()
+
+
+def test_margin_alone_applies_before_any_step():
+    assert not planner(MARGIN + 1).should_hand_over()
+    assert planner(MARGIN - 1).should_hand_over()
+
+
+def test_longest_step_is_kept(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(continuation.time, "monotonic", lambda: now[0])
+    plan = planner(200)
+
+    for duration in (30.0, 160.0, 10.0):
+        now[0] += duration
+        plan.record_step()
+
+    assert plan.max_step_seconds == 160.0
+    assert plan.should_hand_over()
+
+
+def test_continuations_are_capped():
+    event = {"max_step_seconds": 100.0}
+
+    assert planner(10, {**event, "continuation": 3}).should_hand_over()
+    assert not planner(10, {**event, "continuation": 4}).should_hand_over()
+    assert not planner(10, event, max_continuations=0).should_hand_over()
+
+
+def test_disabled_or_outside_lambda_never_hands_over():
+    assert not planner(0, continuation_enabled=False).should_hand_over()
+
+    plan = ContinuationPlanner(object(), ThreatModelingConfig(), {})
+    assert plan.remaining_seconds() is None
+    assert not plan.should_hand_over()
+
+
+def test_hand_over_resumes_the_job_in_a_new_invocation(invocations):
+    event = {"id": "job-1", "continuation": 1, "max_step_seconds": 12.3456}
+    start_time = datetime(2026, 1, 2, 3, 4, 5)
+    accounting = {"calls": 7}
+
+    asyncio.run(planner(30, event).hand_over(event, start_time, accounting))
+
+    assert invocations == [
+        (
+            "threat-designer",
+            {
+                "id": "job-1",
+                "resume": True,
+                "continuation": 2,
+                "start_time": "2026-01-02T03:04:05",
+                "max_step_seconds": 12.346,
+                "accounting": {"calls": 7},
+            },
+        )
+    ]
+
+
+def test_hand_over_targets_the_invoked_function_arn(invocations):
+    context = FakeContext(30)
+    context.invoked_function_arn = "arn:aws:lambda:us-east-1:123:function:td"
+    plan = ContinuationPlanner(context, ThreatModelingConfig(), {})
+
+    asyncio.run(plan.hand_over({"id": "job-1"}, datetime(2026, 1, 1)))
+
+    function_name, payload = invocations[0]
+    assert function_name == context.invoked_function_arn
+    assert payload["continuation"] == 1
+    assert payload["accounting"] is None
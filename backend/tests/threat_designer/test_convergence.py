@@ -0,0 +1,120 @@
+"""Tests of the asset/STRIDE coverage and the gap analysis early stop."""
+
+import asyncio
+
+from config import ThreatModelingConfig
+from nodes import GapAnalysisService
+from state import AssetsList, ConvergenceState, Threat, ThreatAccumulator
+
+ASSETS = AssetsList(
+    assets=[
+        {"type": "Asset", "name": "Orders Database", "description": "Orders"},
+        {"type": "Entity", "name": "Web Server", "description": "Frontend"},
+    ]
+)
+
+
+def _threat(name: str, target: str, stride: str = "Tampering") -> Threat:
+    return Threat(
+        name=name,
+        stride_category=stride,
+        description=f"{name} against {target}",
+        target=target,
+        impact="Data loss",
+        likelihood="High",
+        mitigations=["Validate input", "Restrict access"],
+    )
+
+
+def _catalog(*threats: Threat) -> ThreatAccumulator:
+    return ThreatAccumulator(threats=list(threats))
+
+
+def test_targets_are_mapped_to_assets():
+    catalog = _catalog(
+        _threat("SQL injection", "Orders Database"),
+        _threat("Backup tampering", "orders-database"),
+        _threat("Replica tampering", "Orders Database (RDS replica)"),
+        _threat("Defacement", "Web Servr"),
+    )
+
+    assert catalog.coverage(ASSETS) == {
+        ("Orders Database", "Tampering"),
+        ("Web Server", "Tampering"),
+    }
+
+
+def test_targets_naming_no_asset_cover_no_cell():
+    catalog = _catalog(_threat("Phishing", "Employees"))
+
+    assert catalog.coverage(ASSETS) == set()
+    assert catalog.coverage(None) == set()
+
+
+def _service(patience: int = 2) -> GapAnalysisService:
+    config = ThreatModelingConfig(
+        convergence_novelty_threshold=0.2, convergence_patience=patience
+    )
+    return GapAnalysisService(None, None, config, None)
+
+
+def _track(service, catalog, previous):
+    state = {"threat_list": catalog, "assets": ASSETS, "convergence": previous}
+    return service._track_convergence(state, "job")
+
+
+def test_first_round_sets_the_baseline():
+    catalog = _catalog(_threat("SQL injection", "Orders Database"))
+
+    convergence = _track(_service(), catalog, None)
+
+    assert convergence == ConvergenceState(threats_count=1, covered_cells=1)
+
+
+def test_round_adding_little_and_no_coverage_is_stale():
+    threats = [_threat(f"Injection {i}", "Orders Database") for i in range(10)]
+    previous = ConvergenceState(threats_count=9, covered_cells=1, stale_rounds=1)
+
+    convergence = _track(_service(), _catalog(*threats), previous)
+
+    assert convergence.stale_rounds == 2
+
+
+def test_reworded_target_is_no_coverage_gain():
+    threats = [_threat(f"Injection {i}", "Orders Database") for i in range(9)]
+    threats.append(_threat("Injection 9", "The orders database"))
+    previous = ConvergenceState(threats_count=9, covered_cells=1)
+
+    convergence = _track(_service(), _catalog(*threats), previous)
+
+    assert convergence.covered_cells == 1
+    assert convergence.stale_rounds == 1
+
+
+def test_new_cell_resets_the_stale_rounds():
+    threats = [_threat(f"Injection {i}", "Orders Database") for i in range(9)]
+    threats.append(_threat("Flood", "Web Server", "Denial of Service"))
+    previous = ConvergenceState(threats_count=9, covered_cells=1, stale_rounds=1)
+
+    convergence = _track(_service(), _catalog(*threats), previous)
+
+    assert convergence.covered_cells == 2
+    assert convergence.stale_rounds == 0
+
+
+def test_converged_catalog_finalizes_without_a_model_call():
+    threats = [_threat(f"Injection {i}", "Orders Database") for i in range(10)]
+    state = {
+        "job_id": "job",
+        "threat_list": _catalog(*threats),
+        "assets": ASSETS,
+        "convergence": ConvergenceState(
+            threats_count=10, covered_cells=1, stale_rounds=1
+        ),
+    }
+
+    # The services are None: any model call or image load would fail
+    command = asyncio.run(_service().analyze_gaps(state, {}))
+
+    assert command.goto == "finalize"
+    assert command.update["convergence"].stale_rounds == 2
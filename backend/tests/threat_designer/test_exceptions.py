@@ -0,0 +1,62 @@
+"""Tests of the classification of transient errors."""
+
+import google.api_core.exceptions
+import pytest
+from botocore.exceptions import ClientError
+from exceptions import ModelInvocationError, ModelTimeoutError, is_transient
+from monitoring import with_error_context
+
+
+def _raise_from(error, cause):
+    try:
+        raise cause
+    except Exception as e:
+        raise error from e
+
+
+def _raise_during(error, context):
+    try:
+        raise context
+    except Exception:
+        raise error
+
+
+def _throttled():
+    return ClientError(
+        {"Error": {"Code": "ThrottlingException", "Message": "slow down"}}, "PutItem"
+    )
+
+
+def test_provider_and_aws_errors_are_classified():
+    assert is_transient(google.api_core.exceptions.ServiceUnavailable("overloaded"))
+    assert is_transient(_throttled())
+    assert is_transient(ModelTimeoutError("deadline"))
+    assert not is_transient(ValueError("bad request"))
+    assert not is_transient(
+        ClientError({"Error": {"Code": "ValidationException"}}, "PutItem")
+    )
+
+
+def test_wrapped_transient_error_is_transient():
+    with pytest.raises(ModelInvocationError) as raised:
+        _raise_from(ModelInvocationError("failed"), _throttled())
+
+    assert is_transient(raised.value)
+
+
+def test_error_raised_while_handling_a_transient_one_is_fatal():
+    with pytest.raises(ValueError) as raised:
+        _raise_during(ValueError("bug in the handler"), _throttled())
+
+    assert not is_transient(raised.value)
+
+
+def test_error_context_keeps_the_cause():
+    @with_error_context("model invocation")
+    def invoke():
+        _raise_from(ModelInvocationError("failed"), _throttled())
+
+    with pytest.raises(Exception) as raised:
+        invoke()
+
+    assert is_transient(raised.value)
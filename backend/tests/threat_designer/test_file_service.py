@@ -0,0 +1,66 @@
+"""Tests of the diagram upload against a stand-in file API."""
+
+import asyncio
+import base64
+from types import SimpleNamespace
+
+import file_service
+import pytest
+from config import ThreatModelingConfig
+from file_service import ImageFileService
+
+IMAGE = base64.b64encode(b"diagram").decode()
+URI = "https://generativelanguage.googleapis.com/v1beta/files/abc123"
+
+
+@pytest.fixture
+def file_api(monkeypatch):
+    calls = {"uploaded": [], "deleted": []}
+
+    def upload_file(file, mime_type, display_name, resumable):
+        calls["uploaded"].append((file.read(), mime_type, display_name))
+        return SimpleNamespace(uri=URI)
+
+    monkeypatch.setattr(file_service.genai, "upload_file", upload_file)
+    monkeypatch.setattr(file_service.genai, "delete_file", calls["deleted"].append)
+    return calls
+
+
+def _service(enabled: bool = True) -> ImageFileService:
+    return ImageFileService(ThreatModelingConfig(image_upload_enabled=enabled))
+
+
+def test_upload_returns_the_file_uri(file_api):
+    uri = asyncio.run(_service().upload("job", IMAGE, "image/png"))
+
+    assert uri == URI
+    assert file_api["uploaded"] == [(b"diagram", "image/png", "job")]
+
+
+def test_disabled_upload_sends_the_image_inline(file_api):
+    assert asyncio.run(_service(enabled=False).upload("job", IMAGE)) is None
+    assert file_api["uploaded"] == []
+
+
+def test_failed_upload_sends_the_image_inline(monkeypatch):
+    def upload_file(*args, **kwargs):
+        raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(file_service.genai, "upload_file", upload_file)
+
+    assert asyncio.run(_service().upload("job", IMAGE)) is None
+
+
+def test_delete_uses_the_file_name(file_api):
+    asyncio.run(_service().delete("job", URI))
+
+    assert file_api["deleted"] == ["files/abc123"]
+
+
+def test_failed_delete_is_swallowed(monkeypatch):
+    def delete_file(name):
+        raise RuntimeError("not found")
+
+    monkeypatch.setattr(file_service.genai, "delete_file", delete_file)
+
+    asyncio.run(_service().delete("job", URI))
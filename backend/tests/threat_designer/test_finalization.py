@@ -0,0 +1,76 @@
+"""Tests of the finalize node."""
+
+import asyncio
+
+import nodes
+import pytest
+from nodes import WorkflowFinalizationService
+
+
+class FakeStateService:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    async def update_job_state(self, job_id, state, accounting=None):
+        self.calls.append(state)
+
+    async def finalize_workflow(self, state):
+        if self.fail:
+            raise ConnectionError("throttled")
+        self.calls.append("results")
+
+
+class FakeResources:
+    """Prompt cache and file service recording the releases."""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def release(self, job_id):
+        self.calls.append("release")
+
+    async def delete(self, job_id, uri):
+        self.calls.append("delete")
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(nodes, "FINALIZATION_SLEEP_SECONDS", 0)
+
+
+def _service(state_service):
+    resources = FakeResources(state_service.calls)
+    return WorkflowFinalizationService(
+        state_service, prompt_cache=resources, file_service=resources
+    )
+
+
+def test_resources_are_released_after_completion():
+    state_service = FakeStateService()
+
+    asyncio.run(
+        _service(state_service).finalize_workflow({"job_id": "job", "image_uri": "u"})
+    )
+
+    assert state_service.calls == [
+        "FINALIZE",
+        "results",
+        "COMPLETE",
+        "release",
+        "delete",
+    ]
+
+
+def test_failed_attempt_keeps_resources_for_the_retry():
+    state_service = FakeStateService(fail=True)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(
+            _service(state_service).finalize_workflow(
+                {"job_id": "job", "image_uri": "u"}
+            )
+        )
+
+    # FAILED is set by the handler once the retries are exhausted
+    assert state_service.calls == ["FINALIZE"]
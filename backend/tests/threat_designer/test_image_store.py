@@ -0,0 +1,39 @@
+"""Tests of the local image cache."""
+
+import os
+
+from image_store import ImageCache, StoredImage
+
+
+def _image(key: str, size: int = 100) -> StoredImage:
+    return StoredImage(image_hash=key, data="A" * size, mime_type="image/jpeg")
+
+
+def test_image_round_trips(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=1024)
+    cache.put(_image("a"))
+
+    assert cache.get("a") == _image("a")
+    assert cache.get("missing") is None
+
+
+def test_least_recently_used_image_is_evicted(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=250)
+    cache.put(_image("a"))
+    cache.put(_image("b"))
+    os.utime(tmp_path / "a", (0, 0))
+    cache.get("b")
+
+    cache.put(_image("c"))
+
+    assert cache.get("a") is None
+    assert cache.get("b") == _image("b")
+    assert cache.get("c") == _image("c")
+
+
+def test_image_evicted_by_another_process_is_a_miss(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=1024)
+    cache.put(_image("a"))
+    os.remove(tmp_path / "a")
+
+    assert cache.get("a") is None
@@ -0,0 +1,94 @@
+"""Tests of the routing of model calls along fallback chains."""
+
+import asyncio
+
+import google.api_core.exceptions
+import pytest
+from circuit_breaker import ModelRouter
+from config import ThreatModelingConfig
+from constants import (BREAKER_MIN_CALLS, BREAKER_STATE_CLOSED,
+                       BREAKER_STATE_HALF_OPEN, BREAKER_STATE_OPEN)
+from langchain_core.messages import AIMessage
+from model_service import ModelService
+
+
+class FakeModel:
+    """Chat model failing with ``error`` while it is set."""
+
+    def __init__(self, name: str, error: Exception = None):
+        self.model = f"models/{name}"
+        self.error = error
+        self.calls = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return AIMessage(content="ok")
+
+
+def _unavailable():
+    return google.api_core.exceptions.ServiceUnavailable("overloaded")
+
+
+def _route(service, models):
+    return asyncio.run(
+        service._ainvoke_routed(models[0], models, lambda model: model, ["hi"])
+    )
+
+
+@pytest.fixture
+def service():
+    return ModelService(router=ModelRouter(ThreatModelingConfig()))
+
+
+def _open(service, name):
+    breaker = service.router.breaker(name)
+    for _ in range(BREAKER_MIN_CALLS):
+        breaker.record(True, 0.0)
+    assert breaker.state == BREAKER_STATE_OPEN
+    return breaker
+
+
+def test_transient_failure_falls_back(service):
+    primary, backup = FakeModel("primary", _unavailable()), FakeModel("backup")
+
+    assert _route(service, [primary, backup]).content == "ok"
+    assert (primary.calls, backup.calls) == (1, 1)
+
+
+def test_fatal_error_is_not_recorded_as_healthy(service):
+    primary = FakeModel("primary", ValueError("bad request"))
+
+    for _ in range(BREAKER_MIN_CALLS):
+        with pytest.raises(ValueError):
+            _route(service, [primary])
+
+    breaker = service.router.breaker("primary")
+    assert breaker.state == BREAKER_STATE_CLOSED
+    assert not breaker._calls
+
+
+def test_fatal_error_ends_the_probe(service):
+    breaker = _open(service, "primary")
+    breaker.open_seconds = 0
+    primary = FakeModel("primary", ValueError("bad request"))
+
+    with pytest.raises(ValueError):
+        _route(service, [primary])
+
+    assert breaker.state == BREAKER_STATE_HALF_OPEN
+    assert breaker.allow()
+
+
+def test_refused_last_model_is_called_without_recording(service):
+    breaker = _open(service, "primary")
+    breaker.open_seconds = 0
+    # Another call is probing the model
+    assert breaker.allow()
+    primary = FakeModel("primary")
+
+    assert _route(service, [primary]).content == "ok"
+    assert primary.calls == 1
+    # Only the probe's outcome closes the breaker
+    assert breaker.state == BREAKER_STATE_HALF_OPEN
@@ -0,0 +1,57 @@
+"""Tests of the repair of malformed structured outputs."""
+
+import json
+
+import pytest
+from output_repair import RepairError, coerce_model
+from state import ContinueThreatModeling, ThreatsList
+
+THREAT = {
+    "name": "SQL injection",
+    "stride_category": "Tampering",
+    "description": "Crafted input alters queries",
+    "target": "Database",
+    "impact": "Data loss",
+    "likelihood": "High",
+    "mitigations": ["Parameterized queries", "Input validation"],
+}
+
+
+def test_threat_list_encoded_as_json_is_parsed():
+    result = coerce_model(ThreatsList, {"threats": json.dumps([THREAT, THREAT])})
+
+    assert len(result.threats) == 2
+
+
+def test_single_threat_encoded_as_json_object_is_one_item():
+    result = coerce_model(ThreatsList, {"threats": json.dumps(THREAT)})
+
+    assert [threat.name for threat in result.threats] == ["SQL injection"]
+
+
+def test_list_written_one_item_per_line_is_parsed():
+    threat = dict(THREAT, mitigations="- Parameterized queries\n- Input validation")
+
+    result = coerce_model(ThreatsList, {"threats": [threat]})
+
+    assert result.threats[0].mitigations == THREAT["mitigations"]
+
+
+def test_choice_spellings_are_canonicalized():
+    threat = dict(THREAT, stride_category="tampering", likelihood="high")
+
+    result = coerce_model(ThreatsList, {"threats": [threat]})
+
+    assert result.threats[0].stride_category == "Tampering"
+    assert result.threats[0].likelihood == "High"
+
+
+def test_boolean_string_is_parsed():
+    result = coerce_model(ContinueThreatModeling, {"stop": "False", "gap": "more"})
+
+    assert result.stop is False
+
+
+def test_unrepairable_output_raises():
+    with pytest.raises(RepairError):
+        coerce_model(ThreatsList, {"threats": "I cannot help with that"})
@@ -0,0 +1,172 @@
+"""Tests of the prompt prefix cache against a fake provider model."""
+
+import asyncio
+
+import google.api_core.exceptions
+import prompt_cache
+import pytest
+from config import ThreatModelingConfig
+from exceptions import ModelInvocationError, ModelTimeoutError
+from langchain_core.messages import HumanMessage, SystemMessage
+from model_service import ModelService
+from prompt_cache import PromptCache, is_cache_miss_error
+
+PREFIX = [HumanMessage(content="diagram")]
+
+
+class FakeModel:
+    """Provider model creating numbered cached contents."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.created = []
+
+    def create_cached_content(self, prefix, display_name, tools, tool_choice, ttl):
+        if self.fail:
+            raise RuntimeError("prefix below the minimum cacheable size")
+        self.created.append(display_name)
+        return f"cachedContents/{len(self.created)}"
+
+
+@pytest.fixture
+def deleted(monkeypatch):
+    names = []
+    monkeypatch.setattr(prompt_cache, "_delete_cached_content", names.append)
+    return names
+
+
+def _cache(enabled: bool = True) -> PromptCache:
+    return PromptCache(ThreatModelingConfig(prompt_cache_enabled=enabled))
+
+
+def test_content_is_created_once_per_stage():
+    cache, model = _cache(), FakeModel()
+
+    async def run():
+        names = await asyncio.gather(
+            *(
+                cache.acquire("job", "threats", model, PREFIX, [], None)
+                for _ in range(4)
+            )
+        )
+        gaps = await cache.acquire("job", "gaps", model, PREFIX, [], None)
+        return names, gaps
+
+    names, gaps = asyncio.run(run())
+
+    assert names == ["cachedContents/1"] * 4
+    assert gaps == "cachedContents/2"
+    assert model.created == ["job:threats", "job:gaps"]
+
+
+def test_failed_creation_sends_full_prompts(deleted):
+    cache, model = _cache(), FakeModel(fail=True)
+
+    name = asyncio.run(cache.acquire("job", "threats", model, PREFIX, [], None))
+    asyncio.run(cache.release("job"))
+
+    assert name is None
+    assert deleted == []
+
+
+def test_disabled_cache_creates_nothing():
+    cache, model = _cache(enabled=False), FakeModel()
+
+    assert asyncio.run(cache.acquire("job", "threats", model, PREFIX, [], None)) is None
+    assert model.created == []
+
+
+def test_release_deletes_the_job_contents(deleted):
+    cache, model = _cache(), FakeModel()
+    asyncio.run(cache.acquire("job", "threats", model, PREFIX, [], None))
+    asyncio.run(cache.acquire("other", "threats", model, PREFIX, [], None))
+
+    asyncio.run(cache.release("job"))
+    asyncio.run(cache.release("job"))
+
+    assert deleted == ["cachedContents/1"]
+    assert "job" not in cache._entries
+
+
+def test_invalidated_stage_is_deleted_and_not_recreated(deleted):
+    cache, model = _cache(), FakeModel()
+    asyncio.run(cache.acquire("job", "threats", model, PREFIX, [], None))
+
+    asyncio.run(cache.invalidate("job", "threats"))
+    name = asyncio.run(cache.acquire("job", "threats", model, PREFIX, [], None))
+    asyncio.run(cache.release("job"))
+
+    assert name is None
+    assert model.created == ["job:threats"]
+    assert deleted == ["cachedContents/1"]
+
+
+def test_cache_miss_errors_are_recognized():
+    expired = google.api_core.exceptions.PermissionDenied(
+        "CachedContent not found (or permission denied)"
+    )
+    try:
+        raise ModelInvocationError("model call failed") from expired
+    except ModelInvocationError as e:
+        wrapped = e
+
+    assert is_cache_miss_error(wrapped)
+    assert not is_cache_miss_error(
+        google.api_core.exceptions.PermissionDenied("API key not valid")
+    )
+    assert not is_cache_miss_error(ModelTimeoutError("deadline"))
+
+
+class FakeModelService(ModelService):
+    """Model service whose structured calls fail with the queued errors."""
+
+    def __init__(self, cache, errors):
+        super().__init__(prompt_cache=cache)
+        self.errors = errors
+        self.calls = []
+
+    async def invoke_structured_model(
+        self, messages, tools, config, reasoning=False, max_output_tokens=None, **kw
+    ):
+        self.calls.append(kw.get("cached_content"))
+        if self.errors:
+            raise self.errors.pop(0)
+        return "result"
+
+
+def _invoke_cached(service, model):
+    return asyncio.run(
+        service.invoke_cached_structured_model(
+            "job",
+            "threats",
+            SystemMessage(content="system"),
+            HumanMessage(content=[{"type": "text", "text": "prefix"}]),
+            HumanMessage(content=[{"type": "text", "text": "suffix"}]),
+            [],
+            {"configurable": {"model_main": model}},
+        )
+    )
+
+
+def test_missing_cached_content_falls_back_to_the_full_prompt(deleted):
+    cache, model = _cache(), FakeModel()
+    expired = google.api_core.exceptions.NotFound("Cached content expired")
+    service = FakeModelService(cache, [ModelInvocationError("failed")])
+    service.errors[0].__cause__ = expired
+
+    assert _invoke_cached(service, model) == "result"
+    assert service.calls == ["cachedContents/1", None]
+    assert deleted == ["cachedContents/1"]
+
+
+def test_transient_error_is_left_to_the_node_retry(deleted):
+    cache, model = _cache(), FakeModel()
+    service = FakeModelService(cache, [ModelTimeoutError("deadline")])
+
+    with pytest.raises(ModelTimeoutError):
+        _invoke_cached(service, model)
+
+    # The next attempt still uses the cached content
+    assert _invoke_cached(service, model) == "result"
+    assert service.calls == ["cachedContents/1", "cachedContents/1"]
+    assert deleted == []
@@ -0,0 +1,90 @@
+"""Tests of the compact prompt encoding of assets, flows and threats."""
+
+import re
+
+from constants import PROMPT_FIELD_SEPARATOR
+from message_builder import format_assets, format_flows, format_threats
+from state import AssetsList, FlowsList, ThreatsList
+
+# Share of the words and punctuation marks of the repr the encoding must save,
+# below the savings measured by benchmarks/bench_prompt_encoding.py
+MIN_SAVINGS = 0.2
+
+ASSETS = AssetsList(
+    assets=[
+        {
+            "type": "Asset",
+            "name": f"Store {i}",
+            "description": "Customer records with payment data",
+        }
+        for i in range(5)
+    ]
+)
+FLOWS = FlowsList(
+    data_flows=[
+        {
+            "flow_description": "Orders submitted over HTTPS",
+            "source_entity": f"Store {i}",
+            "target_entity": f"Store {i + 1}",
+        }
+        for i in range(4)
+    ],
+    trust_boundaries=[
+        {
+            "purpose": "Internet to VPC",
+            "source_entity": "Store 0",
+            "target_entity": "Store 1",
+        }
+    ],
+    threat_sources=[
+        {
+            "category": "External",
+            "description": "Anonymous attackers",
+            "example": "Botnets",
+        }
+    ],
+)
+THREATS = ThreatsList(
+    threats=[
+        {
+            "name": f"Threat {i}",
+            "stride_category": "Tampering",
+            "description": "An attacker alters orders | in transit",
+            "target": f"Store {i}",
+            "impact": "Fraudulent orders",
+            "likelihood": "High",
+            "mitigations": ["Sign requests", "Validate input"],
+        }
+        for i in range(5)
+    ]
+)
+
+
+def _pieces(text: str) -> int:
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def test_encodings_are_smaller_than_repr():
+    for value, encode in (
+        (ASSETS, format_assets),
+        (FLOWS, format_flows),
+        (THREATS, format_threats),
+    ):
+        assert _pieces(encode(value)) <= (1 - MIN_SAVINGS) * _pieces(str(value))
+
+
+def test_threats_get_one_line_with_stable_ids():
+    lines = format_threats(THREATS).splitlines()
+
+    assert len(lines) == len(THREATS.threats) + 1
+    assert [line.split(PROMPT_FIELD_SEPARATOR)[0] for line in lines[1:]] == [
+        f"T{i}" for i in range(1, 6)
+    ]
+    # Separators inside fields do not shift the columns
+    assert all(len(line.split(PROMPT_FIELD_SEPARATOR)) == 8 for line in lines)
+
+
+def test_strings_are_passed_through():
+    assert format_assets("assets") == "assets"
+    assert format_flows("flows") == "flows"
+    assert format_threats("threats") == "threats"
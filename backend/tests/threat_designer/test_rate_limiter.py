@@ -0,0 +1,231 @@
+"""Tests of the model rate limiter and adaptive concurrency."""
+
+import asyncio
+from types import SimpleNamespace
+
+import google.api_core.exceptions
+import model_service
+import pytest
+import rate_limiter
+from config import ThreatModelingConfig
+from langchain_core.messages import AIMessage
+from model_service import ModelService
+from rate_limiter import (AdaptiveConcurrency, ModelRateLimiter,
+                          SharedRateBudget, TokenBucket)
+
+TABLE_NAME = "test-cache"
+
+
+class FakeClock:
+    """Monotonic and wall clock advanced by the tests."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(
+        rate_limiter,
+        "time",
+        SimpleNamespace(monotonic=clock.monotonic, time=clock.time),
+    )
+    return clock
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", sleep)
+    return delays
+
+
+def test_bucket_delays_takes_beyond_its_capacity(clock):
+    bucket = TokenBucket(60)
+
+    assert bucket.take(60) == 0
+    assert bucket.take(1) == pytest.approx(1.0)
+    clock.now += 3
+    assert bucket.take(1) == 0
+
+
+def test_bucket_returns_unused_tokens(clock):
+    bucket = TokenBucket(60)
+    bucket.take(60)
+
+    bucket.give(30)
+
+    assert bucket.take(30) == 0
+    assert bucket.take(1) == pytest.approx(1.0)
+
+
+def _limiter(**overrides) -> ModelRateLimiter:
+    return ModelRateLimiter(
+        ThreatModelingConfig(
+            rate_limit_overrides={"model": overrides}, model_concurrency_max=10
+        )
+    )
+
+
+def test_requests_wait_for_the_rpm_limit(clock, sleeps):
+    limiter = _limiter(rpm=2, tpm=1_000_000)
+
+    async def run():
+        for _ in range(3):
+            await limiter.acquire("model", 1)
+
+    asyncio.run(run())
+
+    assert sleeps == [pytest.approx(30.0)]
+
+
+def test_requests_wait_for_the_tpm_limit(clock, sleeps):
+    limiter = _limiter(rpm=1000, tpm=1200)
+
+    async def run():
+        await limiter.acquire("model", 1000)
+        await limiter.acquire("model", 1000)
+
+    asyncio.run(run())
+
+    # 800 tokens missing at 20 tokens per second
+    assert sleeps == [pytest.approx(40.0)]
+
+
+def test_throttling_halves_the_limit_and_successes_grow_it_back():
+    concurrency = AdaptiveConcurrency(maximum=8, latency_threshold=10)
+
+    async def call(throttled=False, latency=1.0):
+        await concurrency.acquire()
+        await concurrency.release(throttled, None if throttled else latency)
+
+    asyncio.run(call(throttled=True))
+    assert concurrency.limit == 4
+
+    async def successes(count):
+        for _ in range(count):
+            await call()
+
+    asyncio.run(successes(4))
+    assert 4.9 < concurrency.limit < 5
+
+    asyncio.run(call(latency=30))
+    assert concurrency.limit == pytest.approx(4.9 * 0.9, rel=0.05)
+
+    asyncio.run(successes(200))
+    assert concurrency.limit == 8
+    assert concurrency.in_flight == 0
+
+
+def test_calls_beyond_the_limit_wait_for_a_slot():
+    concurrency = AdaptiveConcurrency(maximum=2, latency_threshold=10)
+
+    async def run():
+        await concurrency.acquire()
+        await concurrency.acquire()
+        waiting = asyncio.create_task(concurrency.acquire())
+        await asyncio.sleep(0)
+        blocked = not waiting.done()
+        await concurrency.release(False, 1.0)
+        await asyncio.wait_for(waiting, 1)
+        return blocked
+
+    assert asyncio.run(run())
+    assert concurrency.in_flight == 2
+
+
+class FakeModel:
+    """Chat model failing with the queued errors, or hanging when told to."""
+
+    model = "models/model"
+
+    def __init__(self, errors=(), hang=False):
+        self.errors = list(errors)
+        self.hang = hang
+        self.started = asyncio.Event() if hang else None
+
+    async def ainvoke(self, messages, **kwargs):
+        if self.hang:
+            self.started.set()
+            await asyncio.Event().wait()
+        if self.errors:
+            raise self.errors.pop(0)
+        return AIMessage(content="ok", usage_metadata=None)
+
+
+def test_throttled_call_is_retried_with_a_smaller_limit(monkeypatch):
+    monkeypatch.setattr(model_service, "THROTTLE_BACKOFF_SECONDS", 0)
+    limiter = _limiter()
+    service = ModelService(rate_limiter=limiter)
+    model = FakeModel([google.api_core.exceptions.ResourceExhausted("429")])
+
+    response = asyncio.run(service._ainvoke_limited(model, model, ["hi"]))
+
+    concurrency = limiter._models["model"].concurrency
+    assert response.content == "ok"
+    assert concurrency.limit < 10
+    assert concurrency.in_flight == 0
+
+
+def test_cancelled_call_releases_its_slot():
+    limiter = _limiter()
+    service = ModelService(rate_limiter=limiter)
+
+    async def run():
+        model = FakeModel(hang=True)
+        call = asyncio.create_task(service._ainvoke_limited(model, model, ["hi"]))
+        await model.started.wait()
+        in_flight = limiter._models["model"].concurrency.in_flight
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        return in_flight
+
+    assert asyncio.run(run()) == 1
+    assert limiter._models["model"].concurrency.in_flight == 0
+
+
+@pytest.fixture
+def shared(dynamodb, clock):
+    dynamodb.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{"AttributeName": "cache_key", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "cache_key", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return SharedRateBudget(TABLE_NAME, region_name="us-east-1")
+
+
+def test_shared_window_refuses_requests_beyond_the_rpm(shared, clock):
+    clock.now = 1_000_040.0
+
+    assert shared.reserve("model", 10, rpm=2, tpm=1000) == 0
+    assert shared.reserve("model", 10, rpm=2, tpm=1000) == 0
+    # Refused until the next one-minute window
+    assert shared.reserve("model", 10, rpm=2, tpm=1000) == pytest.approx(40.0)
+    assert shared.reserve("other", 10, rpm=2, tpm=1000) == 0
+
+    clock.now += 40
+    assert shared.reserve("model", 10, rpm=2, tpm=1000) == 0
+
+
+def test_shared_window_counts_adjusted_tokens(shared, clock):
+    assert shared.reserve("model", 600, rpm=100, tpm=1000) == 0
+    assert shared.reserve("model", 600, rpm=100, tpm=1000) == 0
+    assert shared.reserve("model", 600, rpm=100, tpm=1000) > 0
+
+    # The calls used fewer tokens than estimated
+    shared.adjust("model", -500)
+
+    assert shared.reserve("model", 600, rpm=100, tpm=1000) == 0
@@ -0,0 +1,51 @@
+"""Tests of the result and stage caches."""
+
+import pytest
+from result_cache import ResultCache, StageCache
+from state import AssetsList
+
+TABLE_NAME = "test-cache"
+
+
+@pytest.fixture
+def result_cache(dynamodb):
+    dynamodb.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{"AttributeName": "cache_key", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "cache_key", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return ResultCache(TABLE_NAME, ttl_hours=1, region_name="us-east-1")
+
+
+def test_value_round_trips(result_cache):
+    result_cache.put("result", "key", {"summary": "cached"})
+
+    assert result_cache.get("result", "key") == {"summary": "cached"}
+    assert result_cache.get("result", "other") is None
+
+
+def test_unreadable_entry_is_a_miss(result_cache):
+    result_cache.put("result", "key", {"summary": "cached"})
+    result_cache.table.update_item(
+        Key={"cache_key": "result#key"},
+        UpdateExpression="SET #value = :value",
+        ExpressionAttributeNames={"#value": "value"},
+        ExpressionAttributeValues={":value": b"not compressed"},
+    )
+
+    assert result_cache.get("result", "key") is None
+
+
+def test_stage_entry_failing_validation_is_a_miss(result_cache):
+    stage_cache = StageCache(result_cache)
+    valid = AssetsList(
+        assets=[{"type": "Asset", "name": "Database", "description": "Stores data"}]
+    )
+    stage_cache.put("assets", "valid", valid)
+    # Written by an older schema
+    result_cache.put("assets", "stale", {"items": [{"name": "Database"}]})
+
+    assert stage_cache.get("assets", "valid", AssetsList, "job-1") == valid
+    assert stage_cache.get("assets", "stale", AssetsList, "job-1") is None
+    assert stage_cache._usage["job-1"] == {"hits": 1, "misses": 1}
@@ -0,0 +1,123 @@
+"""Tests of the near-duplicate threat index."""
+
+import pytest
+import state
+from state import Threat, ThreatAccumulator, ThreatsList
+from threat_index import ThreatSimilarityIndex
+
+TEXT = (
+    "SQL injection Orders Database An attacker submits crafted order filters "
+    "that alter the queries run against the orders database, reading or "
+    "modifying the records of other customers"
+)
+REWORDED = (
+    "SQL injection attack Orders Database An attacker submits crafted order "
+    "filters that alter the queries run against the orders database, reading "
+    "or modifying the records of other customers"
+)
+UNRELATED = (
+    "Session hijacking Web Server Stolen session cookies let an attacker act "
+    "as a signed in user until the session expires"
+)
+
+
+@pytest.fixture
+def index():
+    return ThreatSimilarityIndex(threshold=0.7)
+
+
+def test_reworded_duplicate_is_found(index):
+    position = index.add(TEXT, "Tampering")
+
+    duplicate = index.find_duplicate(REWORDED, "Tampering")
+
+    assert duplicate is not None
+    assert duplicate[0] == position
+    assert 0.7 <= duplicate[1] < 1.0
+
+
+def test_unrelated_text_is_not_a_duplicate(index):
+    index.add(TEXT, "Tampering")
+
+    assert index.add_unique(UNRELATED, "Tampering") is None
+    assert len(index) == 2
+
+
+def test_same_text_in_another_category_is_kept(index):
+    index.add(TEXT, "Tampering")
+
+    assert index.add_unique(TEXT, "Information Disclosure") is None
+    assert index.find_duplicate(TEXT, "Tampering") == (0, 1.0)
+
+
+def test_threshold_bounds_the_similarity():
+    strict = ThreatSimilarityIndex(threshold=1.0)
+    strict.add(TEXT)
+
+    assert strict.find_duplicate(REWORDED) is None
+    assert strict.find_duplicate(TEXT) == (0, 1.0)
+
+
+def test_empty_text_is_indexed(index):
+    assert index.add_unique("") is None
+    assert index.add_unique(TEXT) is None
+    assert index.find_duplicate("the of and") == (0, 1.0)
+    assert index.find_duplicate(UNRELATED) is None
+
+
+def _threat(name: str, description: str, stride: str = "Tampering") -> Threat:
+    return Threat(
+        name=name,
+        stride_category=stride,
+        description=description,
+        target="Orders Database",
+        impact="Data loss",
+        likelihood="High",
+        mitigations=["Parameterized queries", "Input validation"],
+    )
+
+
+def test_index_positions_follow_the_accumulated_threats(monkeypatch):
+    monkeypatch.setattr(state.config, "threat_dedup_enabled", True)
+    monkeypatch.setattr(state.config, "threat_dedup_threshold", 0.7)
+    original = _threat("SQL injection", TEXT)
+    batches = [
+        [original, _threat("Session hijacking", UNRELATED)],
+        [
+            # Exact and near duplicates are dropped before indexing
+            original,
+            _threat("SQL injection attack", REWORDED),
+            _threat("SQL injection", TEXT, "Information Disclosure"),
+        ],
+    ]
+
+    catalog = ThreatAccumulator()
+    for batch in batches:
+        catalog = catalog.merge(ThreatsList(threats=batch).threats)
+
+    assert [threat.name for threat in catalog.threats] == [
+        "SQL injection",
+        "Session hijacking",
+        "SQL injection",
+    ]
+    assert len(catalog._index) == len(catalog)
+    for position, threat in enumerate(catalog.threats):
+        duplicate = catalog._index.find_duplicate(
+            threat.similarity_text(), threat.identity_key()[2]
+        )
+        assert duplicate == (position, 1.0)
+
+
+def test_merge_into_an_older_snapshot_rebuilds_the_index(monkeypatch):
+    monkeypatch.setattr(state.config, "threat_dedup_enabled", True)
+    first = ThreatAccumulator().merge([_threat("SQL injection", TEXT)])
+    first.merge([_threat("Session hijacking", UNRELATED)])
+
+    # ``first`` no longer sits at the tip of the shared storage
+    branch = first.merge(
+        [_threat("SQL injection attack", REWORDED), _threat("Replay", UNRELATED)]
+    )
+
+    assert [threat.name for threat in branch.threats] == ["SQL injection", "Replay"]
+    assert len(branch._index) == len(branch)
+    assert len(first) == 1
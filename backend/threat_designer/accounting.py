@@ -0,0 +1,168 @@
+"""
+Per-job accounting of model usage and operation latency.
+
+The collector of a job is bound to the handler's context, so the workflow
+nodes, the model service and ``operation_context`` reach it without passing it
+around. Model calls are attributed to the innermost operation running them,
+i.e. the workflow node, and to the model that served them. The summary is
+persisted with the job's status, and carried over by continuations, so it
+covers every invocation of the job.
+"""
+
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Generator, Optional
+
+_job_accounting: ContextVar[Optional["JobAccounting"]] = ContextVar(
+    "job_accounting", default=None
+)
+_operation: ContextVar[Optional[str]] = ContextVar("accounting_operation", default=None)
+
+
+class JobAccounting:
+    """Token, call and latency counters of a job.
+
+    Every counter is an integer, so the summary can be stored in DynamoDB as
+    is. Latencies are in milliseconds.
+    """
+
+    def __init__(self, job_id: str, carried: Optional[Dict[str, Any]] = None):
+        self.job_id = job_id
+        self.totals: Counter = Counter()
+        self.operations: Dict[str, Counter] = defaultdict(Counter)
+        self.models: Dict[str, Counter] = defaultdict(Counter)
+        # Successful calls of each operation by the model that served them
+        self.served: Dict[str, Counter] = defaultdict(Counter)
+        # Operations finish in worker threads as well
+        self._lock = threading.Lock()
+
+        carried = carried or {}
+        self.totals.update(carried.get("totals", {}))
+        for name, counters in carried.get("operations", {}).items():
+            self.operations[name].update(counters)
+        for name, counters in carried.get("models", {}).items():
+            self.models[name].update(counters)
+        for name, counters in carried.get("served", {}).items():
+            self.served[name].update(counters)
+        self.totals["invocations"] += 1
+
+    def record_call(
+        self,
+        model: Any,
+        usage: Optional[Dict[str, Any]],
+        latency: float,
+        failed: bool = False,
+        cancelled: bool = False,
+    ) -> None:
+        """Record a model call and the tokens it used.
+
+        Cancelled calls are losing hedges or calls that missed their deadline.
+        """
+        counters = Counter(calls=1, model_latency_ms=round(latency * 1000))
+        if failed:
+            counters["failed_calls"] = 1
+        if cancelled:
+            counters["cancelled_calls"] = 1
+        if usage:
+            input_tokens = usage.get("input_tokens", 0)
+            output_tokens = usage.get("output_tokens", 0)
+            input_details = usage.get("input_token_details") or {}
+            output_details = usage.get("output_token_details") or {}
+            reasoning_tokens = output_details.get("reasoning")
+            if reasoning_tokens is None:
+                # Gemini counts thoughts in the total only
+                reasoning_tokens = max(
+                    usage.get("total_tokens", 0) - input_tokens - output_tokens, 0
+                )
+            counters.update(
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                reasoning_tokens=reasoning_tokens,
+                cached_input_tokens=input_details.get("cache_read") or 0,
+            )
+
+        with self._lock:
+            operation = _operation.get() or "unknown"
+            self.totals.update(counters)
+            self.operations[operation].update(counters)
+            self.models[model_id(model)].update(counters)
+            if not failed and not cancelled:
+                self.served[operation][model_id(model)] += 1
+
+    def increment(self, counter: str, operation: Optional[str] = None) -> None:
+        """Count an event of an operation, by default the current one."""
+        with self._lock:
+            self.totals[counter] += 1
+            self.operations[operation or _operation.get() or "unknown"][counter] += 1
+
+    def record_operation(self, name: str, duration: float) -> None:
+        """Record the duration of a finished operation."""
+        with self._lock:
+            self.operations[name]["runs"] += 1
+            self.operations[name]["duration_ms"] += round(duration * 1000)
+
+    def summary(self) -> Dict[str, Any]:
+        """Counters of the job so far."""
+        with self._lock:
+            return {
+                "totals": dict(self.totals),
+                "operations": {
+                    name: dict(counters) for name, counters in self.operations.items()
+                },
+                "models": {
+                    name: dict(counters) for name, counters in self.models.items()
+                },
+                "served": {
+                    name: dict(counters) for name, counters in self.served.items()
+                },
+            }
+
+
+def start_job_accounting(
+    job_id: str, carried: Optional[Dict[str, Any]] = None
+) -> JobAccounting:
+    """Bind a job's collector to the current context.
+
+    Args:
+        job_id: Job being accounted
+        carried: Summary of the job's earlier invocations, if any
+
+    Returns:
+        JobAccounting: The collector, also returned by ``current_accounting``
+    """
+    accounting = JobAccounting(job_id, carried)
+    _job_accounting.set(accounting)
+    return accounting
+
+
+def current_accounting() -> Optional[JobAccounting]:
+    """Collector of the job running in the current context, if any."""
+    return _job_accounting.get()
+
+
+def current_operation() -> Optional[str]:
+    """Innermost operation running in the current context, if any."""
+    return _operation.get()
+
+
+@contextmanager
+def track_operation(name: str) -> Generator[None, None, None]:
+    """Attribute the enclosed model calls to an operation and time it."""
+    token = _operation.set(name)
+    start_time = time.monotonic()
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+        accounting = _job_accounting.get()
+        if accounting is not None:
+            accounting.record_operation(name, time.monotonic() - start_time)
+
+
+def model_id(model: Any) -> str:
+    """Model name of a chat model, without the ``models/`` prefix."""
+    name = str(getattr(model, "model", None) or "unknown")
+    return name.split("/", 1)[-1] if name.startswith("models/") else name
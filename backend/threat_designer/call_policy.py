@@ -0,0 +1,194 @@
+"""
+Deadlines and hedging of model calls.
+
+A stuck model call would otherwise hold the invocation until the Lambda
+timeout. Every call gets a timeout: the latency target of its stage, cut short
+by the time left in the invocation. Calls still running after the usual
+latency of their stage, a high quantile of its recent calls, are sent a
+second time. The first accepted response wins and the other call is
+cancelled. Duplicates are capped to a share of all calls, so hedging trims the
+latency tail without doubling the load on the provider.
+"""
+
+import asyncio
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from accounting import current_accounting
+from config import ThreatModelingConfig
+from constants import (CALL_DEADLINE_MARGIN_SECONDS, HEDGE_MAX_DELAY_FRACTION,
+                       HEDGE_MAX_RATIO, HEDGE_MIN_DELAY_SECONDS,
+                       HEDGE_MIN_SAMPLES, LATENCY_SAMPLE_SIZE)
+from exceptions import ModelTimeoutError
+from monitoring import logger
+
+T = TypeVar("T")
+
+# Monotonic time by which the model calls of the invocation must be done
+_deadline: ContextVar[Optional[float]] = ContextVar("call_deadline", default=None)
+
+
+def start_deadline(remaining_seconds: Optional[float]) -> None:
+    """Bound the model calls of the current context by the remaining time.
+
+    Without a remaining time, e.g. outside of Lambda, calls are bounded by
+    their stage target only.
+    """
+    deadline = None
+    if remaining_seconds is not None:
+        deadline = time.monotonic() + remaining_seconds - CALL_DEADLINE_MARGIN_SECONDS
+    _deadline.set(deadline)
+
+
+def remaining_seconds() -> Optional[float]:
+    """Time left for model calls in the invocation, None when unbounded."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def stage_name(operation: Optional[str]) -> str:
+    """Stage of an operation; the threat branches share their stage."""
+    return (operation or "unknown").split("[", 1)[0]
+
+
+class LatencyTracker:
+    """Latencies of the recent successful calls of each stage."""
+
+    def __init__(self, size: int = LATENCY_SAMPLE_SIZE):
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=size))
+
+    def record(self, stage: str, latency: float) -> None:
+        """Record the latency of a successful call."""
+        self._samples[stage].append(latency)
+
+    def quantile(self, stage: str, q: float) -> Optional[float]:
+        """Latency quantile of a stage, None until enough calls were seen."""
+        samples = self._samples.get(stage)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class CallPolicy:
+    """Runs model calls within their deadline, hedging the slow ones.
+
+    Latencies are kept for the lifetime of the container, so warm invocations
+    hedge from the first call.
+    """
+
+    def __init__(self, config: ThreatModelingConfig):
+        self.default_target = config.model_call_timeout_seconds
+        self.stage_targets = config.stage_latency_targets
+        self.hedging_enabled = config.hedging_enabled
+        self.hedge_quantile = config.hedge_quantile
+        self.latencies = LatencyTracker()
+        self._calls = 0
+        self._hedges = 0
+
+    def timeout(self, stage: str) -> float:
+        """Seconds a call of the stage may take."""
+        target = self.stage_targets.get(stage, self.default_target)
+        remaining = remaining_seconds()
+        return target if remaining is None else min(target, remaining)
+
+    def hedge_delay(self, stage: str) -> Optional[float]:
+        """Seconds after which a call of the stage is hedged, None to never."""
+        if not self.hedging_enabled:
+            return None
+        usual = self.latencies.quantile(stage, self.hedge_quantile)
+        if usual is None:
+            return None
+        target = self.stage_targets.get(stage, self.default_target)
+        return min(
+            max(usual, HEDGE_MIN_DELAY_SECONDS), target * HEDGE_MAX_DELAY_FRACTION
+        )
+
+    async def run(
+        self,
+        stage: str,
+        call: Callable[[], Awaitable[T]],
+        accept: Callable[[T], bool] = lambda result: True,
+    ) -> T:
+        """Run a call within the stage's timeout, hedging it when slow.
+
+        Args:
+            stage: Workflow stage making the call
+            call: Starts the call, invoked a second time to hedge it
+            accept: Whether a result wins the race; rejected results are
+                returned only when no call is accepted
+
+        Raises:
+            ModelTimeoutError: When no call completed before the timeout
+        """
+        timeout = self.timeout(stage)
+        try:
+            return await asyncio.wait_for(self._race(stage, call, accept), timeout)
+        except asyncio.TimeoutError:
+            self._increment("timeouts")
+            logger.warning(
+                "Model call missed its deadline",
+                stage=stage,
+                timeout_seconds=round(timeout, 1),
+            )
+            raise ModelTimeoutError(
+                f"Model call of {stage} did not complete within {max(timeout, 0):.1f}s"
+            )
+
+    async def _race(
+        self, stage: str, call: Callable[[], Awaitable[T]], accept: Callable[[T], bool]
+    ) -> T:
+        """Run a call, and its hedge once the hedge delay has passed."""
+        self._calls += 1
+        tasks = [asyncio.ensure_future(self._timed(stage, call))]
+        try:
+            delay = self.hedge_delay(stage)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._hedges < self._calls * HEDGE_MAX_RATIO:
+                    self._hedges += 1
+                    self._increment("hedges")
+                    logger.info(
+                        "Hedging slow model call",
+                        stage=stage,
+                        delay_seconds=round(delay, 1),
+                    )
+                    tasks.append(asyncio.ensure_future(self._timed(stage, call)))
+
+            rejected = error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                    elif accept(task.result()):
+                        if task is not tasks[0]:
+                            self._increment("hedge_wins")
+                        return task.result()
+                    elif rejected is None:
+                        rejected = task.result()
+            if rejected is not None:
+                return rejected
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _timed(self, stage: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Run a call, recording its latency when it succeeds."""
+        start_time = time.monotonic()
+        result = await call()
+        self.latencies.record(stage, time.monotonic() - start_time)
+        return result
+
+    @staticmethod
+    def _increment(counter: str) -> None:
+        accounting = current_accounting()
+        if accounting is not None:
+            accounting.increment(counter)
@@ -0,0 +1,464 @@
+"""
+DynamoDB-backed LangGraph checkpointer.
+
+Persists the agent state after every workflow step so an interrupted job can
+resume from its last completed node instead of starting over. All items of a
+job share the job id as partition key; the sort key separates checkpoints from
+the pending writes recorded against them.
+"""
+
+import asyncio
+import os
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from constants import (AWS_SERVICE_DYNAMODB, CHECKPOINT_CHUNK_BYTES,
+                       DEFAULT_REGION, ENV_AWS_REGION, ENV_CHECKPOINT_TABLE,
+                       ENV_DYNAMODB_ENDPOINT_URL,
+                       ERROR_DYNAMODB_OPERATION_FAILED)
+from exceptions import DynamoDBError
+from langchain_core.runnables.config import RunnableConfig
+from langgraph.checkpoint.base import (WRITES_IDX_MAP, BaseCheckpointSaver,
+                                       ChannelVersions, Checkpoint,
+                                       CheckpointMetadata, CheckpointTuple,
+                                       get_checkpoint_id,
+                                       get_checkpoint_metadata)
+from monitoring import logger
+
+CHECKPOINT_PREFIX = "checkpoint"
+WRITES_PREFIX = "writes"
+CHUNK_PREFIX = "chunk"
+
+
+class DynamoDBSaver(BaseCheckpointSaver):
+    """LangGraph checkpoint saver storing checkpoints in a DynamoDB table.
+
+    The table uses ``thread_id`` (S) as partition key and ``sk`` (S) as sort
+    key, with ``expires_at`` as optional TTL attribute. Checkpoint ids are
+    time-ordered, so the latest checkpoint is the last one in sort key order.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        ttl_hours: Optional[int] = None,
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None,
+    ) -> None:
+        super().__init__()
+        self.table_name = table_name
+        self.ttl_hours = ttl_hours
+        dynamodb = boto3.resource(
+            AWS_SERVICE_DYNAMODB,
+            region_name=region_name or os.environ.get(ENV_AWS_REGION, DEFAULT_REGION),
+            endpoint_url=endpoint_url,
+        )
+        self.table = dynamodb.Table(table_name)
+
+    # ------------------------------------------------------------------
+    # Synchronous API
+    # ------------------------------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Fetch the requested checkpoint, or the latest one of the thread."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        try:
+            if checkpoint_id := get_checkpoint_id(config):
+                response = self.table.get_item(
+                    Key={
+                        "thread_id": thread_id,
+                        "sk": _checkpoint_key(checkpoint_ns, checkpoint_id),
+                    }
+                )
+                item = response.get("Item")
+            else:
+                response = self.table.query(
+                    KeyConditionExpression=Key("thread_id").eq(thread_id)
+                    & Key("sk").begins_with(_checkpoint_key(checkpoint_ns, "")),
+                    ScanIndexForward=False,
+                    Limit=1,
+                )
+                items = response.get("Items", [])
+                item = items[0] if items else None
+        except ClientError as e:
+            raise _dynamodb_error("checkpoint fetch", thread_id, e) from e
+
+        if not item:
+            return None
+        return self._to_tuple(item)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """List the checkpoints of a thread, newest first."""
+        if not config:
+            raise ValueError("DynamoDBSaver can only list checkpoints of a thread")
+
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        config_checkpoint_id = get_checkpoint_id(config)
+        before_checkpoint_id = get_checkpoint_id(before) if before else None
+
+        for item in self._query(
+            thread_id, _checkpoint_key(checkpoint_ns, ""), forward=False
+        ):
+            checkpoint_id = item["checkpoint_id"]
+            if config_checkpoint_id and checkpoint_id != config_checkpoint_id:
+                continue
+            if before_checkpoint_id and checkpoint_id >= before_checkpoint_id:
+                continue
+
+            checkpoint_tuple = self._to_tuple(item)
+            if filter and not all(
+                checkpoint_tuple.metadata.get(key) == value
+                for key, value in filter.items()
+            ):
+                continue
+
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Store a checkpoint together with its channel values."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_bytes = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_bytes = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+
+        item = {
+            "thread_id": thread_id,
+            "sk": _checkpoint_key(checkpoint_ns, checkpoint["id"]),
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+            "type": checkpoint_type,
+            "metadata_type": metadata_type,
+            "metadata": metadata_bytes,
+        }
+        self._put_payload(thread_id, item, "checkpoint", checkpoint_bytes)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Store the pending writes of a task against a checkpoint."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            value_type, value_bytes = self.serde.dumps_typed(value)
+            item = {
+                "thread_id": thread_id,
+                "sk": _writes_key(checkpoint_ns, checkpoint_id, task_id, write_idx),
+                "task_id": task_id,
+                "task_path": task_path,
+                "idx": write_idx,
+                "channel": channel,
+                "type": value_type,
+            }
+            # Regular writes are only recorded once; special writes overwrite.
+            self._put_payload(
+                thread_id, item, "value", value_bytes, only_new=write_idx >= 0
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint and write of a thread."""
+        try:
+            with self.table.batch_writer() as batch:
+                for item in self._query(thread_id, "", projection="sk"):
+                    batch.delete_item(Key={"thread_id": thread_id, "sk": item["sk"]})
+        except ClientError as e:
+            raise _dynamodb_error("checkpoint deletion", thread_id, e) from e
+
+        logger.info("Checkpoints deleted", thread_id=thread_id)
+
+    # ------------------------------------------------------------------
+    # Asynchronous API
+    # ------------------------------------------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Asynchronous version of get_tuple."""
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """Asynchronous version of list."""
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in checkpoints:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Asynchronous version of put."""
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Asynchronous version of put_writes."""
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Asynchronous version of delete_thread."""
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _to_tuple(self, item: Dict[str, Any]) -> CheckpointTuple:
+        """Rebuild a CheckpointTuple from a stored checkpoint item."""
+        thread_id = item["thread_id"]
+        checkpoint_ns = item["checkpoint_ns"]
+        checkpoint_id = item["checkpoint_id"]
+        parent_checkpoint_id = item.get("parent_checkpoint_id")
+
+        checkpoint = self.serde.loads_typed(
+            (item["type"], self._load_payload(item, "checkpoint"))
+        )
+        metadata = self.serde.loads_typed(
+            (item["metadata_type"], bytes(item["metadata"]))
+        )
+
+        pending_writes = [
+            (
+                write["task_id"],
+                write["channel"],
+                self.serde.loads_typed(
+                    (write["type"], self._load_payload(write, "value"))
+                ),
+            )
+            for write in self._query(
+                thread_id, _writes_key(checkpoint_ns, checkpoint_id, "", None)
+            )
+        ]
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=checkpoint,
+            metadata=metadata,
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=pending_writes,
+        )
+
+    def _query(
+        self,
+        thread_id: str,
+        sk_prefix: str,
+        forward: bool = True,
+        projection: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Iterate over the items of a thread whose sort key starts with a prefix."""
+        condition = Key("thread_id").eq(thread_id)
+        if sk_prefix:
+            condition = condition & Key("sk").begins_with(sk_prefix)
+
+        kwargs = {"KeyConditionExpression": condition, "ScanIndexForward": forward}
+        if projection:
+            kwargs["ProjectionExpression"] = projection
+
+        try:
+            while True:
+                response = self.table.query(**kwargs)
+                yield from response.get("Items", [])
+                if "LastEvaluatedKey" not in response:
+                    break
+                kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        except ClientError as e:
+            raise _dynamodb_error("checkpoint query", thread_id, e) from e
+
+    def _put_payload(
+        self,
+        thread_id: str,
+        item: Dict[str, Any],
+        field: str,
+        data: bytes,
+        only_new: bool = False,
+    ) -> None:
+        """Compress a payload into an item, spilling oversized tails into chunks.
+
+        Chunk items are written before the item referencing them, so a reader
+        never sees a partially stored payload.
+        """
+        payload = zlib.compress(data)
+        chunks = [
+            payload[start : start + CHECKPOINT_CHUNK_BYTES]
+            for start in range(0, len(payload), CHECKPOINT_CHUNK_BYTES)
+        ] or [b""]
+
+        for index, chunk in enumerate(chunks[1:], start=1):
+            self._put(
+                thread_id,
+                {
+                    "thread_id": thread_id,
+                    "sk": _chunk_key(item["sk"], index),
+                    "value": chunk,
+                },
+            )
+
+        item[field] = chunks[0]
+        if len(chunks) > 1:
+            item["chunks"] = len(chunks)
+            logger.debug(
+                "Checkpoint payload split into chunks",
+                thread_id=thread_id,
+                sort_key=item["sk"],
+                size_bytes=len(payload),
+                chunks=len(chunks),
+            )
+        self._put(thread_id, item, only_new=only_new)
+
+    def _load_payload(self, item: Dict[str, Any], field: str) -> bytes:
+        """Reassemble and decompress a payload stored by _put_payload."""
+        payload = bytes(item[field])
+        if int(item.get("chunks", 1)) > 1:
+            payload += b"".join(
+                bytes(chunk["value"])
+                for chunk in self._query(
+                    item["thread_id"], _chunk_key(item["sk"], None)
+                )
+            )
+        return zlib.decompress(payload)
+
+    def _put(
+        self, thread_id: str, item: Dict[str, Any], only_new: bool = False
+    ) -> None:
+        """Put an item, stamping its TTL when configured."""
+        if self.ttl_hours:
+            item["expires_at"] = int(time.time()) + self.ttl_hours * 3600
+
+        kwargs = {"Item": {k: v for k, v in item.items() if v is not None}}
+        if only_new:
+            kwargs["ConditionExpression"] = "attribute_not_exists(sk)"
+
+        try:
+            self.table.put_item(**kwargs)
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return
+            raise _dynamodb_error("checkpoint write", thread_id, e) from e
+
+
+def _checkpoint_key(checkpoint_ns: str, checkpoint_id: str) -> str:
+    """Sort key of a checkpoint item (or the prefix of all of them)."""
+    return f"{CHECKPOINT_PREFIX}#{checkpoint_ns}#{checkpoint_id}"
+
+
+def _chunk_key(sort_key: str, index: Optional[int]) -> str:
+    """Sort key of a payload chunk (or the prefix of an item's chunks)."""
+    if index is None:
+        return f"{CHUNK_PREFIX}#{sort_key}#"
+    return f"{CHUNK_PREFIX}#{sort_key}#{index:04d}"
+
+
+def _writes_key(
+    checkpoint_ns: str, checkpoint_id: str, task_id: str, idx: Optional[int]
+) -> str:
+    """Sort key of a pending write item (or the prefix of a checkpoint's writes)."""
+    if idx is None:
+        return f"{WRITES_PREFIX}#{checkpoint_ns}#{checkpoint_id}#{task_id}"
+    return f"{WRITES_PREFIX}#{checkpoint_ns}#{checkpoint_id}#{task_id}#{idx}"
+
+
+def _dynamodb_error(
+    operation: str, thread_id: str, error: ClientError
+) -> DynamoDBError:
+    """Log a DynamoDB client error and convert it to a DynamoDBError."""
+    error_message = error.response["Error"]["Message"]
+    logger.error(
+        f"DynamoDB client error during {operation}",
+        thread_id=thread_id,
+        error_code=error.response["Error"]["Code"],
+        error_message=error_message,
+    )
+    return DynamoDBError(f"{ERROR_DYNAMODB_OPERATION_FAILED}: {error_message}")
+
+
+def create_checkpointer(ttl_hours: Optional[int] = None) -> Optional[DynamoDBSaver]:
+    """Create the checkpointer configured through the environment.
+
+    Returns None when no checkpoint table is configured, which compiles the
+    workflow without checkpointing. ``DYNAMODB_ENDPOINT_URL`` points the saver
+    at a local DynamoDB stand-in.
+    """
+    table_name = os.environ.get(ENV_CHECKPOINT_TABLE)
+    if not table_name:
+        logger.info("Checkpointing disabled, no checkpoint table configured")
+        return None
+
+    return DynamoDBSaver(
+        table_name,
+        ttl_hours=ttl_hours,
+        endpoint_url=os.environ.get(ENV_DYNAMODB_ENDPOINT_URL),
+    )
@@ -0,0 +1,157 @@
+"""
+Circuit breakers of the models, routing calls along fallback chains.
+
+Each model id has a breaker tracking the outcome and latency of its recent
+calls. The breaker opens once too many of them failed with a transient error
+or were slow, and calls go to the next model of the role's fallback chain
+meanwhile. After a cool-down, a single probe call is let through: the breaker
+closes when it succeeds and opens again when it does not.
+"""
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+from accounting import model_id
+from config import ThreatModelingConfig
+from constants import (BREAKER_MIN_CALLS, BREAKER_STATE_CLOSED,
+                       BREAKER_STATE_HALF_OPEN, BREAKER_STATE_OPEN,
+                       BREAKER_WINDOW_SECONDS)
+from monitoring import logger
+
+
+class CircuitBreaker:
+    """Health of one model, from its calls of the last window."""
+
+    def __init__(
+        self,
+        model_id: str,
+        error_rate: float,
+        slow_call_seconds: float,
+        open_seconds: float,
+    ):
+        self.model_id = model_id
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = BREAKER_STATE_CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        # Time and health of the calls of the window
+        self._calls: Deque[Tuple[float, bool]] = deque()
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are refused, the cool-down still running."""
+        return (
+            self.state == BREAKER_STATE_OPEN
+            and time.monotonic() - self._opened_at < self.open_seconds
+        )
+
+    def allow(self) -> bool:
+        """Whether a call may go to the model now.
+
+        Once the cool-down is over, only one probe call is allowed until its
+        outcome is recorded.
+        """
+        if self.state == BREAKER_STATE_CLOSED:
+            return True
+        if self.is_open:
+            return False
+        if self.state == BREAKER_STATE_OPEN:
+            self.state = BREAKER_STATE_HALF_OPEN
+            logger.info("Circuit breaker half-open", model_id=self.model_id)
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record(self, failed: bool, latency: float) -> None:
+        """Record the outcome of an allowed call."""
+        healthy = not failed and latency <= self.slow_call_seconds
+        if self.state == BREAKER_STATE_HALF_OPEN:
+            self._probing = False
+            if healthy:
+                self._close()
+            else:
+                self._open()
+            return
+        if self.state == BREAKER_STATE_OPEN:
+            # Started before the breaker opened
+            return
+
+        now = time.monotonic()
+        self._calls.append((now, healthy))
+        while self._calls and now - self._calls[0][0] > BREAKER_WINDOW_SECONDS:
+            self._calls.popleft()
+
+        unhealthy = sum(1 for _, call_healthy in self._calls if not call_healthy)
+        if (
+            len(self._calls) >= BREAKER_MIN_CALLS
+            and unhealthy / len(self._calls) >= self.error_rate
+        ):
+            self._open()
+
+    def abandon(self) -> None:
+        """Forget an allowed call that was cancelled before completing."""
+        if self.state == BREAKER_STATE_HALF_OPEN:
+            self._probing = False
+
+    def _open(self) -> None:
+        unhealthy = sum(1 for _, healthy in self._calls if not healthy)
+        self.state = BREAKER_STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        logger.warning(
+            "Circuit breaker opened",
+            model_id=self.model_id,
+            unhealthy_calls=unhealthy,
+            open_seconds=self.open_seconds,
+        )
+
+    def _close(self) -> None:
+        self.state = BREAKER_STATE_CLOSED
+        self._calls.clear()
+        logger.info("Circuit breaker closed", model_id=self.model_id)
+
+
+class ModelRouter:
+    """Circuit breakers of the models seen by the container.
+
+    Breakers are kept for the lifetime of the container, so warm invocations
+    avoid a model that degraded during earlier jobs.
+    """
+
+    def __init__(self, config: ThreatModelingConfig):
+        self.enabled = config.circuit_breaker_enabled
+        self.error_rate = config.circuit_breaker_error_rate
+        self.slow_call_seconds = config.model_latency_threshold_seconds
+        self.open_seconds = config.circuit_breaker_open_seconds
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, model_id: str) -> CircuitBreaker:
+        """Breaker of a model id, created closed."""
+        breaker = self._breakers.get(model_id)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                model_id, self.error_rate, self.slow_call_seconds, self.open_seconds
+            )
+            self._breakers[model_id] = breaker
+        return breaker
+
+    def available(self, models: List[Any]) -> List[Any]:
+        """Models of a chain whose breaker is not open, in order.
+
+        The primary model is returned when every breaker is open, so callers
+        always have a model to use.
+        """
+        if not self.enabled:
+            return models[:1]
+        available = [
+            model for model in models if not self.breaker(model_id(model)).is_open
+        ]
+        return available or models[:1]
+
+    def states(self) -> Dict[str, str]:
+        """Breaker state of each model id."""
+        return {model_id: breaker.state for model_id, breaker in self._breakers.items()}
@@ -1,11 +1,73 @@
 """Configuration management for the Threat Designer Agent."""
 
-from constants import (DEFAULT_MAX_EXECUTION_TIME_MINUTES, DEFAULT_MAX_RETRY,
-                       DEFAULT_REASONING_ENABLED, DEFAULT_SUMMARY_MAX_WORDS,
-                       ENV_AGENT_STATE_TABLE, MAX_EXECUTION_TIME_MINUTES,
-                       MAX_RETRY_COUNT, MAX_SUMMARY_WORDS,
-                       MIN_EXECUTION_TIME_MINUTES, MIN_RETRY_COUNT,
-                       MIN_SUMMARY_WORDS)
+from typing import Dict
+
+from constants import (DEFAULT_CHECKPOINT_TTL_HOURS,
+                       DEFAULT_CIRCUIT_BREAKER_ENABLED,
+                       DEFAULT_CIRCUIT_BREAKER_ERROR_RATE,
+                       DEFAULT_CIRCUIT_BREAKER_OPEN_SECONDS,
+                       DEFAULT_CONTINUATION_ENABLED,
+                       DEFAULT_CONTINUATION_MARGIN_SECONDS,
+                       DEFAULT_CONVERGENCE_ENABLED,
+                       DEFAULT_CONVERGENCE_NOVELTY_THRESHOLD,
+                       DEFAULT_CONVERGENCE_PATIENCE, DEFAULT_HEDGE_QUANTILE,
+                       DEFAULT_HEDGING_ENABLED, DEFAULT_IMAGE_CACHE_MAX_MB,
+                       DEFAULT_IMAGE_MAX_DIMENSION, DEFAULT_IMAGE_QUALITY,
+                       DEFAULT_IMAGE_UPLOAD_ENABLED, DEFAULT_MAX_CONTINUATIONS,
+                       DEFAULT_MAX_EXECUTION_TIME_MINUTES, DEFAULT_MAX_RETRY,
+                       DEFAULT_MODEL_CALL_TIMEOUT_SECONDS,
+                       DEFAULT_MODEL_CONCURRENCY_MAX,
+                       DEFAULT_MODEL_LATENCY_THRESHOLD_SECONDS,
+                       DEFAULT_NODE_RETRY_ATTEMPTS,
+                       DEFAULT_PROMPT_CACHE_ENABLED,
+                       DEFAULT_PROMPT_CACHE_TTL_SECONDS,
+                       DEFAULT_RATE_LIMIT_ENABLED, DEFAULT_RATE_LIMIT_RPM,
+                       DEFAULT_RATE_LIMIT_SHARED, DEFAULT_RATE_LIMIT_TPM,
+                       DEFAULT_REASONING_ENABLED,
+                       DEFAULT_RESULT_CACHE_TTL_HOURS,
+                       DEFAULT_SUMMARY_MAX_WORDS,
+                       DEFAULT_THREAT_BRANCH_CONCURRENCY,
+                       DEFAULT_THREAT_BRANCH_MAX_OUTPUT_TOKENS,
+                       DEFAULT_THREAT_DEDUP_ENABLED,
+                       DEFAULT_THREAT_DEDUP_THRESHOLD,
+                       DEFAULT_THREAT_FANOUT_ENABLED,
+                       DEFAULT_THREAT_PARTITION_ENABLED,
+                       DEFAULT_THREAT_PARTITION_SIZE, DEFAULT_THROTTLE_RETRIES,
+                       ENV_AGENT_STATE_TABLE, MAX_CHECKPOINT_TTL_HOURS,
+                       MAX_CIRCUIT_BREAKER_ERROR_RATE,
+                       MAX_CIRCUIT_BREAKER_OPEN_SECONDS,
+                       MAX_CONTINUATION_MARGIN_SECONDS, MAX_CONTINUATIONS,
+                       MAX_CONVERGENCE_NOVELTY_THRESHOLD,
+                       MAX_CONVERGENCE_PATIENCE, MAX_EXECUTION_TIME_MINUTES,
+                       MAX_HEDGE_QUANTILE, MAX_IMAGE_CACHE_MAX_MB,
+                       MAX_IMAGE_MAX_DIMENSION, MAX_IMAGE_QUALITY,
+                       MAX_MODEL_CALL_TIMEOUT_SECONDS,
+                       MAX_MODEL_CONCURRENCY_MAX,
+                       MAX_MODEL_LATENCY_THRESHOLD_SECONDS,
+                       MAX_NODE_RETRY_ATTEMPTS, MAX_PROMPT_CACHE_TTL_SECONDS,
+                       MAX_RATE_LIMIT_RPM, MAX_RATE_LIMIT_TPM,
+                       MAX_RESULT_CACHE_TTL_HOURS, MAX_RETRY_COUNT,
+                       MAX_SUMMARY_WORDS, MAX_THREAT_BRANCH_CONCURRENCY,
+                       MAX_THREAT_BRANCH_MAX_OUTPUT_TOKENS,
+                       MAX_THREAT_DEDUP_THRESHOLD, MAX_THREAT_PARTITION_SIZE,
+                       MAX_THROTTLE_RETRIES, MIN_CHECKPOINT_TTL_HOURS,
+                       MIN_CIRCUIT_BREAKER_ERROR_RATE,
+                       MIN_CIRCUIT_BREAKER_OPEN_SECONDS,
+                       MIN_CONTINUATION_MARGIN_SECONDS, MIN_CONTINUATIONS,
+                       MIN_CONVERGENCE_NOVELTY_THRESHOLD,
+                       MIN_CONVERGENCE_PATIENCE, MIN_EXECUTION_TIME_MINUTES,
+                       MIN_HEDGE_QUANTILE, MIN_IMAGE_CACHE_MAX_MB,
+                       MIN_IMAGE_MAX_DIMENSION, MIN_IMAGE_QUALITY,
+                       MIN_MODEL_CALL_TIMEOUT_SECONDS,
+                       MIN_MODEL_CONCURRENCY_MAX,
+                       MIN_MODEL_LATENCY_THRESHOLD_SECONDS,
+                       MIN_NODE_RETRY_ATTEMPTS, MIN_PROMPT_CACHE_TTL_SECONDS,
+                       MIN_RATE_LIMIT_RPM, MIN_RATE_LIMIT_TPM,
+                       MIN_RESULT_CACHE_TTL_HOURS, MIN_RETRY_COUNT,
+                       MIN_SUMMARY_WORDS, MIN_THREAT_BRANCH_CONCURRENCY,
+                       MIN_THREAT_BRANCH_MAX_OUTPUT_TOKENS,
+                       MIN_THREAT_DEDUP_THRESHOLD, MIN_THREAT_PARTITION_SIZE,
+                       MIN_THROTTLE_RETRIES)
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
@@ -26,6 +88,135 @@ class ThreatModelingConfig(BaseSettings):
     summary_max_words: int = Field(
         default=DEFAULT_SUMMARY_MAX_WORDS, ge=MIN_SUMMARY_WORDS, le=MAX_SUMMARY_WORDS
     )
+    threat_fanout_enabled: bool = Field(default=DEFAULT_THREAT_FANOUT_ENABLED)
+    threat_branch_concurrency: int = Field(
+        default=DEFAULT_THREAT_BRANCH_CONCURRENCY,
+        ge=MIN_THREAT_BRANCH_CONCURRENCY,
+        le=MAX_THREAT_BRANCH_CONCURRENCY,
+    )
+    threat_branch_max_output_tokens: int = Field(
+        default=DEFAULT_THREAT_BRANCH_MAX_OUTPUT_TOKENS,
+        ge=MIN_THREAT_BRANCH_MAX_OUTPUT_TOKENS,
+        le=MAX_THREAT_BRANCH_MAX_OUTPUT_TOKENS,
+    )
+    threat_partition_enabled: bool = Field(default=DEFAULT_THREAT_PARTITION_ENABLED)
+    threat_partition_size: int = Field(
+        default=DEFAULT_THREAT_PARTITION_SIZE,
+        ge=MIN_THREAT_PARTITION_SIZE,
+        le=MAX_THREAT_PARTITION_SIZE,
+    )
+    threat_dedup_enabled: bool = Field(default=DEFAULT_THREAT_DEDUP_ENABLED)
+    threat_dedup_threshold: float = Field(
+        default=DEFAULT_THREAT_DEDUP_THRESHOLD,
+        ge=MIN_THREAT_DEDUP_THRESHOLD,
+        le=MAX_THREAT_DEDUP_THRESHOLD,
+    )
+    convergence_enabled: bool = Field(default=DEFAULT_CONVERGENCE_ENABLED)
+    convergence_novelty_threshold: float = Field(
+        default=DEFAULT_CONVERGENCE_NOVELTY_THRESHOLD,
+        ge=MIN_CONVERGENCE_NOVELTY_THRESHOLD,
+        le=MAX_CONVERGENCE_NOVELTY_THRESHOLD,
+    )
+    convergence_patience: int = Field(
+        default=DEFAULT_CONVERGENCE_PATIENCE,
+        ge=MIN_CONVERGENCE_PATIENCE,
+        le=MAX_CONVERGENCE_PATIENCE,
+    )
+    image_max_dimension: int = Field(
+        default=DEFAULT_IMAGE_MAX_DIMENSION,
+        ge=MIN_IMAGE_MAX_DIMENSION,
+        le=MAX_IMAGE_MAX_DIMENSION,
+    )
+    image_quality: int = Field(
+        default=DEFAULT_IMAGE_QUALITY, ge=MIN_IMAGE_QUALITY, le=MAX_IMAGE_QUALITY
+    )
+    image_cache_max_mb: int = Field(
+        default=DEFAULT_IMAGE_CACHE_MAX_MB,
+        ge=MIN_IMAGE_CACHE_MAX_MB,
+        le=MAX_IMAGE_CACHE_MAX_MB,
+    )
+    image_upload_enabled: bool = Field(default=DEFAULT_IMAGE_UPLOAD_ENABLED)
+    prompt_cache_enabled: bool = Field(default=DEFAULT_PROMPT_CACHE_ENABLED)
+    prompt_cache_ttl_seconds: int = Field(
+        default=DEFAULT_PROMPT_CACHE_TTL_SECONDS,
+        ge=MIN_PROMPT_CACHE_TTL_SECONDS,
+        le=MAX_PROMPT_CACHE_TTL_SECONDS,
+    )
+    rate_limit_enabled: bool = Field(default=DEFAULT_RATE_LIMIT_ENABLED)
+    rate_limit_rpm: int = Field(
+        default=DEFAULT_RATE_LIMIT_RPM, ge=MIN_RATE_LIMIT_RPM, le=MAX_RATE_LIMIT_RPM
+    )
+    rate_limit_tpm: int = Field(
+        default=DEFAULT_RATE_LIMIT_TPM, ge=MIN_RATE_LIMIT_TPM, le=MAX_RATE_LIMIT_TPM
+    )
+    # Per model id limits, e.g. {"gemini-2.5-flash": {"rpm": 1000, "tpm": 1000000}}
+    rate_limit_overrides: Dict[str, Dict[str, int]] = Field(default_factory=dict)
+    rate_limit_shared: bool = Field(default=DEFAULT_RATE_LIMIT_SHARED)
+    model_concurrency_max: int = Field(
+        default=DEFAULT_MODEL_CONCURRENCY_MAX,
+        ge=MIN_MODEL_CONCURRENCY_MAX,
+        le=MAX_MODEL_CONCURRENCY_MAX,
+    )
+    model_latency_threshold_seconds: int = Field(
+        default=DEFAULT_MODEL_LATENCY_THRESHOLD_SECONDS,
+        ge=MIN_MODEL_LATENCY_THRESHOLD_SECONDS,
+        le=MAX_MODEL_LATENCY_THRESHOLD_SECONDS,
+    )
+    throttle_retries: int = Field(
+        default=DEFAULT_THROTTLE_RETRIES,
+        ge=MIN_THROTTLE_RETRIES,
+        le=MAX_THROTTLE_RETRIES,
+    )
+    model_call_timeout_seconds: int = Field(
+        default=DEFAULT_MODEL_CALL_TIMEOUT_SECONDS,
+        ge=MIN_MODEL_CALL_TIMEOUT_SECONDS,
+        le=MAX_MODEL_CALL_TIMEOUT_SECONDS,
+    )
+    # Per stage call timeouts in seconds, e.g. {"define_threats": 240}
+    stage_latency_targets: Dict[str, int] = Field(default_factory=dict)
+    hedging_enabled: bool = Field(default=DEFAULT_HEDGING_ENABLED)
+    hedge_quantile: float = Field(
+        default=DEFAULT_HEDGE_QUANTILE,
+        ge=MIN_HEDGE_QUANTILE,
+        le=MAX_HEDGE_QUANTILE,
+    )
+    node_retry_attempts: int = Field(
+        default=DEFAULT_NODE_RETRY_ATTEMPTS,
+        ge=MIN_NODE_RETRY_ATTEMPTS,
+        le=MAX_NODE_RETRY_ATTEMPTS,
+    )
+    circuit_breaker_enabled: bool = Field(default=DEFAULT_CIRCUIT_BREAKER_ENABLED)
+    circuit_breaker_error_rate: float = Field(
+        default=DEFAULT_CIRCUIT_BREAKER_ERROR_RATE,
+        ge=MIN_CIRCUIT_BREAKER_ERROR_RATE,
+        le=MAX_CIRCUIT_BREAKER_ERROR_RATE,
+    )
+    circuit_breaker_open_seconds: int = Field(
+        default=DEFAULT_CIRCUIT_BREAKER_OPEN_SECONDS,
+        ge=MIN_CIRCUIT_BREAKER_OPEN_SECONDS,
+        le=MAX_CIRCUIT_BREAKER_OPEN_SECONDS,
+    )
+    result_cache_ttl_hours: int = Field(
+        default=DEFAULT_RESULT_CACHE_TTL_HOURS,
+        ge=MIN_RESULT_CACHE_TTL_HOURS,
+        le=MAX_RESULT_CACHE_TTL_HOURS,
+    )
+    checkpoint_ttl_hours: int = Field(
+        default=DEFAULT_CHECKPOINT_TTL_HOURS,
+        ge=MIN_CHECKPOINT_TTL_HOURS,
+        le=MAX_CHECKPOINT_TTL_HOURS,
+    )
+    continuation_enabled: bool = Field(default=DEFAULT_CONTINUATION_ENABLED)
+    continuation_margin_seconds: int = Field(
+        default=DEFAULT_CONTINUATION_MARGIN_SECONDS,
+        ge=MIN_CONTINUATION_MARGIN_SECONDS,
+        le=MAX_CONTINUATION_MARGIN_SECONDS,
+    )
+    max_continuations: int = Field(
+        default=DEFAULT_MAX_CONTINUATIONS,
+        ge=MIN_CONTINUATIONS,
+        le=MAX_CONTINUATIONS,
+    )
 
     class Config:
         validate_assignment = True
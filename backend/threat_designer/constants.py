@@ -23,6 +23,9 @@ ENV_AGENT_TRAIL_TABLE = "AGENT_TRAIL_TABLE"
 ENV_LOG_LEVEL = "LOG_LEVEL"
 ENV_TRACEBACK_ENABLED = "TRACEBACK_ENABLED"
 ENV_GOOGLE_API_KEY = "GOOGLE_API_KEY"
+ENV_CHECKPOINT_TABLE = "CHECKPOINT_TABLE"
+ENV_DYNAMODB_ENDPOINT_URL = "DYNAMODB_ENDPOINT_URL"
+ENV_RESULT_CACHE_TABLE = "RESULT_CACHE_TABLE"
 
 # Model configuration environment variables
 ENV_MAIN_MODEL = "MAIN_MODEL"
@@ -46,6 +49,69 @@ DEFAULT_REASONING_ENABLED = False
 DEFAULT_SUMMARY_MAX_WORDS = 40
 DEFAULT_BUDGET = 4000
 
+# Threat generation fan-out defaults
+DEFAULT_THREAT_FANOUT_ENABLED = False
+DEFAULT_THREAT_BRANCH_CONCURRENCY = 6
+DEFAULT_THREAT_BRANCH_MAX_OUTPUT_TOKENS = 8000
+DEFAULT_THREAT_PARTITION_ENABLED = False
+DEFAULT_THREAT_PARTITION_SIZE = 12
+
+# Checkpointing defaults
+DEFAULT_CHECKPOINT_TTL_HOURS = 72
+
+# Result cache defaults
+DEFAULT_RESULT_CACHE_TTL_HOURS = 168
+
+# Diagram preprocessing defaults
+DEFAULT_IMAGE_MAX_DIMENSION = 2048
+DEFAULT_IMAGE_QUALITY = 90
+
+# Diagram cache defaults
+DEFAULT_IMAGE_CACHE_MAX_MB = 256
+
+# Diagram upload defaults
+DEFAULT_IMAGE_UPLOAD_ENABLED = True
+
+# Prompt prefix caching defaults
+DEFAULT_PROMPT_CACHE_ENABLED = True
+DEFAULT_PROMPT_CACHE_TTL_SECONDS = 3600
+
+# Model rate limiting defaults (per model id)
+DEFAULT_RATE_LIMIT_ENABLED = True
+DEFAULT_RATE_LIMIT_RPM = 150
+DEFAULT_RATE_LIMIT_TPM = 2_000_000
+DEFAULT_RATE_LIMIT_SHARED = False
+DEFAULT_MODEL_CONCURRENCY_MAX = 16
+DEFAULT_MODEL_LATENCY_THRESHOLD_SECONDS = 120
+DEFAULT_THROTTLE_RETRIES = 3
+
+# Model call deadline and hedging defaults
+DEFAULT_MODEL_CALL_TIMEOUT_SECONDS = 300
+DEFAULT_HEDGING_ENABLED = True
+DEFAULT_HEDGE_QUANTILE = 0.95
+
+# Workflow node retry defaults (transient errors only)
+DEFAULT_NODE_RETRY_ATTEMPTS = 3
+
+# Model circuit breaker defaults (per model id)
+DEFAULT_CIRCUIT_BREAKER_ENABLED = True
+DEFAULT_CIRCUIT_BREAKER_ERROR_RATE = 0.5
+DEFAULT_CIRCUIT_BREAKER_OPEN_SECONDS = 30
+
+# Threat de-duplication defaults
+DEFAULT_THREAT_DEDUP_ENABLED = True
+DEFAULT_THREAT_DEDUP_THRESHOLD = 0.7
+
+# Gap analysis convergence defaults
+DEFAULT_CONVERGENCE_ENABLED = True
+DEFAULT_CONVERGENCE_NOVELTY_THRESHOLD = 0.05
+DEFAULT_CONVERGENCE_PATIENCE = 2
+
+# Self-continuation defaults
+DEFAULT_CONTINUATION_ENABLED = True
+DEFAULT_CONTINUATION_MARGIN_SECONDS = 45
+DEFAULT_MAX_CONTINUATIONS = 4
+
 # Validation defaults
 DEFAULT_MIN_RETRY = 1
 DEFAULT_MAX_RETRY_LIMIT = 50
@@ -85,6 +151,9 @@ MITIGATION_MAX_ITEMS = 5
 # Summary configuration
 SUMMARY_MAX_WORDS_DEFAULT = 40
 
+# Separator of the fields of assets, flows and threats encoded in prompts
+PROMPT_FIELD_SEPARATOR = " | "
+
 
 # ============================================================================
 # JOB STATES (ENUM)
@@ -159,6 +228,7 @@ DB_FIELD_FLOWS = "flows"
 DB_FIELD_THREATS = "threats"
 DB_FIELD_GAPS = "gap"
 DB_FIELD_BACKUP = "backup"
+DB_FIELD_ACCOUNTING = "accounting"
 
 
 # ============================================================================
@@ -171,10 +241,12 @@ ERROR_INVALID_JSON = "Invalid JSON in environment variables"
 ERROR_MODEL_INIT_FAILED = "Model initialization failed"
 ERROR_DYNAMODB_OPERATION_FAILED = "DynamoDB operation failed"
 ERROR_S3_OPERATION_FAILED = "S3 operation failed"
+ERROR_LAMBDA_INVOKE_FAILED = "Lambda invocation failed"
 ERROR_VALIDATION_FAILED = "Request validation failed"
 ERROR_MISSING_REQUIRED_FIELDS = "Missing required fields"
 ERROR_INVALID_REASONING_VALUE = "Reasoning must be 0 or 1"
 ERROR_INVALID_REASONING_TYPE = "Invalid reasoning parameter"
+ERROR_NO_CHECKPOINT = "No checkpoint to resume from"
 
 
 # ============================================================================
@@ -209,12 +281,136 @@ FLUSH_MODE_REPLACE = 0
 FLUSH_MODE_APPEND = 1
 
 
+# ============================================================================
+# CHECKPOINTING
+# ============================================================================
+
+# Compressed payloads are split into chunks of this size (DynamoDB items max 400 KB)
+CHECKPOINT_CHUNK_BYTES = 350_000
+
+
+# ============================================================================
+# RESULT CACHE
+# ============================================================================
+
+# Compressed cache values above this size are not stored (DynamoDB items max 400 KB)
+CACHE_MAX_ITEM_BYTES = 350_000
+
+# Cache namespaces
+CACHE_NAMESPACE_RESULT = "result"
+CACHE_NAMESPACE_ASSETS = "assets"
+CACHE_NAMESPACE_FLOWS = "flows"
+CACHE_NAMESPACE_RATE_LIMIT = "ratelimit"
+
+
+# ============================================================================
+# PROMPT PREFIX CACHING
+# ============================================================================
+
+# Workflow stages sharing a cached prompt prefix
+PROMPT_CACHE_STAGE_THREATS = "threats"
+PROMPT_CACHE_STAGE_THREATS_IMPROVE = "threats_improve"
+PROMPT_CACHE_STAGE_GAP_ANALYSIS = "gap_analysis"
+
+
+# ============================================================================
+# MODEL RATE LIMITING
+# ============================================================================
+
+# Adaptive concurrency: halve the limit on throttling, shrink it by 10% on
+# slow calls, grow it by one slot per limit's worth of successful calls
+MODEL_CONCURRENCY_MIN = 1
+THROTTLE_DECREASE_FACTOR = 0.5
+LATENCY_DECREASE_FACTOR = 0.9
+
+# First wait before retrying a throttled call, doubled on each retry
+THROTTLE_BACKOFF_SECONDS = 2.0
+
+# Input token estimates made before a call, corrected by the reported usage
+TOKEN_ESTIMATE_CHARS_PER_TOKEN = 4
+# 3x3 tiles of 258 tokens, a diagram at the default 2048 px maximum dimension
+IMAGE_TOKEN_ESTIMATE = 2322
+
+# Shared request and token budgets are counted in windows of this length
+RATE_LIMIT_WINDOW_SECONDS = 60
+
+
+# ============================================================================
+# MODEL CALL DEADLINES AND HEDGING
+# ============================================================================
+
+# Invocation time kept after the last model call to persist the step
+CALL_DEADLINE_MARGIN_SECONDS = 15
+
+# Latencies kept per stage, and needed before their quantile is trusted
+LATENCY_SAMPLE_SIZE = 200
+HEDGE_MIN_SAMPLES = 10
+
+# Hedges start no earlier than this and no later than half the stage target
+HEDGE_MIN_DELAY_SECONDS = 2.0
+HEDGE_MAX_DELAY_FRACTION = 0.5
+
+# At most this share of calls is duplicated
+HEDGE_MAX_RATIO = 0.1
+
+
+# ============================================================================
+# ERROR TAXONOMY AND NODE RETRIES
+# ============================================================================
+
+# AWS error codes of failures expected to pass on their own
+TRANSIENT_AWS_ERROR_CODES = frozenset(
+    {
+        "InternalServerError",
+        "ProvisionedThroughputExceededException",
+        "RequestLimitExceeded",
+        "RequestTimeout",
+        "ServiceUnavailable",
+        "SlowDown",
+        "ThrottlingException",
+        "TooManyRequestsException",
+        "TransactionConflictException",
+    }
+)
+
+# Nodes failing with a transient error are retried with exponential backoff,
+# plus up to one second of jitter
+NODE_RETRY_INITIAL_INTERVAL_SECONDS = 2.0
+NODE_RETRY_BACKOFF_FACTOR = 2.0
+NODE_RETRY_MAX_INTERVAL_SECONDS = 30.0
+
+
+# ============================================================================
+# MODEL CIRCUIT BREAKERS
+# ============================================================================
+
+# Calls considered, and needed before a breaker may open
+BREAKER_WINDOW_SECONDS = 60
+BREAKER_MIN_CALLS = 5
+
+# Breaker states
+BREAKER_STATE_CLOSED = "closed"
+BREAKER_STATE_OPEN = "open"
+BREAKER_STATE_HALF_OPEN = "half_open"
+
+
+# ============================================================================
+# THREAT DE-DUPLICATION
+# ============================================================================
+
+# MinHash signature length and LSH band height (32 bands of 2 rows)
+THREAT_INDEX_NUM_PERMUTATIONS = 64
+THREAT_INDEX_ROWS_PER_BAND = 2
+THREAT_INDEX_SEED = 1
+
+
 # ============================================================================
 # AWS SERVICE NAMES
 # ============================================================================
 
 AWS_SERVICE_BEDROCK_RUNTIME = "bedrock-runtime"
 AWS_SERVICE_DYNAMODB = "dynamodb"
+AWS_SERVICE_LAMBDA = "lambda"
 AWS_SERVICE_S3 = "s3"
 
 
@@ -223,6 +419,12 @@ AWS_SERVICE_S3 = "s3"
 # ============================================================================
 
 IMAGE_MIME_TYPE_JPEG = "image/jpeg"
+IMAGE_MIME_TYPE_PNG = "image/png"
+IMAGE_MIME_TYPE_GIF = "image/gif"
+IMAGE_MIME_TYPE_WEBP = "image/webp"
+
+# Prepared diagrams are cached here across warm invocations
+IMAGE_CACHE_DIRECTORY = "/tmp/threat_designer/images"
 IMAGE_URL_PREFIX = "data:image/jpeg;base64,"
 
 
@@ -246,23 +448,95 @@ MAX_SUMMARY_WORDS = 100
 MIN_REASONING_LEVEL = 0
 MAX_REASONING_LEVEL = 3
 
+# Threat generation branch validation
+MIN_THREAT_BRANCH_CONCURRENCY = 1
+MAX_THREAT_BRANCH_CONCURRENCY = 32
+MIN_THREAT_BRANCH_MAX_OUTPUT_TOKENS = 1000
+MAX_THREAT_BRANCH_MAX_OUTPUT_TOKENS = 64000
+MIN_THREAT_PARTITION_SIZE = 1
+MAX_THREAT_PARTITION_SIZE = 200
+
+# Checkpoint retention validation (hours)
+MIN_CHECKPOINT_TTL_HOURS = 1
+MAX_CHECKPOINT_TTL_HOURS = 720
+
+# Result cache retention validation (hours)
+MIN_RESULT_CACHE_TTL_HOURS = 1
+MAX_RESULT_CACHE_TTL_HOURS = 2160
+
+# Diagram preprocessing validation
+MIN_IMAGE_MAX_DIMENSION = 768
+MAX_IMAGE_MAX_DIMENSION = 8000
+MIN_IMAGE_QUALITY = 50
+MAX_IMAGE_QUALITY = 100
+
+# Diagram cache size validation (MB)
+MIN_IMAGE_CACHE_MAX_MB = 16
+MAX_IMAGE_CACHE_MAX_MB = 8192
+
+# Prompt prefix cache retention validation (seconds)
+MIN_PROMPT_CACHE_TTL_SECONDS = 300
+MAX_PROMPT_CACHE_TTL_SECONDS = 21600
+
+# Model rate limiting validation
+MIN_RATE_LIMIT_RPM = 1
+MAX_RATE_LIMIT_RPM = 100_000
+MIN_RATE_LIMIT_TPM = 1_000
+MAX_RATE_LIMIT_TPM = 100_000_000
+MIN_MODEL_CONCURRENCY_MAX = 1
+MAX_MODEL_CONCURRENCY_MAX = 128
+MIN_MODEL_LATENCY_THRESHOLD_SECONDS = 5
+MAX_MODEL_LATENCY_THRESHOLD_SECONDS = 900
+MIN_THROTTLE_RETRIES = 0
+MAX_THROTTLE_RETRIES = 10
+
+# Model call deadline and hedging validation
+MIN_MODEL_CALL_TIMEOUT_SECONDS = 10
+MAX_MODEL_CALL_TIMEOUT_SECONDS = 900
+MIN_HEDGE_QUANTILE = 0.5
+MAX_HEDGE_QUANTILE = 0.999
+
+# Workflow node retry validation
+MIN_NODE_RETRY_ATTEMPTS = 1
+MAX_NODE_RETRY_ATTEMPTS = 10
+
+# Model circuit breaker validation
+MIN_CIRCUIT_BREAKER_ERROR_RATE = 0.1
+MAX_CIRCUIT_BREAKER_ERROR_RATE = 1.0
+MIN_CIRCUIT_BREAKER_OPEN_SECONDS = 5
+MAX_CIRCUIT_BREAKER_OPEN_SECONDS = 600
+
+# Threat de-duplication validation
+MIN_THREAT_DEDUP_THRESHOLD = 0.3
+MAX_THREAT_DEDUP_THRESHOLD = 1.0
+
+# Gap analysis convergence validation
+MIN_CONVERGENCE_NOVELTY_THRESHOLD = 0.0
+MAX_CONVERGENCE_NOVELTY_THRESHOLD = 1.0
+MIN_CONVERGENCE_PATIENCE = 1
+MAX_CONVERGENCE_PATIENCE = 10
+
+# Self-continuation validation
+MIN_CONTINUATION_MARGIN_SECONDS = 5
+MAX_CONTINUATION_MARGIN_SECONDS = 300
+MIN_CONTINUATIONS = 0
+MAX_CONTINUATIONS = 20
+
 
 # ============================================================================
 # WORKFLOW CONFIGURATION
 # ============================================================================
 
 # Workflow node names
-WORKFLOW_NODE_IMAGE_TO_BASE64 = "image_to_base64"
+WORKFLOW_NODE_SUMMARY = "summary"
 WORKFLOW_NODE_ASSET = "asset"
 WORKFLOW_NODE_FLOWS = "flows"
 WORKFLOW_NODE_THREATS = "threats"
+WORKFLOW_NODE_THREATS_BRANCH = "threats_branch"
+WORKFLOW_NODE_THREATS_MERGE = "threats_merge"
 WORKFLOW_NODE_GAP_ANALYSIS = "gap_analysis"
 WORKFLOW_NODE_FINALIZE = "finalize"
 
-# Workflow routing values
-WORKFLOW_ROUTE_REPLAY = "replay"
-WORKFLOW_ROUTE_FULL = "full"
-
 
 # ============================================================================
 # SLEEP INTERVALS
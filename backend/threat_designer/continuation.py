@@ -0,0 +1,90 @@
+"""
+Self-continuation of long-running threat modeling jobs.
+
+Lambda stops an invocation at its hard timeout whatever the workflow is doing.
+The planner tracks the remaining invocation time and the duration of every
+completed workflow step. Once the next step is unlikely to finish in time, the
+handler stops streaming and hands the job over to a fresh invocation. The
+step's checkpoint is already stored, so the new invocation resumes from it.
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config import ThreatModelingConfig
+from monitoring import logger
+from utils import invoke_lambda_async
+
+
+class ContinuationPlanner:
+    """Decides when a job must continue in a new Lambda invocation."""
+
+    def __init__(
+        self, context: Any, config: ThreatModelingConfig, event: Dict[str, Any]
+    ):
+        self.context = context
+        self.enabled = config.continuation_enabled
+        self.margin_seconds = config.continuation_margin_seconds
+        self.max_continuations = config.max_continuations
+        self.continuation = int(event.get("continuation", 0))
+        # Step durations observed by earlier invocations of the same job
+        self.max_step_seconds = float(event.get("max_step_seconds", 0.0))
+        self._step_started = time.monotonic()
+
+    def remaining_seconds(self) -> Optional[float]:
+        """Time left before the Lambda timeout, None outside of Lambda."""
+        get_remaining = getattr(self.context, "get_remaining_time_in_millis", None)
+        if get_remaining is None:
+            return None
+        return get_remaining() / 1000
+
+    def record_step(self) -> None:
+        """Record the completion of a workflow step."""
+        now = time.monotonic()
+        self.max_step_seconds = max(self.max_step_seconds, now - self._step_started)
+        self._step_started = now
+
+    def should_hand_over(self) -> bool:
+        """Check whether the next step could outlive this invocation."""
+        if not self.enabled or self.continuation >= self.max_continuations:
+            return False
+
+        remaining = self.remaining_seconds()
+        if remaining is None:
+            return False
+        return remaining < self.max_step_seconds + self.margin_seconds
+
+    async def hand_over(
+        self,
+        event: Dict[str, Any],
+        start_time: datetime,
+        accounting: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Re-invoke this function asynchronously to resume the job.
+
+        ``accounting`` carries the job's usage so far to the new invocation.
+        """
+        function_name = getattr(
+            self.context,
+            "invoked_function_arn",
+            getattr(self.context, "function_name", None),
+        )
+        payload = {
+            **event,
+            "resume": True,
+            "continuation": self.continuation + 1,
+            "start_time": start_time.isoformat(),
+            "max_step_seconds": round(self.max_step_seconds, 3),
+            "accounting": accounting,
+        }
+
+        logger.info(
+            "Handing job over to a new invocation",
+            job_id=event.get("id"),
+            continuation=payload["continuation"],
+            remaining_seconds=self.remaining_seconds(),
+            max_step_seconds=payload["max_step_seconds"],
+        )
+        await asyncio.to_thread(invoke_lambda_async, function_name, payload)
@@ -1,4 +1,30 @@
-"""Custom exceptions for threat modeling operations."""
+"""Custom exceptions for threat modeling operations.
+
+Errors are either transient, expected to pass when the operation is retried
+(throttling, timeouts, unavailable services), or fatal. Workflow nodes are
+retried on transient errors only.
+"""
+
+import asyncio
+
+import google.api_core.exceptions
+from botocore.exceptions import ClientError
+from botocore.exceptions import ConnectionError as BotocoreConnectionError
+from botocore.exceptions import HTTPClientError
+from constants import TRANSIENT_AWS_ERROR_CODES
+
+_TRANSIENT_PROVIDER_ERRORS = (
+    google.api_core.exceptions.ResourceExhausted,
+    google.api_core.exceptions.TooManyRequests,
+    google.api_core.exceptions.InternalServerError,
+    google.api_core.exceptions.BadGateway,
+    google.api_core.exceptions.ServiceUnavailable,
+    google.api_core.exceptions.GatewayTimeout,
+    BotocoreConnectionError,
+    HTTPClientError,
+    asyncio.TimeoutError,
+    ConnectionError,
+)
 
 
 class ThreatModelingError(Exception):
@@ -7,6 +33,12 @@ class ThreatModelingError(Exception):
     pass
 
 
+class TransientError(ThreatModelingError):
+    """Raised when an operation failed for a reason expected to pass."""
+
+    pass
+
+
 class DynamoDBError(ThreatModelingError):
     """Custom exception for DynamoDB operations."""
 
@@ -19,12 +51,24 @@ class S3Error(ThreatModelingError):
     pass
 
 
+class LambdaError(ThreatModelingError):
+    """Custom exception for Lambda operations."""
+
+    pass
+
+
 class ModelInvocationError(ThreatModelingError):
     """Raised when model invocation fails."""
 
     pass
 
 
+class ModelTimeoutError(ModelInvocationError, TransientError):
+    """Raised when a model call misses its deadline."""
+
+    pass
+
+
 class StateUpdateError(ThreatModelingError):
     """Raised when state update operations fail."""
 
@@ -35,3 +79,21 @@ class ValidationError(ThreatModelingError):
     """Raised when data validation fails."""
 
     pass
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether an error, or one of its causes, is expected to pass on retry.
+
+    Only explicit causes (``raise ... from``) are followed: an error raised
+    while handling a transient one is not transient itself.
+    """
+    while error is not None:
+        if isinstance(error, (TransientError, *_TRANSIENT_PROVIDER_ERRORS)):
+            return True
+        if (
+            isinstance(error, ClientError)
+            and error.response.get("Error", {}).get("Code") in TRANSIENT_AWS_ERROR_CODES
+        ):
+            return True
+        error = error.__cause__
+    return False
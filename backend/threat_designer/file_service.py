@@ -0,0 +1,77 @@
+"""
+Upload of architecture diagrams to the Gemini file API.
+
+Inline images are re-sent with every model call of a job. Uploading the
+diagram once and referencing it by URI keeps the request payloads small. The
+upload is an optimization only: when it fails, messages embed the image inline.
+Uploaded files are deleted when the job finishes or fails, and otherwise
+expire on the provider side after 48 hours.
+"""
+
+import asyncio
+import base64
+import io
+from typing import Optional
+
+import google.generativeai as genai
+from config import ThreatModelingConfig
+from constants import IMAGE_MIME_TYPE_JPEG
+from monitoring import logger
+
+
+class ImageFileService:
+    """Uploads job diagrams and tracks them until the job finishes."""
+
+    def __init__(self, config: ThreatModelingConfig):
+        self.enabled = config.image_upload_enabled
+
+    async def upload(
+        self, job_id: str, image_data: str, mime_type: str = IMAGE_MIME_TYPE_JPEG
+    ) -> Optional[str]:
+        """Upload a base64 encoded diagram and return its file URI.
+
+        Returns None when uploads are disabled or failed, in which case the
+        image is sent inline.
+        """
+        if not self.enabled:
+            return None
+
+        image_bytes = base64.b64decode(image_data)
+        try:
+            uploaded = await asyncio.to_thread(
+                genai.upload_file,
+                io.BytesIO(image_bytes),
+                mime_type=mime_type,
+                display_name=job_id,
+                resumable=False,
+            )
+        except Exception as e:
+            logger.warning(
+                "Diagram upload failed, sending it inline",
+                job_id=job_id,
+                error=str(e),
+            )
+            return None
+
+        logger.info(
+            "Diagram uploaded",
+            job_id=job_id,
+            uri=uploaded.uri,
+            size_bytes=len(image_bytes),
+        )
+        return uploaded.uri
+
+    async def delete(self, job_id: str, uri: str) -> None:
+        """Delete an uploaded diagram."""
+        try:
+            await asyncio.to_thread(genai.delete_file, _file_name(uri))
+        except Exception as e:
+            # The file expires on the provider side anyway
+            logger.warning(
+                "Failed to delete uploaded diagram", job_id=job_id, error=str(e)
+            )
+
+
+def _file_name(uri: str) -> str:
+    """Resource name (``files/<id>``) of a file URI."""
+    return "files/" + uri.rstrip("/").rsplit("/", 1)[-1]
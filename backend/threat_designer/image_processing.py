@@ -0,0 +1,104 @@
+"""
+Preprocessing of uploaded architecture diagrams before they are sent to models.
+
+Uploads can be up to 8000x8000 pixels, far beyond what models resolve. Vision
+models bill images by tiles, so oversized diagrams cost input tokens and
+upload time on every call without adding legible detail. Diagrams are
+downscaled to a maximum dimension that keeps their text legible, re-encoded
+as WebP when that is smaller, and labelled with their real MIME type.
+"""
+
+import io
+from dataclasses import dataclass
+
+from constants import (IMAGE_MIME_TYPE_GIF, IMAGE_MIME_TYPE_JPEG,
+                       IMAGE_MIME_TYPE_PNG, IMAGE_MIME_TYPE_WEBP)
+from monitoring import logger
+from PIL import Image, ImageOps
+
+# Leading bytes identifying the image formats accepted by the models
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", IMAGE_MIME_TYPE_PNG),
+    (b"\xff\xd8\xff", IMAGE_MIME_TYPE_JPEG),
+    (b"GIF87a", IMAGE_MIME_TYPE_GIF),
+    (b"GIF89a", IMAGE_MIME_TYPE_GIF),
+]
+
+
+@dataclass
+class PreparedImage:
+    """Image bytes ready to be sent to a model."""
+
+    data: bytes
+    mime_type: str
+
+
+def detect_mime_type(data: bytes) -> str:
+    """MIME type of an image from its leading bytes, JPEG when unknown."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return IMAGE_MIME_TYPE_WEBP
+    for signature, mime_type in _SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    return IMAGE_MIME_TYPE_JPEG
+
+
+def prepare_image(data: bytes, max_dimension: int, quality: int) -> PreparedImage:
+    """Downscale and recompress an image.
+
+    The original bytes are kept when the image already fits ``max_dimension``
+    and re-encoding does not make it smaller, or when it cannot be decoded.
+
+    Args:
+        data: Image bytes as uploaded.
+        max_dimension: Maximum width and height in pixels.
+        quality: WebP encoding quality (1-100).
+
+    Returns:
+        PreparedImage: The image to send and its MIME type.
+    """
+    original = PreparedImage(data, detect_mime_type(data))
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            original_size = image.size
+            # Diagrams photographed with a phone carry their rotation in EXIF
+            image = ImageOps.exif_transpose(image)
+            resized = max(image.size) > max_dimension
+            if resized:
+                image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+            buffer = io.BytesIO()
+            _flatten(image).save(buffer, format="WEBP", quality=quality, method=4)
+            final_size = image.size
+    except Exception as e:
+        logger.warning(
+            "Image preprocessing failed, sending the original",
+            mime_type=original.mime_type,
+            error=str(e),
+        )
+        return original
+
+    prepared = PreparedImage(buffer.getvalue(), IMAGE_MIME_TYPE_WEBP)
+    if not resized and len(prepared.data) >= len(data):
+        prepared = original
+
+    logger.info(
+        "Image preprocessed",
+        original_mime_type=original.mime_type,
+        mime_type=prepared.mime_type,
+        original_dimensions=original_size,
+        dimensions=final_size if prepared is not original else original_size,
+        original_bytes=len(data),
+        bytes=len(prepared.data),
+    )
+    return prepared
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB copy of an image, transparent areas rendered on white."""
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
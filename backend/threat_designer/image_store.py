@@ -0,0 +1,152 @@
+"""
+Process-level store of the architecture diagrams used by running jobs.
+
+The agent state only carries the content hash of a job's diagram. Prepared
+diagrams are kept in files on the Lambda ``/tmp`` volume, which survives
+across warm invocations of a container, and read back on each lookup. The
+least recently used files are evicted once the cache exceeds its size limit.
+Diagrams missing from the cache, e.g. in a cold container resuming a job,
+are downloaded from S3 and prepared again.
+"""
+
+import asyncio
+import base64
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from config import ThreatModelingConfig
+from constants import ENV_ARCHITECTURE_BUCKET, IMAGE_CACHE_DIRECTORY
+from image_processing import prepare_image
+from monitoring import logger
+from utils import read_s3_image
+
+
+@dataclass
+class StoredImage:
+    """Prepared diagram of a job."""
+
+    image_hash: str
+    data: str
+    mime_type: str
+
+
+class ImageCache:
+    """Size-bounded LRU cache of base64 encoded images in a local directory.
+
+    Each file holds the MIME type on its first line followed by the base64
+    data. Recency is tracked through the file modification times, so it
+    carries over to later invocations of the same container.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str) -> Optional[StoredImage]:
+        """Return a cached image, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="ascii") as file:
+                mime_type = file.readline().rstrip("\n")
+                data = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Never cached, or evicted by another process sharing the directory
+            return None
+
+        return StoredImage(image_hash=key, data=data, mime_type=mime_type)
+
+    def put(self, image: StoredImage) -> None:
+        """Store an image, evicting the least recently used ones if needed."""
+        path = self._path(image.image_hash)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(image.mime_type.encode("ascii") + b"\n")
+            file.write(image.data.encode("ascii"))
+        # Readers never see a partially written file
+        os.replace(temporary_path, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        """Delete the least recently used files above the size limit."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.name))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            logger.info("Image evicted from cache", image_hash=name, size_bytes=size)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+
+class ImageStore:
+    """Resolves job diagrams from the local cache, falling back to S3."""
+
+    def __init__(self, config: ThreatModelingConfig):
+        self.bucket = os.environ.get(ENV_ARCHITECTURE_BUCKET)
+        self.max_dimension = config.image_max_dimension
+        self.quality = config.image_quality
+        self.cache = ImageCache(
+            IMAGE_CACHE_DIRECTORY, config.image_cache_max_mb * 1024 * 1024
+        )
+
+    async def load(
+        self, job_id: str, s3_location: str, image_hash: Optional[str] = None
+    ) -> StoredImage:
+        """Return the prepared diagram of a job.
+
+        Args:
+            job_id: Job the diagram belongs to
+            s3_location: Key of the diagram in the architecture bucket
+            image_hash: Content hash of the diagram, when already known
+
+        Returns:
+            StoredImage: The prepared diagram, cached for later lookups
+        """
+        if image_hash:
+            image = await asyncio.to_thread(self.cache.get, image_hash)
+            if image is not None:
+                logger.debug("Image cache hit", job_id=job_id, image_hash=image_hash)
+                return image
+
+        image_bytes = await asyncio.to_thread(read_s3_image, self.bucket, s3_location)
+        # Hash of the upload, independent of the preprocessing settings
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        image = await asyncio.to_thread(self.cache.get, image_hash)
+        if image is not None:
+            logger.debug("Image cache hit", job_id=job_id, image_hash=image_hash)
+            return image
+
+        logger.info("Image cache miss", job_id=job_id, image_hash=image_hash)
+        prepared = await asyncio.to_thread(
+            prepare_image, image_bytes, self.max_dimension, self.quality
+        )
+        image = StoredImage(
+            image_hash=image_hash,
+            data=base64.b64encode(prepared.data).decode("ascii"),
+            mime_type=prepared.mime_type,
+        )
+        await asyncio.to_thread(self.cache.put, image)
+        return image
+
+    async def get(self, state: dict) -> StoredImage:
+        """Return the prepared diagram referenced by an agent state."""
+        return await self.load(
+            state.get("job_id", "unknown"),
+            state["s3_location"],
+            state.get("image_hash"),
+        )
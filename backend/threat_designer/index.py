@@ -2,30 +2,35 @@
 AWS Lambda handler for threat modeling analysis.
 """
 
+import asyncio
 import json
 import os
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import boto3
+from accounting import current_accounting, start_job_accounting
+from call_policy import start_deadline
 from config import ThreatModelingConfig
-from constants import (ENV_AGENT_STATE_TABLE, ENV_ARCHITECTURE_BUCKET,
+from constants import (CACHE_NAMESPACE_RESULT, ENV_AGENT_STATE_TABLE,
                        ENV_TRACEBACK_ENABLED, ERROR_INVALID_REASONING_TYPE,
                        ERROR_INVALID_REASONING_VALUE,
-                       ERROR_MISSING_REQUIRED_FIELDS, ERROR_VALIDATION_FAILED,
-                       HTTP_STATUS_BAD_REQUEST,
+                       ERROR_MISSING_REQUIRED_FIELDS, ERROR_NO_CHECKPOINT,
+                       ERROR_VALIDATION_FAILED, HTTP_STATUS_BAD_REQUEST,
                        HTTP_STATUS_INTERNAL_SERVER_ERROR, HTTP_STATUS_OK,
                        HTTP_STATUS_UNPROCESSABLE_ENTITY, REASONING_DISABLED,
                        VALID_REASONING_VALUES, JobState)
-from exceptions import ThreatModelingError, ValidationError
+from continuation import ContinuationPlanner
+from exceptions import ThreatModelingError, ValidationError, is_transient
 from model_utils import initialize_models
 from monitoring import logger, operation_context, with_error_context
+from result_cache import result_cache_key
 from state import AgentState, AssetsList, FlowsList
-from utils import fetch_results, parse_s3_image_to_base64, update_job_state
-from workflow import ConfigSchema, agent
+from state_tracking_service import ProgressPersister
+from utils import fetch_results, update_job_state
+from workflow import ConfigSchema, agent, checkpointer, orchestrator
 
 dynamodb = boto3.resource("dynamodb")
-S3_BUCKET = os.environ.get(ENV_ARCHITECTURE_BUCKET)
 AGENT_TABLE = os.environ.get(ENV_AGENT_STATE_TABLE)
 
 
@@ -57,12 +62,24 @@ def _create_agent_config(event: Dict[str, Any]) -> ConfigSchema:
         "model_main": models["main_model"],
         "model_struct": models["struct_model"],
         "model_summary": models["summary_model"],
-        "start_time": datetime.now(),
+        "model_fallbacks": {
+            "model_main": models["main_model_fallbacks"],
+            "model_struct": models["struct_model_fallbacks"],
+            "model_summary": models["summary_model_fallbacks"],
+        },
+        # Continuations keep the start time of the job's first invocation
+        "start_time": (
+            datetime.fromisoformat(event["start_time"])
+            if event.get("start_time")
+            else datetime.now()
+        ),
         "reasoning": thinking,
+        "thread_id": event["id"],
+        "bypass_cache": bool(event.get("bypass_cache", False)),
     }
 
 
-def _initialize_state(event: Dict[str, Any], job_id: str) -> AgentState:
+async def _initialize_state(event: Dict[str, Any], job_id: str) -> AgentState:
     """
     Initialize the agent state for threat modeling analysis.
 
@@ -87,12 +104,145 @@ def _initialize_state(event: Dict[str, Any], job_id: str) -> AgentState:
         )
 
         if replay_mode:
-            return _handle_replay_state(state, job_id)
-        return _handle_new_state(state, event)
+            return await _handle_replay_state(state, job_id)
+        return await _handle_new_state(state, event)
+
+
+@with_error_context("prepare checkpointed run")
+async def _prepare_checkpointed_run(
+    event: Dict[str, Any], job_id: str, config: Dict[str, Any]
+) -> Optional[AgentState]:
+    """
+    Prepare the workflow input, resuming from the last checkpoint when asked.
+
+    Args:
+        event: The Lambda event containing job configuration
+        job_id: Unique identifier for the analysis job
+        config: Full configuration for the agent
+
+    Returns:
+        Optional[AgentState]: Initial state for a fresh run, or None to
+        continue the checkpointed run of the job
+
+    Raises:
+        ValidationError: If a resume is requested without a stored checkpoint
+    """
+    with operation_context("prepare_checkpointed_run", job_id):
+        if event.get("resume", False):
+            checkpoint = (
+                await checkpointer.aget_tuple(config) if checkpointer else None
+            )
+            if checkpoint is None:
+                logger.error("No checkpoint found for resume", job_id=job_id)
+                raise ValidationError(ERROR_NO_CHECKPOINT)
+
+            logger.info(
+                "Resuming from checkpoint",
+                job_id=job_id,
+                checkpoint_id=checkpoint.config["configurable"]["checkpoint_id"],
+                step=checkpoint.metadata.get("step"),
+            )
+            return None
+
+        # A fresh run (new job or replay) must not continue a stale thread
+        if checkpointer:
+            await checkpointer.adelete_thread(job_id)
+        return await _initialize_state(event, job_id)
+
+
+@with_error_context("serve cached result")
+async def _serve_cached_result(
+    state: AgentState, event: Dict[str, Any], agent_config: ConfigSchema
+) -> bool:
+    """
+    Complete a new job from the result cache when an identical run exists.
+
+    Sets the job's ``cache_key`` so the run stores its results at finalize.
+
+    Args:
+        state: Initialized state of a new job
+        event: The Lambda event containing job configuration
+        agent_config: Configuration of the agent
+
+    Returns:
+        bool: True if the job was completed from the cache
+    """
+    job_id = state["job_id"]
+    with operation_context("serve_cached_result", job_id):
+        state["cache_key"] = result_cache_key(
+            state["image_hash"],
+            state.get("description"),
+            state.get("assumptions"),
+            [
+                agent_config[model].model
+                for model in ["model_main", "model_struct", "model_summary"]
+            ],
+            int(event.get("reasoning", str(REASONING_DISABLED))),
+            state.get("iteration", 0),
+        )
+
+        result_cache = orchestrator.result_cache
+        if result_cache is None or event.get("bypass_cache", False):
+            return False
+
+        try:
+            result = await asyncio.to_thread(
+                result_cache.get, CACHE_NAMESPACE_RESULT, state["cache_key"], job_id
+            )
+            if result is None:
+                return False
+
+            await orchestrator.state_service.restore_results(state, result)
+            await orchestrator.state_service.update_job_state(
+                job_id, JobState.COMPLETE.value
+            )
+        except Exception as e:
+            # The cache is an optimization only: run the job instead
+            logger.warning(
+                "Serving cached result failed, running the job",
+                job_id=job_id,
+                error=str(e),
+            )
+            return False
+
+        logger.info(
+            "Job completed from result cache",
+            job_id=job_id,
+            threats_count=len(result.get("threats", [])),
+        )
+        return True
+
+
+async def _release_job_resources(
+    job_id: str, config: Dict[str, Any], state: Optional[AgentState]
+) -> None:
+    """
+    Delete the prompt caches and diagram upload of a failed job.
+
+    Both live on the provider side until their TTL otherwise. A resumed run
+    finds its upload in the checkpoint.
+
+    Args:
+        job_id: ID of the failed job
+        config: Configuration of the agent run
+        state: Initial state of the run, None on resume
+    """
+    await orchestrator.prompt_cache.release(job_id)
+
+    image_uri = state.get("image_uri") if state else None
+    if image_uri is None and checkpointer:
+        try:
+            image_uri = (await agent.aget_state(config)).values.get("image_uri")
+        except Exception as e:
+            logger.warning(
+                "Failed to look up the diagram upload", job_id=job_id, error=str(e)
+            )
+    if image_uri:
+        await orchestrator.file_service.delete(job_id, image_uri)
 
 
 @with_error_context("handle replay state")
-def _handle_replay_state(state: AgentState, job_id: str) -> AgentState:
+async def _handle_replay_state(state: AgentState, job_id: str) -> AgentState:
     """
     Handle replay of previous analysis by loading saved state.
 
@@ -106,8 +256,12 @@ def _handle_replay_state(state: AgentState, job_id: str) -> AgentState:
     with operation_context("handle_replay", job_id):
         logger.info("Loading replay state", job_id=job_id)
 
-        results = fetch_results(job_id, AGENT_TABLE)
+        results = await asyncio.to_thread(fetch_results, job_id, AGENT_TABLE)
         item = results["item"]
+        # Diagrams of earlier runs are usually still in the local image cache
+        image = await orchestrator.image_store.load(
+            job_id, item["s3_location"], item.get("image_hash")
+        )
 
         # Parse stored data back into proper types
         assets = AssetsList(**item["assets"]) if item.get("assets") else None
@@ -124,7 +278,7 @@ def _handle_replay_state(state: AgentState, job_id: str) -> AgentState:
                 "assets": assets,
                 "system_architecture": system_architecture,
                 "retry": 1,
-                "image_data": parse_s3_image_to_base64(S3_BUCKET, item["s3_location"]),
+                "image_hash": image.image_hash,
                 "description": item.get("description", ""),
                 "assumptions": item.get("assumptions", []),
                 "title": item.get("title"),
@@ -144,7 +298,7 @@ def _handle_replay_state(state: AgentState, job_id: str) -> AgentState:
 
 
 @with_error_context("handle new state")
-def _handle_new_state(state: AgentState, event: Dict[str, Any]) -> AgentState:
+async def _handle_new_state(state: AgentState, event: Dict[str, Any]) -> AgentState:
     """
     Initialize state for new analysis.
 
@@ -168,9 +322,10 @@ def _handle_new_state(state: AgentState, event: Dict[str, Any]) -> AgentState:
             )
             raise ValidationError(f"{ERROR_MISSING_REQUIRED_FIELDS}: {missing_fields}")
 
+        image = await orchestrator.image_store.load(job_id, event["s3_location"])
         state.update(
             {
-                "image_data": parse_s3_image_to_base64(S3_BUCKET, event["s3_location"]),
+                "image_hash": image.image_hash,
                 "description": event.get("description", " "),
                 "assumptions": event.get("assumptions", []),
                 "s3_location": event["s3_location"],
@@ -256,14 +411,21 @@ def _handle_error_response(
         "Request failed",
         error_type=error_type,
         error_message=error_msg,
+        transient=is_transient(error),
         job_id=job_id,
         status_code=status_code,
         exc_info=show_traceback,
     )
 
     if job_id:
+        # Usage and retries of the failed job are kept for analysis
+        accounting = current_accounting()
         try:
-            update_job_state(job_id, JobState.FAILED.value)
+            update_job_state(
+                job_id,
+                JobState.FAILED.value,
+                accounting=accounting.summary() if accounting else None,
+            )
             logger.info("Updated job state to FAILED", job_id=job_id)
         except Exception as update_error:
             logger.error(
@@ -278,6 +440,7 @@ def _handle_error_response(
         "ValueError": "Invalid request parameters",
         "KeyError": "Missing required data",
         "ThreatModelingError": "Threat modeling process failed",
+        "TransientError": "Threat modeling process failed, please retry",
     }
 
     user_message = error_messages.get(error_type, "Internal server error occurred")
@@ -294,6 +457,25 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     """
     AWS Lambda handler for threat modeling analysis using the refactored agent.
 
+    Synchronous entry point that drives :func:`async_lambda_handler` on a fresh
+    event loop, keeping the Lambda handler contract unchanged.
+
+    Args:
+        event: Lambda event containing job configuration
+        context: Lambda context object
+
+    Returns:
+        Dict: Response containing status code and execution result
+    """
+    return asyncio.run(async_lambda_handler(event, context))
+
+
+async def async_lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
+    """
+    Run a threat modeling job on the current event loop.
+
+    Several jobs can be awaited concurrently from one process.
+
     Args:
         event: Lambda event containing job configuration
         context: Lambda context object
@@ -326,23 +508,87 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
             # Create agent configuration
             agent_config = _create_agent_config(event)
 
-            # Initialize state
-            state = _initialize_state(event, job_id)
-
-            # Log execution start
-            logger.info(
-                "Starting threat modeling analysis",
-                job_id=job_id,
-                replay=event.get("replay", False),
-                reasoning=agent_config["reasoning"],
-                iteration=state.get("iteration", 0),
-            )
-
             # Create full configuration for the agent
             config = {"configurable": agent_config}
 
-            # Execute the threat modeling workflow
-            agent.invoke(state, config=config)
+            # Initialize state, or pick up the checkpointed run on resume
+            state = await _prepare_checkpointed_run(event, job_id, config)
+
+            # Identical resubmissions reuse the results of a previous run
+            if (
+                state is not None
+                and not state.get("replay", False)
+                and await _serve_cached_result(state, event, agent_config)
+            ):
+                return {
+                    "statusCode": HTTP_STATUS_OK,
+                    "body": json.dumps(
+                        {
+                            "message": "Threat modeling served from cache",
+                            "job_id": job_id,
+                            "request_id": request_id,
+                        }
+                    ),
+                }
+
+            try:
+                # Upload the diagram once, model calls then reference it by URI
+                if state is not None:
+                    image = await orchestrator.image_store.get(state)
+                    state["image_uri"] = await orchestrator.file_service.upload(
+                        job_id, image.data, image.mime_type
+                    )
+
+                # Log execution start
+                logger.info(
+                    "Starting threat modeling analysis",
+                    job_id=job_id,
+                    replay=event.get("replay", False),
+                    resume=state is None,
+                    reasoning=agent_config["reasoning"],
+                    iteration=state.get("iteration", 0) if state else None,
+                )
+
+                # Account tokens and latency of the job across its invocations
+                accounting = start_job_accounting(job_id, event.get("accounting"))
+
+                # Execute the threat modeling workflow, persisting partial
+                # results as each step completes and handing the job over to a
+                # new invocation before the Lambda timeout
+                persister = ProgressPersister(orchestrator.state_service, job_id)
+                planner = ContinuationPlanner(context, threat_config, event)
+                # Model calls must end before the invocation does
+                start_deadline(planner.remaining_seconds())
+                stream = agent.astream(state, config=config, stream_mode="values")
+                try:
+                    async for snapshot in stream:
+                        await persister.persist(snapshot)
+                        planner.record_step()
+                        if checkpointer and planner.should_hand_over():
+                            break
+                finally:
+                    await stream.aclose()
+
+                if checkpointer and (await agent.aget_state(config)).next:
+                    # The next invocation caches its own prefixes, possibly in
+                    # another container; the diagram upload is still in use
+                    await orchestrator.prompt_cache.release(job_id)
+                    await planner.hand_over(
+                        event, agent_config["start_time"], accounting.summary()
+                    )
+                    return {
+                        "statusCode": HTTP_STATUS_OK,
+                        "body": json.dumps(
+                            {
+                                "message": "Threat modeling continued in a new invocation",
+                                "job_id": job_id,
+                                "request_id": request_id,
+                            }
+                        ),
+                    }
+            except Exception:
+                await _release_job_resources(job_id, config, state)
+                raise
 
             logger.info(
                 "Threat modeling completed successfully",
@@ -365,16 +611,26 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
             }
 
     except ValidationError as e:
-        return _handle_error_response(e, job_id, HTTP_STATUS_BAD_REQUEST)
+        return await asyncio.to_thread(
+            _handle_error_response, e, job_id, HTTP_STATUS_BAD_REQUEST
+        )
 
     except ValueError as e:
-        return _handle_error_response(e, job_id, HTTP_STATUS_BAD_REQUEST)
+        return await asyncio.to_thread(
+            _handle_error_response, e, job_id, HTTP_STATUS_BAD_REQUEST
+        )
 
     except KeyError as e:
-        return _handle_error_response(e, job_id, HTTP_STATUS_BAD_REQUEST)
+        return await asyncio.to_thread(
+            _handle_error_response, e, job_id, HTTP_STATUS_BAD_REQUEST
+        )
 
     except ThreatModelingError as e:
-        return _handle_error_response(e, job_id, HTTP_STATUS_UNPROCESSABLE_ENTITY)
+        return await asyncio.to_thread(
+            _handle_error_response, e, job_id, HTTP_STATUS_UNPROCESSABLE_ENTITY
+        )
 
     except Exception as e:
-        return _handle_error_response(e, job_id, HTTP_STATUS_INTERNAL_SERVER_ERROR)
+        return await asyncio.to_thread(
+            _handle_error_response, e, job_id, HTTP_STATUS_INTERNAL_SERVER_ERROR
+        )
@@ -1,8 +1,10 @@
 """Message building utilities for model interactions."""
 
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Union
 
+from constants import IMAGE_MIME_TYPE_JPEG, PROMPT_FIELD_SEPARATOR
 from langchain_core.messages.human import HumanMessage
+from state import AssetsList, FlowsList, ThreatsList
 
 
 class MessageBuilder:
@@ -13,34 +15,79 @@ class MessageBuilder:
         image_data: str,
         description: str,
         assumptions: str,
+        image_uri: Optional[str] = None,
+        image_mime_type: Optional[str] = None,
     ) -> None:
-        """Message builder constructor"""
+        """Message builder constructor
+
+        The diagram is referenced by ``image_uri`` when it was uploaded to the
+        provider, and embedded inline otherwise.
+        """
 
         self.image_data = image_data
         self.description = description
         self.assumptions = assumptions
+        self.image_uri = image_uri
+        self.image_mime_type = image_mime_type or IMAGE_MIME_TYPE_JPEG
 
-    def base_msg(self, caching: bool = False) -> List[Dict[str, Any]]:
-        """Base message for all messages."""
+    def image_part(self) -> Dict[str, Any]:
+        """Content part carrying the architecture diagram."""
+
+        if self.image_uri:
+            return {
+                "type": "media",
+                "file_uri": self.image_uri,
+                "mime_type": self.image_mime_type,
+            }
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:{self.image_mime_type};base64,{self.image_data}"
+            },
+        }
 
-        cache_config = {"cachePoint": {"type": "default"}}
+    def base_msg(self) -> List[Dict[str, Any]]:
+        """Base message for all messages."""
 
         base_message = [
             {"type": "text", "text": "<architecture_diagram>"},
-            {
-                "type": "image_url",
-                "image_url": {"url": f"data:image/jpeg;base64,{self.image_data}"},
-            },
+            self.image_part(),
             {"type": "text", "text": "</architecture_diagram>"},
             {"type": "text", "text": f"<description>{self.description}</description>"},
             {"type": "text", "text": f"<assumptions>{self.assumptions}</assumptions>"},
         ]
 
-        if caching:
-            base_message.append(cache_config)
-
         return base_message
 
+    def context_msg(
+        self, assets: Union[AssetsList, str], flows: Union[FlowsList, str]
+    ) -> List[Dict[str, Any]]:
+        """Assets and data flows of the architecture."""
+
+        return [
+            {
+                "type": "text",
+                "text": f"<identified_assets_and_entities>{format_assets(assets)}</identified_assets_and_entities>",
+            },
+            {"type": "text", "text": f"<data_flow>{format_flows(flows)}</data_flow>"},
+        ]
+
+    def create_prefix_message(
+        self,
+        assets: Optional[Union[AssetsList, str]] = None,
+        flows: Optional[Union[FlowsList, str]] = None,
+    ) -> HumanMessage:
+        """Create the prompt prefix shared by the calls of a stage.
+
+        The prefix is the base message, followed by the assets and data flows
+        when given. Messages created with ``include_prefix=False`` continue it.
+        """
+
+        prefix_message = self.base_msg()
+        if assets is not None:
+            prefix_message.extend(self.context_msg(assets, flows))
+        return HumanMessage(content=prefix_message)
+
     def create_summary_message(self, max_words: int = 40) -> HumanMessage:
         """Create summary message."""
 
@@ -68,14 +115,14 @@ class MessageBuilder:
 
     def create_system_flows_message(
         self,
-        assets: str,
+        assets: Union[AssetsList, str],
     ) -> HumanMessage:
         """Create system flows message."""
 
         system_flows_msg = [
             {
                 "type": "text",
-                "text": f"<identified_assets_and_entities>{assets}</identified_assets_and_entities>",
+                "text": f"<identified_assets_and_entities>{format_assets(assets)}</identified_assets_and_entities>",
             },
             {"type": "text", "text": "Identify system flows"},
         ]
@@ -84,35 +131,69 @@ class MessageBuilder:
         base_message.extend(system_flows_msg)
         return HumanMessage(content=base_message)
 
-    def create_threat_message(self, assets: str, flows: str) -> HumanMessage:
-        """Create threat analysis message."""
+    def create_threat_message(
+        self,
+        assets: Union[AssetsList, str],
+        flows: Union[FlowsList, str],
+        stride_category: Optional[str] = None,
+        partial_flows: bool = False,
+        include_prefix: bool = True,
+    ) -> HumanMessage:
+        """Create threat analysis message.
+
+        When ``stride_category`` is given the request is narrowed to threats of
+        that STRIDE category only. ``partial_flows`` marks ``flows`` as one
+        partition of the architecture's data flows and trust boundaries.
+        Without ``include_prefix`` the base message is left out.
+        """
 
         threat_msg = [
-            {
-                "type": "text",
-                "text": f"<identified_assets_and_entities>{assets}</identified_assets_and_entities>",
-            },
-            {"type": "text", "text": f"<data_flow>{flows}</data_flow>"},
+            *self.context_msg(assets, flows),
             {"type": "text", "text": "Define threats and mitigations for the solution"},
         ]
 
+        if partial_flows:
+            threat_msg.append(
+                {
+                    "type": "text",
+                    "text": "The <data_flow> lists only part of the architecture. Only define threats involving these data flows and trust boundaries",
+                }
+            )
+
+        if stride_category:
+            threat_msg.append(
+                {
+                    "type": "text",
+                    "text": f"Only define threats of the {stride_category} STRIDE category",
+                }
+            )
+
+        if not include_prefix:
+            return HumanMessage(content=threat_msg)
+
         base_message = self.base_msg()
         base_message.extend(threat_msg)
         return HumanMessage(content=base_message)
 
     def create_threat_improve_message(
-        self, assets: str, flows: str, threat_list: str, gap: str
+        self,
+        assets: Union[AssetsList, str],
+        flows: Union[FlowsList, str],
+        threat_list: Union[ThreatsList, str],
+        gap: str,
+        include_prefix: bool = True,
     ) -> HumanMessage:
-        """Create threat improvement analysis message."""
+        """Create threat improvement analysis message.
+
+        Without ``include_prefix`` the base message, assets and data flows are
+        left out.
+        """
 
         threat_msg = [
             {
                 "type": "text",
-                "text": f"<identified_assets_and_entities>{assets}</identified_assets_and_entities>",
+                "text": f"<threats>{format_threats(threat_list)}</threats>",
             },
-            {"type": "text", "text": f"<data_flow>{flows}</data_flow>"},
-            {"cachePoint": {"type": "default"}},
-            {"type": "text", "text": f"<threats>{threat_list}</threats>"},
             {"type": "text", "text": f"<gap>{gap}</gap>"},
             {
                 "type": "text",
@@ -120,23 +201,32 @@ class MessageBuilder:
             },
         ]
 
-        base_message = self.base_msg(caching=True)
+        if not include_prefix:
+            return HumanMessage(content=threat_msg)
+
+        base_message = self.create_prefix_message(assets, flows).content
         base_message.extend(threat_msg)
         return HumanMessage(content=base_message)
 
     def create_gap_analysis_message(
-        self, assets: str, flows: str, threat_list: str, gap: str
+        self,
+        assets: Union[AssetsList, str],
+        flows: Union[FlowsList, str],
+        threat_list: Union[ThreatsList, str],
+        gap: str,
+        include_prefix: bool = True,
     ) -> HumanMessage:
-        """Create threat improvement analysis message."""
+        """Create threat improvement analysis message.
+
+        Without ``include_prefix`` the base message, assets and data flows are
+        left out.
+        """
 
         gap_msg = [
             {
                 "type": "text",
-                "text": f"<identified_assets_and_entities>{assets}</identified_assets_and_entities>",
+                "text": f"<threats>{format_threats(threat_list)}</threats>",
             },
-            {"type": "text", "text": f"<data_flow>{flows}</data_flow>"},
-            {"cachePoint": {"type": "default"}},
-            {"type": "text", "text": f"<threats>{threat_list}</threats>"},
             {"type": "text", "text": f"<previous_gap>{gap}</previous_gap>\n"},
             {
                 "type": "text",
@@ -144,11 +234,126 @@ class MessageBuilder:
             },
         ]
 
-        base_message = self.base_msg(caching=True)
+        if not include_prefix:
+            return HumanMessage(content=gap_msg)
+
+        base_message = self.create_prefix_message(assets, flows).content
         base_message.extend(gap_msg)
         return HumanMessage(content=base_message)
 
 
+def format_assets(assets: Union[AssetsList, str]) -> str:
+    """Encode assets as a table with one line per asset."""
+    if isinstance(assets, str):
+        return assets
+    return _table(
+        ["id", "type", "name", "description"],
+        [
+            [f"A{index}", asset.type, asset.name, asset.description]
+            for index, asset in enumerate(assets.assets, start=1)
+        ],
+    )
+
+
+def format_flows(flows: Union[FlowsList, str]) -> str:
+    """Encode data flows, trust boundaries and threat sources as tables."""
+    if isinstance(flows, str):
+        return flows
+    sections = [
+        (
+            "data_flows",
+            ["id", "source", "target", "description"],
+            [
+                [
+                    f"F{index}",
+                    flow.source_entity,
+                    flow.target_entity,
+                    flow.flow_description,
+                ]
+                for index, flow in enumerate(flows.data_flows, start=1)
+            ],
+        ),
+        (
+            "trust_boundaries",
+            ["id", "source", "target", "purpose"],
+            [
+                [
+                    f"B{index}",
+                    boundary.source_entity,
+                    boundary.target_entity,
+                    boundary.purpose,
+                ]
+                for index, boundary in enumerate(flows.trust_boundaries, start=1)
+            ],
+        ),
+        (
+            "threat_sources",
+            ["id", "category", "description", "example"],
+            [
+                [f"S{index}", source.category, source.description, source.example]
+                for index, source in enumerate(flows.threat_sources, start=1)
+            ],
+        ),
+    ]
+    return "\n".join(
+        f"{name}:\n{_table(header, rows)}" for name, header, rows in sections if rows
+    )
+
+
+def format_threats(threats: Union[ThreatsList, str]) -> str:
+    """Encode a threat catalog as a table with one line per threat.
+
+    Threat ids follow the catalog order, which only grows between iterations,
+    so a threat keeps its id across the calls of a job.
+    """
+    if isinstance(threats, str):
+        return threats
+    return _table(
+        [
+            "id",
+            "name",
+            "stride_category",
+            "target",
+            "impact",
+            "likelihood",
+            "description",
+            "mitigations",
+        ],
+        [
+            [
+                f"T{index}",
+                threat.name,
+                threat.stride_category,
+                threat.target,
+                threat.impact,
+                threat.likelihood,
+                threat.description,
+                "; ".join(threat.mitigations),
+            ]
+            for index, threat in enumerate(threats.threats, start=1)
+        ],
+    )
+
+
+def _table(header: List[str], rows: Iterable[List[Any]]) -> str:
+    """Lines of separated fields, starting with the field names.
+
+    Whitespace is collapsed and separators inside fields are replaced, so
+    each row stays on one line with a fixed number of fields.
+    """
+    lines = [PROMPT_FIELD_SEPARATOR.join(header)]
+    for row in rows:
+        lines.append(
+            PROMPT_FIELD_SEPARATOR.join(
+                " ".join(str(field).split()).replace(
+                    PROMPT_FIELD_SEPARATOR.strip(), "/"
+                )
+                for field in row
+            )
+        )
+    return "\n".join(lines) if len(lines) > 1 else ""
+
+
 def list_to_string(str_list: List[str]) -> str:
     """Convert a list of strings to a single string."""
     if not str_list:
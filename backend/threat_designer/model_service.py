@@ -1,46 +1,361 @@
 """Model service layer for centralized model interactions."""
 
-from typing import Any, Dict, List, Optional, Type
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
 
-from constants import ERROR_MODEL_INIT_FAILED
-from exceptions import ModelInvocationError
+from accounting import current_accounting, current_operation, model_id
+from call_policy import CallPolicy, stage_name
+from circuit_breaker import ModelRouter
+from constants import ERROR_MODEL_INIT_FAILED, THROTTLE_BACKOFF_SECONDS
+from exceptions import ModelInvocationError, ThreatModelingError, is_transient
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, SystemMessage
 from langchain_core.messages.human import HumanMessage
+from langchain_core.runnables import Runnable
 from langchain_core.runnables.config import RunnableConfig
 from monitoring import logger, with_error_context
+from prompt_cache import PromptCache, is_cache_miss_error
+from rate_limiter import ModelRateLimiter, estimate_tokens, is_rate_limit_error
 from utils import handle_asset_error
 
+# Bound tool models kept at most; a container only sees a few models
+_MAX_BOUND_MODELS = 64
+
 
 class ModelService:
     """Service for managing model interactions."""
 
+    def __init__(
+        self,
+        prompt_cache: Optional[PromptCache] = None,
+        rate_limiter: Optional[ModelRateLimiter] = None,
+        call_policy: Optional[CallPolicy] = None,
+        router: Optional[ModelRouter] = None,
+    ):
+        self.prompt_cache = prompt_cache
+        self.rate_limiter = rate_limiter
+        self.call_policy = call_policy
+        self.router = router
+        # Tool bindings by model, tools and tool choice, with the bound model
+        self._bound_models: "OrderedDict[Tuple, Tuple[Any, Runnable]]" = OrderedDict()
+
     @with_error_context("model invocation")
-    def invoke_structured_model(
+    async def invoke_structured_model(
         self,
         messages: List[HumanMessage],
         tools: List[Type],
         config: RunnableConfig,
         reasoning: bool = False,
+        max_output_tokens: Optional[int] = None,
+        cached_content: Optional[str] = None,
     ) -> Any:
-        """Invoke model with structured output and error handling."""
+        """Invoke model with structured output and error handling.
+
+        ``max_output_tokens`` caps the generation of this call only, below the
+        limit the model was initialized with. ``messages`` continue the
+        ``cached_content`` when given.
+        """
         model = config["configurable"].get("model_main")
-        model_structured = config["configurable"].get("model_struct")
+        model_structured = self._available(config, "model_struct")[0]
 
-        model_with_tools = model.bind_tools(
-            tools, tool_choice="any" if not reasoning else None
-        )
+        invoke_kwargs = {}
+        if cached_content:
+            # The system prompt and tools are part of the main model's cache
+            models = [model]
+            invoke_kwargs["cached_content"] = cached_content
+        else:
+            models = self._available(config, "model_main")
+
+        if max_output_tokens:
+            invoke_kwargs["generation_config"] = {
+                "max_output_tokens": max_output_tokens
+            }
 
         try:
-            response = model_with_tools.invoke(messages)
-            return self._process_structured_response(
+            response = await self._ainvoke_routed(
+                model,
+                models,
+                lambda candidate: (
+                    candidate
+                    if cached_content
+                    else self._bind_tools(
+                        candidate, tools, self._tool_choice(reasoning)
+                    )
+                ),
+                messages,
+                **invoke_kwargs,
+            )
+            return await self._process_structured_response(
                 response, tools[0], model_structured, reasoning
             )
         except Exception as e:
             logger.error(f"{ERROR_MODEL_INIT_FAILED}: {e}")
-            raise ModelInvocationError(f"{ERROR_MODEL_INIT_FAILED}: {str(e)}")
+            raise ModelInvocationError(f"{ERROR_MODEL_INIT_FAILED}: {str(e)}") from e
+
+    async def invoke_cached_structured_model(
+        self,
+        job_id: str,
+        stage: str,
+        system_prompt: SystemMessage,
+        prefix: HumanMessage,
+        message: HumanMessage,
+        tools: List[Type],
+        config: RunnableConfig,
+        reasoning: bool = False,
+        max_output_tokens: Optional[int] = None,
+    ) -> Any:
+        """Invoke model with the stage's prompt prefix served from the cache.
+
+        ``message`` continues ``prefix``. Without a cached prefix, or when the
+        provider no longer has it, the full prompt is sent instead.
+        """
+        model = config["configurable"].get("model_main")
+        # Caches belong to the main model, unused while it is failed over
+        if (
+            self.prompt_cache is not None
+            and self._available(config, "model_main")[0] is model
+        ):
+            cached_content = await self.prompt_cache.acquire(
+                job_id,
+                stage,
+                config["configurable"].get("model_main"),
+                [system_prompt, prefix],
+                tools,
+                self._tool_choice(reasoning),
+            )
+            if cached_content:
+                try:
+                    return await self.invoke_structured_model(
+                        [message],
+                        tools,
+                        config,
+                        reasoning,
+                        max_output_tokens,
+                        cached_content=cached_content,
+                    )
+                except ThreatModelingError as e:
+                    # Other failures, transient ones included, are left to the
+                    # node's retry policy
+                    if not is_cache_miss_error(e):
+                        raise
+                    # E.g. the cached content expired during a long job
+                    logger.warning(
+                        "Cached prompt prefix missing, sending full prompts",
+                        job_id=job_id,
+                        stage=stage,
+                        error=str(e),
+                    )
+                    await self.prompt_cache.invalidate(job_id, stage)
+                    accounting = current_accounting()
+                    if accounting is not None:
+                        accounting.increment("retries")
+
+        full_message = HumanMessage(content=prefix.content + message.content)
+        return await self.invoke_structured_model(
+            [system_prompt, full_message],
+            tools,
+            config,
+            reasoning,
+            max_output_tokens,
+        )
+
+    def _available(self, config: RunnableConfig, role: str) -> List[Any]:
+        """Models of a role's fallback chain that are not failed, in order."""
+        configurable = config["configurable"]
+        models = [
+            configurable.get(role),
+            *configurable.get("model_fallbacks", {}).get(role, []),
+        ]
+        if self.router is None:
+            return models[:1]
+        return self.router.available(models)
+
+    async def _ainvoke_routed(
+        self,
+        primary: Any,
+        models: List[Any],
+        bind: Callable[[Any], Runnable],
+        messages: List[Any],
+        **kwargs: Any,
+    ) -> AIMessage:
+        """Invoke the first healthy model of a fallback chain.
+
+        A model whose breaker refuses the call is skipped, and a transient
+        failure moves on to the next model. The last model is always tried, so
+        the breakers route calls but never refuse them all; a call its breaker
+        refused is left out of the breaker's record. Calls not served by
+        ``primary``, the configured model, are counted as fallbacks.
+        """
+        if self.router is None:
+            return await self._ainvoke(models[0], bind(models[0]), messages, **kwargs)
 
-    def _process_structured_response(
+        error = None
+        for model in models:
+            name = model_id(model)
+            breaker = self.router.breaker(name)
+            allowed = breaker.allow()
+            # The last model is tried regardless, there is nothing to route to
+            if not allowed and model is not models[-1]:
+                continue
+
+            start_time = time.monotonic()
+            try:
+                response = await self._ainvoke(model, bind(model), messages, **kwargs)
+            except asyncio.CancelledError:
+                if allowed:
+                    breaker.abandon()
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    # The request is at fault rather than the model
+                    if allowed:
+                        breaker.abandon()
+                    raise
+                if allowed:
+                    breaker.record(True, time.monotonic() - start_time)
+                logger.warning(
+                    "Model call failed, trying the next model", model_id=name
+                )
+                error = e
+                continue
+
+            if allowed:
+                breaker.record(False, time.monotonic() - start_time)
+            if model is not primary:
+                accounting = current_accounting()
+                if accounting is not None:
+                    accounting.increment("fallbacks")
+                logger.warning(
+                    "Call served by a fallback model",
+                    model_id=name,
+                    primary_model_id=model_id(primary),
+                )
+            return response
+
+        raise error
+
+    async def _ainvoke(
+        self, model: Any, runnable: Runnable, messages: List[Any], **kwargs: Any
+    ) -> AIMessage:
+        """Invoke a model within its deadline, hedging slow calls."""
+        if self.call_policy is None:
+            return await self._ainvoke_limited(model, runnable, messages, **kwargs)
+        return await self.call_policy.run(
+            stage_name(current_operation()),
+            lambda: self._ainvoke_limited(model, runnable, messages, **kwargs),
+            accept=self._has_output,
+        )
+
+    async def _ainvoke_limited(
+        self, model: Any, runnable: Runnable, messages: List[Any], **kwargs: Any
+    ) -> AIMessage:
+        """Invoke a model within the rate limits, accounting the call to the job.
+
+        Calls throttled by the provider are retried with exponential backoff,
+        up to the configured number of retries.
+        """
+        if self.rate_limiter is None:
+            return await self._ainvoke_once(model, runnable, messages, **kwargs)
+
+        name = model_id(model)
+        estimated_tokens = estimate_tokens(messages)
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(name, estimated_tokens)
+            start_time = time.monotonic()
+            try:
+                response = await self._ainvoke_once(model, runnable, messages, **kwargs)
+            except asyncio.CancelledError:
+                # Losing hedges and calls past their deadline
+                await self.rate_limiter.release(name, estimated_tokens)
+                raise
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                await self.rate_limiter.release(
+                    name, estimated_tokens, throttled=throttled
+                )
+                if not throttled or attempt >= self.rate_limiter.max_retries:
+                    raise
+                accounting = current_accounting()
+                if accounting is not None:
+                    accounting.increment("throttled")
+                delay = THROTTLE_BACKOFF_SECONDS * 2**attempt
+                await asyncio.sleep(delay + random.uniform(0, delay))
+                attempt += 1
+                continue
+
+            await self.rate_limiter.release(
+                name,
+                estimated_tokens,
+                usage=response.usage_metadata,
+                latency=time.monotonic() - start_time,
+            )
+            return response
+
+    @staticmethod
+    async def _ainvoke_once(
+        model: Any, runnable: Runnable, messages: List[Any], **kwargs: Any
+    ) -> AIMessage:
+        """Invoke a model, accounting the call to the running job."""
+        accounting = current_accounting()
+        start_time = time.monotonic()
+        try:
+            response = await runnable.ainvoke(messages, **kwargs)
+        except asyncio.CancelledError:
+            if accounting is not None:
+                accounting.record_call(
+                    model, None, time.monotonic() - start_time, cancelled=True
+                )
+            raise
+        except Exception:
+            if accounting is not None:
+                accounting.record_call(
+                    model, None, time.monotonic() - start_time, failed=True
+                )
+            raise
+
+        if accounting is not None:
+            accounting.record_call(
+                model, response.usage_metadata, time.monotonic() - start_time
+            )
+        return response
+
+    @staticmethod
+    def _has_output(response: AIMessage) -> bool:
+        """Whether a response holds a tool call or text, unlike empty ones."""
+        return bool(response.tool_calls or response.content)
+
+    def _bind_tools(
+        self, model: Any, tools: List[Type], tool_choice: Optional[str] = None
+    ) -> Runnable:
+        """Return the model bound to tools, reusing earlier bindings.
+
+        Binding converts the tool classes to function declarations, which is
+        repeated for every call otherwise. Bindings outlive a job, as models
+        are reused by warm invocations.
+        """
+        key = (id(model), tuple(tools), tool_choice)
+        entry = self._bound_models.get(key)
+        # The entry holds the model, so its id cannot be reused meanwhile
+        if entry is not None and entry[0] is model:
+            self._bound_models.move_to_end(key)
+            return entry[1]
+
+        bound = model.bind_tools(tools, tool_choice=tool_choice)
+        self._bound_models[key] = (model, bound)
+        if len(self._bound_models) > _MAX_BOUND_MODELS:
+            self._bound_models.popitem(last=False)
+        return bound
+
+    @staticmethod
+    def _tool_choice(reasoning: bool) -> Optional[str]:
+        """Force a tool call unless the model reasons first."""
+        return "any" if not reasoning else None
+
+    async def _process_structured_response(
         self,
         response: AIMessage,
         tool_class: Type,
@@ -55,24 +370,26 @@ class ModelService:
             return tool_class(**resp.tool_calls[0]["args"])
 
         return {
-            "structured_response": process_response(response),
+            "structured_response": await process_response(response),
             "reasoning": self.extract_reasoning_content(response),
         }
 
     @with_error_context("summary generation")
-    def generate_summary(
+    async def generate_summary(
         self, messages: List[HumanMessage], tools: List[Type], config: RunnableConfig
     ) -> Any:
         """Generate summary using specified model."""
-        model_summary = config["configurable"].get("model_summary")
-        model_with_tools = model_summary.bind_tools(tools)
-
         try:
-            response = model_with_tools.invoke(messages)
+            response = await self._ainvoke_routed(
+                config["configurable"].get("model_summary"),
+                self._available(config, "model_summary"),
+                lambda model: self._bind_tools(model, tools),
+                messages,
+            )
             return tools[0](**response.tool_calls[0]["args"])
         except Exception as e:
             logger.error(f"Summary generation failed: {e}")
-            raise ModelInvocationError(f"Failed to generate summary: {str(e)}")
+            raise ModelInvocationError(f"Failed to generate summary: {str(e)}") from e
 
     def extract_reasoning_content(self, response: AIMessage) -> Optional[str]:
         """Extract reasoning content from model response."""
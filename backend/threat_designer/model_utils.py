@@ -5,10 +5,13 @@ This module provides model initialization and configuration functions for the Th
 It handles the creation of LangChain-compatible Gemini model clients with various configurations.
 """
 
+import asyncio
 import json
 import os
+import time
+import weakref
 from dataclasses import dataclass
-from typing import Dict, Optional, TypedDict
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
 
 import google.generativeai as genai
 from constants import (DEFAULT_BUDGET,
@@ -27,11 +30,16 @@ class ThreatModelingError(Exception):
     pass
 
 
-class ModelConfig(TypedDict):
-    """Type definition for model configuration."""
+class ModelConfig(TypedDict, total=False):
+    """Type definition for model configuration.
+
+    ``fallbacks`` lists the models to use, in order, while the model is
+    unavailable; their ``max_tokens`` defaults to the model's.
+    """
 
     id: str
     max_tokens: int
+    fallbacks: List["ModelConfig"]
 
 
 @dataclass
@@ -73,12 +81,32 @@ def _load_model_configs() -> ModelConfigurations:
                 raise ValueError(
                     f"Missing required fields 'id' or 'max_tokens' in {model_name}"
                 )
+            fallbacks = model_config.get("fallbacks", [])
+            if not isinstance(fallbacks, list) or not all(
+                isinstance(fallback, dict) and fallback.get("id")
+                for fallback in fallbacks
+            ):
+                raise ValueError(
+                    f"Invalid 'fallbacks' in {model_name}, expected a list of "
+                    "objects with an 'id'"
+                )
+            model_config["fallbacks"] = [
+                {"max_tokens": model_config["max_tokens"], **fallback}
+                for fallback in fallbacks
+            ]
 
         logger.info(
             "Model configurations loaded successfully",
             main_model_id=main_model.get("id"),
             struct_model_id=struct_model.get("id"),
             summary_model_id=summary_model.get("id"),
+            fallback_model_ids=sorted(
+                {
+                    fallback["id"]
+                    for model_config in [main_model, struct_model, summary_model]
+                    for fallback in model_config["fallbacks"]
+                }
+            ),
             reasoning_models_count=len(reasoning_models),
         )
 
@@ -182,29 +210,118 @@ def _build_main_model_config(
     return config
 
 
+class ModelClientRegistry:
+    """Model clients built once per container and reused by warm invocations.
+
+    Clients are keyed by the raw model configurations and the reasoning
+    level, so an invocation with a known key skips parsing the
+    configurations and constructing the clients. Gemini async clients are
+    bound to the event loop that created them and every invocation runs on
+    a fresh loop, so they are reset when a client moves to another loop.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple, Dict[str, Any]] = {}
+        # Event loop the async clients of each entry were created on
+        self._loops: Dict[Tuple, weakref.ref] = {}
+        self._hits = 0
+        self._builds = 0
+        self._build_seconds = 0.0
+
+    def get(
+        self, reasoning: int, api_key: Optional[str], job_id: str
+    ) -> Dict[str, Any]:
+        """Return the clients for a reasoning level, building them on a miss."""
+        started = time.perf_counter()
+        api_key = api_key or os.environ.get(ENV_GOOGLE_API_KEY)
+        key = (
+            reasoning,
+            api_key,
+            *(
+                os.environ.get(name)
+                for name in [
+                    ENV_MAIN_MODEL,
+                    ENV_MODEL_STRUCT,
+                    ENV_MODEL_SUMMARY,
+                    ENV_REASONING_MODELS,
+                ]
+            ),
+        )
+
+        models = self._clients.get(key)
+        reused = models is not None
+        if reused:
+            self._hits += 1
+        else:
+            models = _build_models(reasoning, api_key)
+            self._clients[key] = models
+            self._builds += 1
+            self._build_seconds += time.perf_counter() - started
+        self._bind_to_loop(key, models)
+
+        logger.info(
+            "Model clients ready",
+            job_id=job_id,
+            reused=reused,
+            init_ms=round((time.perf_counter() - started) * 1000, 2),
+            **self.metrics(),
+        )
+        return models
+
+    def metrics(self) -> Dict[str, Any]:
+        """Client reuse counters of this container."""
+        return {
+            "registry_hits": self._hits,
+            "registry_builds": self._builds,
+            "registry_build_ms": round(self._build_seconds * 1000, 2),
+        }
+
+    def _bind_to_loop(self, key: Tuple, models: Dict[str, Any]) -> None:
+        """Drop async clients created on an event loop other than the running one."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        previous = self._loops.get(key)
+        if previous is not None and previous() is not loop:
+            for entry in models.values():
+                for model in entry if isinstance(entry, list) else [entry]:
+                    model.async_client_running = None
+        self._loops[key] = weakref.ref(loop)
+
+
+# Shared by all invocations of the container
+model_registry = ModelClientRegistry()
+
+
 def initialize_models(
     reasoning: int = 0,
     api_key: Optional[str] = None,
     job_id: Optional[str] = None,
-) -> Dict[str, ChatGoogleGenerativeAI]:
+) -> Dict[str, Any]:
     """
     Initialize Gemini model clients with proper error handling.
 
-    This function creates multiple Gemini model clients with different configurations:
+    This function returns multiple Gemini model clients with different configurations:
     - Main model: Primary model with optional reasoning capabilities
     - Struct model: Model optimized for structured outputs
     - Summary model: Model optimized for summarization tasks
 
+    Clients are built on the first call for a configuration and reasoning
+    level and reused by later invocations of the same container.
+
     Args:
         reasoning: Reasoning level (0-3). 0 disables reasoning, 1-3 enables with different token budgets.
         api_key: Optional Google API key for Gemini. Falls back to env var.
         job_id: Optional job ID for operation tracking.
 
     Returns:
-        Dict[str, ChatGoogleGenerativeAI]: Dictionary containing:
+        Dict[str, Any]: Dictionary containing:
             - 'main_model': Primary ChatGoogleGenerativeAI instance
             - 'struct_model': ChatGoogleGenerativeAI instance for structured outputs
             - 'summary_model': ChatGoogleGenerativeAI instance for summarization
+            - '<name>_fallbacks': Fallback chain of each model, in order
 
     Raises:
         ThreatModelingError: If model initialization fails.
@@ -213,47 +330,7 @@ def initialize_models(
 
     with operation_context("initialize_models", job_id):
         try:
-            logger.info("Starting model initialization", reasoning_level=reasoning)
-
-            # Load and validate configurations
-            configs = _load_model_configs()
-
-            api_key = api_key or os.environ.get(ENV_GOOGLE_API_KEY)
-            if not api_key:
-                raise ThreatModelingError("GOOGLE_API_KEY not provided")
-
-            genai.configure(api_key=api_key)
-
-            # Build model configurations
-            logger.debug("Building model configurations")
-
-            main_config = _build_main_model_config(
-                configs.main_model, configs.reasoning_models, reasoning
-            )
-
-            struct_config = _build_standard_model_config(configs.struct_model)
-            summary_config = _build_standard_model_config(configs.summary_model)
-
-            # Initialize models
-            logger.debug("Initializing ChatGoogleGenerativeAI instances")
-
-            models = {
-                "main_model": ChatGoogleGenerativeAI(**main_config),
-                "struct_model": ChatGoogleGenerativeAI(**struct_config),
-                "summary_model": ChatGoogleGenerativeAI(**summary_config),
-            }
-
-            logger.info(
-                "Models initialized successfully",
-                model_count=len(models),
-                main_model_id=configs.main_model["id"],
-                struct_model_id=configs.struct_model["id"],
-                summary_model_id=configs.summary_model["id"],
-                reasoning_enabled=reasoning != 0
-                and configs.main_model["id"] in configs.reasoning_models,
-            )
-
-            return models
+            return model_registry.get(reasoning, api_key, job_id)
 
         except Exception as e:
             logger.error(
@@ -263,3 +340,65 @@ def initialize_models(
                 job_id=job_id,
             )
             raise
+
+
+def _build_models(reasoning: int, api_key: Optional[str]) -> Dict[str, Any]:
+    """Construct the Gemini model clients for a reasoning level."""
+    logger.info("Starting model initialization", reasoning_level=reasoning)
+
+    # Load and validate configurations
+    configs = _load_model_configs()
+
+    if not api_key:
+        raise ThreatModelingError("GOOGLE_API_KEY not provided")
+
+    genai.configure(api_key=api_key)
+
+    # Build model configurations
+    logger.debug("Building model configurations")
+
+    main_config = _build_main_model_config(
+        configs.main_model, configs.reasoning_models, reasoning
+    )
+
+    struct_config = _build_standard_model_config(configs.struct_model)
+    summary_config = _build_standard_model_config(configs.summary_model)
+
+    # Initialize models
+    logger.debug("Initializing ChatGoogleGenerativeAI instances")
+
+    models = {
+        "main_model": ChatGoogleGenerativeAI(**main_config),
+        "struct_model": ChatGoogleGenerativeAI(**struct_config),
+        "summary_model": ChatGoogleGenerativeAI(**summary_config),
+        "main_model_fallbacks": [
+            ChatGoogleGenerativeAI(
+                **_build_main_model_config(
+                    fallback, configs.reasoning_models, reasoning
+                )
+            )
+            for fallback in configs.main_model["fallbacks"]
+        ],
+        "struct_model_fallbacks": [
+            ChatGoogleGenerativeAI(**_build_standard_model_config(fallback))
+            for fallback in configs.struct_model["fallbacks"]
+        ],
+        "summary_model_fallbacks": [
+            ChatGoogleGenerativeAI(**_build_standard_model_config(fallback))
+            for fallback in configs.summary_model["fallbacks"]
+        ],
+    }
+
+    logger.info(
+        "Models initialized successfully",
+        model_count=sum(
+            len(entry) if isinstance(entry, list) else 1 for entry in models.values()
+        ),
+        main_model_id=configs.main_model["id"],
+        struct_model_id=configs.struct_model["id"],
+        summary_model_id=configs.summary_model["id"],
+        reasoning_enabled=reasoning != 0
+        and configs.main_model["id"] in configs.reasoning_models,
+    )
+
+    return models
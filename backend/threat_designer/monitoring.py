@@ -1,5 +1,7 @@
 """Monitoring and observability utilities."""
 
+import functools
+import inspect
 import logging
 import os
 import time
@@ -7,11 +9,12 @@ from contextlib import contextmanager
 from typing import Generator
 
 import structlog
+from accounting import track_operation
 from constants import (ENV_LOG_LEVEL, ENV_TRACEBACK_ENABLED,
                        ERROR_DYNAMODB_OPERATION_FAILED,
                        ERROR_MODEL_INIT_FAILED, ERROR_S3_OPERATION_FAILED,
                        ERROR_VALIDATION_FAILED)
-from exceptions import ThreatModelingError
+from exceptions import ThreatModelingError, TransientError, is_transient
 
 log_level_str = os.environ.get(ENV_LOG_LEVEL, "INFO").upper()
 log_level = getattr(logging, log_level_str, logging.INFO)
@@ -22,11 +25,15 @@ logger = structlog.get_logger()
 
 @contextmanager
 def operation_context(operation_name: str, job_id: str) -> Generator[None, None, None]:
-    """Context manager for operation monitoring."""
+    """Context manager for operation monitoring.
+
+    The operation's duration and model calls are accounted to the running job.
+    """
     start_time = time.time()
     logger.info("Operation started", operation=operation_name, job_id=job_id)
     try:
-        yield
+        with track_operation(operation_name):
+            yield
         duration = time.time() - start_time
         logger.info(
             "Operation completed",
@@ -47,27 +54,55 @@ def operation_context(operation_name: str, job_id: str) -> Generator[None, None,
 
 
 def with_error_context(operation_name: str):
-    """Decorator to add error context to operations."""
+    """Decorator to add error context to operations.
+
+    Works for both plain and ``async`` functions.
+    """
 
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    _raise_with_context(operation_name, e)
+
+            return async_wrapper
+
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
             try:
                 return func(*args, **kwargs)
             except Exception as e:
-                show_traceback = (
-                    os.environ.get(ENV_TRACEBACK_ENABLED, "false").lower() == "true"
-                )
-                logger.error(f"Error in {operation_name}: {e}", exc_info=show_traceback)
-
-                # Use centralized error messages for consistent formatting
-                error_message = _get_error_message_for_operation(operation_name, str(e))
-                raise ThreatModelingError(error_message)
+                _raise_with_context(operation_name, e)
 
         return wrapper
 
     return decorator
 
 
+def _raise_with_context(operation_name: str, error: Exception) -> None:
+    """Log an operation failure and re-raise it as a ThreatModelingError.
+
+    Transient failures are re-raised as TransientError, so they can be retried.
+    """
+    show_traceback = os.environ.get(ENV_TRACEBACK_ENABLED, "false").lower() == "true"
+    transient = is_transient(error)
+    logger.error(
+        f"Error in {operation_name}: {error}",
+        transient=transient,
+        exc_info=show_traceback,
+    )
+
+    # Use centralized error messages for consistent formatting
+    error_message = _get_error_message_for_operation(operation_name, str(error))
+    if transient:
+        raise TransientError(error_message) from error
+    raise ThreatModelingError(error_message) from error
+
+
 def _get_error_message_for_operation(operation_name: str, original_error: str) -> str:
     """Get appropriate error message based on operation type."""
     operation_lower = operation_name.lower()
@@ -1,46 +1,67 @@
 """Business logic services for threat modeling graph nodes."""
 
-import time
+import asyncio
+import weakref
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
+from accounting import current_accounting
 from config import ThreatModelingConfig
-from constants import (FINALIZATION_SLEEP_SECONDS, FLUSH_MODE_APPEND,
-                       FLUSH_MODE_REPLACE, JobState)
+from constants import (CACHE_NAMESPACE_ASSETS, CACHE_NAMESPACE_FLOWS,
+                       CACHE_NAMESPACE_RESULT, FINALIZATION_SLEEP_SECONDS,
+                       FLUSH_MODE_APPEND, FLUSH_MODE_REPLACE,
+                       PROMPT_CACHE_STAGE_GAP_ANALYSIS,
+                       PROMPT_CACHE_STAGE_THREATS,
+                       PROMPT_CACHE_STAGE_THREATS_IMPROVE, WORKFLOW_NODE_ASSET,
+                       WORKFLOW_NODE_SUMMARY, WORKFLOW_NODE_THREATS,
+                       WORKFLOW_NODE_THREATS_BRANCH, JobState, StrideCategory)
+from file_service import ImageFileService
+from image_store import ImageStore, StoredImage
 from langchain_core.messages import SystemMessage
 from langchain_core.runnables.config import RunnableConfig
 from langgraph.graph import END
-from langgraph.types import Command
+from langgraph.types import Command, Send
 from message_builder import MessageBuilder, list_to_string
 from model_service import ModelService
 from monitoring import logger, operation_context, with_error_context
+from prompt_cache import PromptCache
 from prompts import (asset_prompt, flow_prompt, gap_prompt, summary_prompt,
                      threats_improve_prompt, threats_prompt)
-from state import (AgentState, AssetsList, ContinueThreatModeling, FlowsList,
-                   SummaryState, ThreatsList)
+from result_cache import ResultCache, StageCache
+from state import (AgentState, AssetsList, ContinueThreatModeling,
+                   ConvergenceState, FlowsList, SummaryState, ThreatsList)
 from state_tracking_service import StateService
 
 
 class SummaryService:
     """Service for generating architecture summaries."""
 
-    def __init__(self, model_service: ModelService, config: ThreatModelingConfig):
+    def __init__(
+        self,
+        model_service: ModelService,
+        config: ThreatModelingConfig,
+        image_store: ImageStore,
+    ):
         self.model_service = model_service
         self.config = config
+        self.image_store = image_store
 
     @with_error_context("summary node execution")
-    def generate_summary(
+    async def generate_summary(
         self, state: AgentState, config: RunnableConfig
     ) -> Dict[str, Any]:
         """Generate architecture summary if not already present."""
         if state.get("summary"):
-            return {"image_data": state["image_data"]}
+            return {}
 
         with operation_context("generate_summary", state.get("job_id", "unknown")):
+            image = await self.image_store.get(state)
             msg_builder = MessageBuilder(
-                state["image_data"],
+                image.data,
                 state.get("description", ""),
                 list_to_string(state.get("assumptions", [])),
+                state.get("image_uri"),
+                image.mime_type,
             )
             message = msg_builder.create_summary_message(
                 self.config.summary_max_words,
@@ -49,41 +70,68 @@ class SummaryService:
             system_prompt = SystemMessage(content=summary_prompt())
 
             messages = [system_prompt, message]
-            response = self.model_service.generate_summary(
+            response = await self.model_service.generate_summary(
                 messages, [SummaryState], config
             )
 
-            return {"image_data": state["image_data"], "summary": response.summary}
+            return {"summary": response.summary}
 
 
 class AssetDefinitionService:
     """Service for defining architecture assets."""
 
-    def __init__(self, model_service: ModelService, state_service: StateService):
+    def __init__(
+        self,
+        model_service: ModelService,
+        state_service: StateService,
+        stage_cache: StageCache,
+        image_store: ImageStore,
+    ):
         self.model_service = model_service
         self.state_service = state_service
+        self.stage_cache = stage_cache
+        self.image_store = image_store
 
-    def define_assets(
+    async def define_assets(
         self, state: AgentState, config: RunnableConfig
     ) -> Dict[str, Any]:
         """Define assets from architecture analysis."""
         job_id = state.get("job_id", "unknown")
 
         with operation_context("define_assets", job_id):
-            self.state_service.update_job_state(job_id, JobState.ASSETS.value)
+            await self.state_service.update_job_state(job_id, JobState.ASSETS.value)
+
+            cache_key = self.stage_cache.key(state, config["configurable"])
+            if cache_key:
+                assets = await asyncio.to_thread(
+                    self.stage_cache.get,
+                    CACHE_NAMESPACE_ASSETS,
+                    cache_key,
+                    AssetsList,
+                    job_id,
+                )
+                if assets is not None:
+                    return {"assets": assets}
 
-            message = self._prepare_asset_message(state)
-            assets = self._invoke_asset_model(message, config, job_id)
+            image = await self.image_store.get(state)
+            message = self._prepare_asset_message(state, image)
+            assets = await self._invoke_asset_model(message, config, job_id)
 
+            if cache_key:
+                await asyncio.to_thread(
+                    self.stage_cache.put, CACHE_NAMESPACE_ASSETS, cache_key, assets
+                )
             return {"assets": assets}
 
-    def _prepare_asset_message(self, state: AgentState) -> list:
+    def _prepare_asset_message(self, state: AgentState, image: StoredImage) -> list:
         """Prepare message for asset definition."""
 
         msg_builder = MessageBuilder(
-            state["image_data"],
+            image.data,
             state.get("description", ""),
             list_to_string(state.get("assumptions", [])),
+            state.get("image_uri"),
+            image.mime_type,
         )
 
         human_message = msg_builder.create_asset_message()
@@ -93,45 +141,79 @@ class AssetDefinitionService:
         return [system_prompt, human_message]
 
     @with_error_context("asset node execution")
-    def _invoke_asset_model(
+    async def _invoke_asset_model(
         self, messages: list, config: RunnableConfig, job_id: str
     ) -> Any:
         """Invoke model for asset definition."""
         reasoning = config["configurable"].get("reasoning", False)
-        response = self.model_service.invoke_structured_model(
+        response = await self.model_service.invoke_structured_model(
             messages, [AssetsList], config, reasoning
         )
         if response["reasoning"]:
-            self.state_service.update_trail(job_id=job_id, assets=response["reasoning"])
+            await self.state_service.update_trail(
+                job_id=job_id, assets=response["reasoning"]
+            )
         return response["structured_response"]
 
 
 class FlowDefinitionService:
     """Service for defining data flows between assets."""
 
-    def __init__(self, model_service: ModelService, state_service: StateService):
+    def __init__(
+        self,
+        model_service: ModelService,
+        state_service: StateService,
+        stage_cache: StageCache,
+        image_store: ImageStore,
+    ):
         self.model_service = model_service
         self.state_service = state_service
+        self.stage_cache = stage_cache
+        self.image_store = image_store
 
-    def define_flows(self, state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+    async def define_flows(
+        self, state: AgentState, config: RunnableConfig
+    ) -> Dict[str, Any]:
         """Define data flows in the architecture."""
         job_id = state.get("job_id", "unknown")
 
         with operation_context("define_flows", job_id):
-            self.state_service.update_job_state(job_id, JobState.FLOW.value)
+            await self.state_service.update_job_state(job_id, JobState.FLOW.value)
 
-            message = self._prepare_flow_message(state)
-            flows = self._invoke_flow_model(message, config, job_id)
+            # Flows are derived from the assets, which replays may have edited
+            cache_key = self.stage_cache.key(
+                state, config["configurable"], assets=state["assets"].dict()
+            )
+            if cache_key:
+                flows = await asyncio.to_thread(
+                    self.stage_cache.get,
+                    CACHE_NAMESPACE_FLOWS,
+                    cache_key,
+                    FlowsList,
+                    job_id,
+                )
+                if flows is not None:
+                    return {"system_architecture": flows}
+
+            image = await self.image_store.get(state)
+            message = self._prepare_flow_message(state, image)
+            flows = await self._invoke_flow_model(message, config, job_id)
 
+            if cache_key:
+                await asyncio.to_thread(
+                    self.stage_cache.put, CACHE_NAMESPACE_FLOWS, cache_key, flows
+                )
             return {"system_architecture": flows}
 
-    def _prepare_flow_message(self, state: AgentState) -> list:
+    def _prepare_flow_message(self, state: AgentState, image: StoredImage) -> list:
         """Prepare message for flow definition."""
 
         msg_builder = MessageBuilder(
-            state["image_data"],
+            image.data,
             state.get("description", ""),
             list_to_string(state.get("assumptions", [])),
+            state.get("image_uri"),
+            image.mime_type,
         )
         human_message = msg_builder.create_system_flows_message(assets=state["assets"])
         system_prompt = SystemMessage(content=flow_prompt())
@@ -139,16 +221,18 @@ class FlowDefinitionService:
         return [system_prompt, human_message]
 
     @with_error_context("flow node execution")
-    def _invoke_flow_model(
+    async def _invoke_flow_model(
         self, messages: list, config: RunnableConfig, job_id: str
     ) -> Any:
         """Invoke model for flow definition."""
         reasoning = config["configurable"].get("reasoning", False)
-        response = self.model_service.invoke_structured_model(
+        response = await self.model_service.invoke_structured_model(
             messages, [FlowsList], config, reasoning
         )
         if response["reasoning"]:
-            self.state_service.update_trail(job_id=job_id, flows=response["reasoning"])
+            await self.state_service.update_trail(
+                job_id=job_id, flows=response["reasoning"]
+            )
         return response["structured_response"]
 
 
@@ -160,12 +244,18 @@ class ThreatDefinitionService:
         model_service: ModelService,
         state_service: StateService,
         config: ThreatModelingConfig,
+        image_store: ImageStore,
     ):
         self.model_service = model_service
         self.state_service = state_service
         self.config = config
+        self.image_store = image_store
+        # One semaphore per event loop: every invocation runs on a fresh loop.
+        self._branch_semaphores = weakref.WeakKeyDictionary()
 
-    def define_threats(self, state: AgentState, config: RunnableConfig) -> Command:
+    async def define_threats(
+        self, state: AgentState, config: RunnableConfig
+    ) -> Command:
         """Define threats and mitigations for the architecture."""
         job_id = state.get("job_id", "unknown")
         retry_count = int(state.get("retry", 1))
@@ -175,19 +265,136 @@ class ThreatDefinitionService:
             if self._should_finalize(retry_count, iteration, config):
                 return Command(goto="finalize")
 
-            self._update_job_state_for_threats(job_id, retry_count)
+            await self._update_job_state_for_threats(job_id, retry_count)
+
+            if retry_count == 1:
+                branches = self._plan_branches(state)
+                if len(branches) > 1:
+                    return await self._fan_out(branches, config, job_id)
 
-            messages = self._prepare_threat_messages(state, retry_count)
-            response = self._invoke_threat_model(messages, config)
+            image = await self.image_store.get(state)
+            stage, messages = self._prepare_threat_messages(state, image, retry_count)
+            response = await self._invoke_threat_model(stage, messages, config, job_id)
 
-            self._update_reasoning_trail(
-                response["reasoning"], config, job_id, retry_count
+            flush = FLUSH_MODE_REPLACE if retry_count == 1 else FLUSH_MODE_APPEND
+            await self._update_reasoning_trail(
+                response["reasoning"], config, job_id, flush
             )
 
             return self._create_next_command(
                 response["structured_response"], retry_count, iteration
             )
 
+    async def define_threat_branch(
+        self, state: Dict[str, Any], config: RunnableConfig
+    ) -> Dict[str, Any]:
+        """Generate the threats of a single fan-out branch.
+
+        The branch payload is the agent state, optionally narrowed to one
+        ``stride_category`` and to one partition of the data flows. Results are
+        merged and de-duplicated by the ``threat_list`` reducer.
+        """
+        job_id = state.get("job_id", "unknown")
+        stride_category = state.get("stride_category")
+        partition = state.get("flow_partition")
+
+        branch_name = f"define_threats[{stride_category or 'all'}:{partition or 1}]"
+        with operation_context(branch_name, job_id):
+            image = await self.image_store.get(state)
+            stage, messages = self._prepare_threat_messages(
+                state,
+                image,
+                1,
+                stride_category=stride_category,
+                partial_flows=partition is not None,
+            )
+            async with self._get_branch_semaphore():
+                response = await self._invoke_threat_model(
+                    stage,
+                    messages,
+                    config,
+                    job_id,
+                    max_output_tokens=self.config.threat_branch_max_output_tokens,
+                )
+
+            await self._update_reasoning_trail(
+                response["reasoning"], config, job_id, FLUSH_MODE_APPEND
+            )
+
+            return {"threat_list": response["structured_response"]}
+
+    async def merge_threat_branches(self, state: AgentState) -> Command:
+        """Join the fan-out branches and continue the threat loop."""
+        job_id = state.get("job_id", "unknown")
+        retry_count = int(state.get("retry", 1))
+        iteration = int(state.get("iteration", 0))
+
+        threat_list = state.get("threat_list")
+        logger.info(
+            "Threat branches merged",
+            job_id=job_id,
+            threats_count=len(threat_list) if threat_list else 0,
+        )
+
+        return self._create_next_command(None, retry_count, iteration)
+
+    def _plan_branches(self, state: AgentState) -> List[Dict[str, Any]]:
+        """Build the payloads of the first-pass threat generation branches.
+
+        Branches are the product of the STRIDE categories (when fan-out is
+        enabled) and the data flow partitions (when partitioning is enabled and
+        the architecture is larger than one partition).
+        """
+        categories = [None]
+        if self.config.threat_fanout_enabled:
+            categories = [category.value for category in StrideCategory]
+
+        flows = state["system_architecture"]
+        partitions = [flows]
+        if self.config.threat_partition_enabled:
+            partitions = flows.partition(self.config.threat_partition_size)
+
+        branches = []
+        for index, partition in enumerate(partitions, start=1):
+            for category in categories:
+                branch = {**state, "system_architecture": partition}
+                if category:
+                    branch["stride_category"] = category
+                if len(partitions) > 1:
+                    branch["flow_partition"] = f"{index}/{len(partitions)}"
+                branches.append(branch)
+        return branches
+
+    async def _fan_out(
+        self, branches: List[Dict[str, Any]], config: RunnableConfig, job_id: str
+    ) -> Command:
+        """Dispatch the first-pass threat generation branches in parallel."""
+        if config["configurable"].get("reasoning", False):
+            # Branches append concurrently, so the trail is reset up front.
+            await self.state_service.update_trail(
+                job_id=job_id, threats=[], flush=FLUSH_MODE_REPLACE
+            )
+
+        logger.info(
+            "Fanning out threat generation",
+            job_id=job_id,
+            branches=len(branches),
+            concurrency=self.config.threat_branch_concurrency,
+        )
+
+        return Command(
+            goto=[Send(WORKFLOW_NODE_THREATS_BRANCH, branch) for branch in branches]
+        )
+
+    def _get_branch_semaphore(self) -> asyncio.Semaphore:
+        """Return the semaphore bounding concurrent branches on this loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._branch_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.config.threat_branch_concurrency)
+            self._branch_semaphores[loop] = semaphore
+        return semaphore
+
     def _should_finalize(
         self, retry_count: int, iteration: int, config: RunnableConfig
     ) -> bool:
@@ -203,133 +410,254 @@ class ThreatDefinitionService:
 
         return max_retries_reached or iteration_limit_reached or time_limit_reached
 
-    def _update_job_state_for_threats(self, job_id: str, retry_count: int) -> None:
+    async def _update_job_state_for_threats(
+        self, job_id: str, retry_count: int
+    ) -> None:
         """Update job state based on retry count."""
         if retry_count > 1:
-            self.state_service.update_job_state(
+            await self.state_service.update_job_state(
                 job_id, JobState.THREAT_RETRY.value, retry_count
             )
         else:
-            self.state_service.update_job_state(
+            await self.state_service.update_job_state(
                 job_id, JobState.THREAT.value, retry_count
             )
 
-    def _prepare_threat_messages(self, state: AgentState, retry_count: int) -> list:
-        """Prepare messages for threat definition."""
+    def _prepare_threat_messages(
+        self,
+        state: AgentState,
+        image: StoredImage,
+        retry_count: int,
+        stride_category: Optional[str] = None,
+        partial_flows: bool = False,
+    ) -> Tuple[str, list]:
+        """Prepare messages for threat definition.
+
+        Returns the prompt cache stage and the system prompt, shared prompt
+        prefix and request message of the call.
+        """
         gap = state.get("gap", [])
 
         msg_builder = MessageBuilder(
-            state["image_data"],
+            image.data,
             state.get("description", ""),
             list_to_string(state.get("assumptions", [])),
+            state.get("image_uri"),
+            image.mime_type,
         )
 
         if retry_count > 1:
+            prefix_message = msg_builder.create_prefix_message(
+                state["assets"], state["system_architecture"]
+            )
             human_message = msg_builder.create_threat_improve_message(
-                state["assets"], state["system_architecture"], state["threat_list"], gap
+                state["assets"],
+                state["system_architecture"],
+                state["threat_list"].materialize(),
+                gap,
+                include_prefix=False,
             )
             system_prompt = SystemMessage(content=threats_improve_prompt())
+            stage = PROMPT_CACHE_STAGE_THREATS_IMPROVE
         else:
+            prefix_message = msg_builder.create_prefix_message()
             human_message = msg_builder.create_threat_message(
-                state["assets"], state["system_architecture"]
+                state["assets"],
+                state["system_architecture"],
+                stride_category,
+                partial_flows,
+                include_prefix=False,
             )
             system_prompt = SystemMessage(content=threats_prompt())
+            stage = PROMPT_CACHE_STAGE_THREATS
 
-        return [system_prompt, human_message]
+        return stage, [system_prompt, prefix_message, human_message]
 
     @with_error_context("threat node execution")
-    def _invoke_threat_model(self, messages: list, config: RunnableConfig) -> Any:
+    async def _invoke_threat_model(
+        self,
+        stage: str,
+        messages: list,
+        config: RunnableConfig,
+        job_id: str,
+        max_output_tokens: Optional[int] = None,
+    ) -> Any:
         """Invoke model for threat definition."""
         reasoning = config["configurable"].get("reasoning", False)
-        return self.model_service.invoke_structured_model(
-            messages, [ThreatsList], config, reasoning
+        return await self.model_service.invoke_cached_structured_model(
+            job_id,
+            stage,
+            *messages,
+            [ThreatsList],
+            config,
+            reasoning,
+            max_output_tokens=max_output_tokens,
         )
 
-    def _update_reasoning_trail(
-        self, reasoning_text: Any, config: RunnableConfig, job_id: str, retry_count: int
+    async def _update_reasoning_trail(
+        self, reasoning_text: Any, config: RunnableConfig, job_id: str, flush: int
     ) -> None:
         """Update reasoning trail if enabled."""
         reasoning = config["configurable"].get("reasoning", False)
 
         if reasoning:
-            flush = FLUSH_MODE_REPLACE if retry_count == 1 else FLUSH_MODE_APPEND
             if reasoning_text:
-                self.state_service.update_trail(
+                await self.state_service.update_trail(
                     job_id=job_id, threats=reasoning_text, flush=flush
                 )
 
     def _create_next_command(
         self, response: Any, retry_count: int, iteration: int
     ) -> Command:
-        """Create next command based on current state."""
-        next_retry = retry_count + 1
+        """Create next command based on current state.
+
+        ``response`` is None when the threats were already merged into state by
+        the fan-out branches.
+        """
+        update = {"retry": retry_count + 1}
+        if response is not None:
+            update["threat_list"] = response
 
         if iteration == 0:
-            return Command(
-                goto="gap_analysis",
-                update={"threat_list": response, "retry": next_retry},
-            )
+            return Command(goto="gap_analysis", update=update)
 
-        return Command(
-            goto="threats", update={"threat_list": response, "retry": next_retry}
-        )
+        return Command(goto="threats", update=update)
 
 
 class GapAnalysisService:
     """Service for analyzing gaps in threat model."""
 
-    def __init__(self, model_service: ModelService, state_service: StateService):
+    def __init__(
+        self,
+        model_service: ModelService,
+        state_service: StateService,
+        config: ThreatModelingConfig,
+        image_store: ImageStore,
+    ):
         self.model_service = model_service
         self.state_service = state_service
+        self.config = config
+        self.image_store = image_store
 
-    def analyze_gaps(self, state: AgentState, config: RunnableConfig) -> Command:
+    async def analyze_gaps(self, state: AgentState, config: RunnableConfig) -> Command:
         """Analyze gaps in the threat model."""
         job_id = state.get("job_id", "unknown")
 
         with operation_context("gap_analysis", job_id):
-            messages = self._prepare_gap_messages(state)
-            response = self._invoke_gap_model(messages, config)
+            convergence = self._track_convergence(state, job_id)
+            if convergence.stale_rounds >= self.config.convergence_patience:
+                return Command(goto="finalize", update={"convergence": convergence})
+
+            image = await self.image_store.get(state)
+            messages = self._prepare_gap_messages(state, image)
+            response = await self._invoke_gap_model(messages, config, job_id)
 
-            self._update_gap_reasoning_trail(
+            await self._update_gap_reasoning_trail(
                 response["reasoning"], config, job_id, state
             )
 
             if response["structured_response"].stop:
-                return Command(goto="finalize")
+                return Command(goto="finalize", update={"convergence": convergence})
 
             return Command(
-                goto="threats", update={"gap": [response["structured_response"].gap]}
+                goto="threats",
+                update={
+                    "gap": [response["structured_response"].gap],
+                    "convergence": convergence,
+                },
+            )
+
+    def _track_convergence(self, state: AgentState, job_id: str) -> ConvergenceState:
+        """Measure what the last threat round added to the catalog.
+
+        A round is stale when the share of new distinct threats is below
+        ``convergence_novelty_threshold`` and no new asset/STRIDE cell got
+        covered. The first round only sets the baseline.
+        """
+        previous = state.get("convergence")
+        threat_list = state.get("threat_list")
+        assets = state.get("assets")
+        threats_count = len(threat_list) if threat_list else 0
+        covered_cells = len(threat_list.coverage(assets)) if threat_list else 0
+
+        if previous is None or not self.config.convergence_enabled:
+            return ConvergenceState(
+                threats_count=threats_count, covered_cells=covered_cells
             )
 
-    def _prepare_gap_messages(self, state: AgentState) -> list:
-        """Prepare messages for gap analysis."""
+        new_threats = threats_count - previous.threats_count
+        novelty = new_threats / threats_count if threats_count else 0.0
+        coverage_gain = covered_cells - previous.covered_cells
+        stale = (
+            novelty < self.config.convergence_novelty_threshold and coverage_gain <= 0
+        )
+        stale_rounds = previous.stale_rounds + 1 if stale else 0
+        total_cells = len(assets.assets) * len(StrideCategory) if assets else 0
+
+        logger.info(
+            "Gap analysis convergence check",
+            job_id=job_id,
+            new_threats=new_threats,
+            novelty=round(novelty, 3),
+            coverage_gain=coverage_gain,
+            coverage=round(covered_cells / total_cells, 3) if total_cells else None,
+            stale_rounds=stale_rounds,
+            patience=self.config.convergence_patience,
+            converged=stale_rounds >= self.config.convergence_patience,
+        )
+
+        return ConvergenceState(
+            threats_count=threats_count,
+            covered_cells=covered_cells,
+            stale_rounds=stale_rounds,
+        )
+
+    def _prepare_gap_messages(self, state: AgentState, image: StoredImage) -> list:
+        """Prepare messages for gap analysis.
+
+        Returns the system prompt, shared prompt prefix and request message of
+        the call.
+        """
 
         msg_builder = MessageBuilder(
-            state["image_data"],
+            image.data,
             state.get("description", ""),
             list_to_string(state.get("assumptions", [])),
+            state.get("image_uri"),
+            image.mime_type,
         )
 
+        prefix_message = msg_builder.create_prefix_message(
+            state["assets"], state["system_architecture"]
+        )
         human_message = msg_builder.create_gap_analysis_message(
             state["assets"],
             state["system_architecture"],
-            state.get("threat_list", ""),
+            state["threat_list"].materialize() if state.get("threat_list") else "",
             state.get("gap", []),
+            include_prefix=False,
         )
 
         system_prompt = SystemMessage(content=gap_prompt())
 
-        return [system_prompt, human_message]
+        return [system_prompt, prefix_message, human_message]
 
     @with_error_context("gap node execution")
-    def _invoke_gap_model(self, messages: list, config: RunnableConfig) -> Any:
+    async def _invoke_gap_model(
+        self, messages: list, config: RunnableConfig, job_id: str
+    ) -> Any:
         """Invoke model for gap analysis."""
         reasoning = config["configurable"].get("reasoning", False)
-        return self.model_service.invoke_structured_model(
-            messages, [ContinueThreatModeling], config, reasoning
+        return await self.model_service.invoke_cached_structured_model(
+            job_id,
+            PROMPT_CACHE_STAGE_GAP_ANALYSIS,
+            *messages,
+            [ContinueThreatModeling],
+            config,
+            reasoning,
         )
 
-    def _update_gap_reasoning_trail(
+    async def _update_gap_reasoning_trail(
         self,
         reasoning_text: Any,
         config: RunnableConfig,
@@ -346,7 +674,7 @@ class GapAnalysisService:
                 else FLUSH_MODE_APPEND
             )
             if reasoning_text:
-                self.state_service.update_trail(
+                await self.state_service.update_trail(
                     job_id=job_id, gaps=reasoning_text, flush=flush
                 )
 
@@ -354,23 +682,86 @@ class GapAnalysisService:
 class WorkflowFinalizationService:
     """Service for finalizing the workflow."""
 
-    def __init__(self, state_service: StateService):
+    def __init__(
+        self,
+        state_service: StateService,
+        result_cache: Optional[ResultCache] = None,
+        stage_cache: Optional[StageCache] = None,
+        prompt_cache: Optional[PromptCache] = None,
+        file_service: Optional[ImageFileService] = None,
+    ):
         self.state_service = state_service
+        self.result_cache = result_cache
+        self.stage_cache = stage_cache
+        self.prompt_cache = prompt_cache
+        self.file_service = file_service
 
-    def finalize_workflow(self, state: AgentState) -> Command:
+    async def finalize_workflow(self, state: AgentState) -> Command:
         """Finalize the threat modeling workflow."""
         job_id = state.get("job_id", "unknown")
 
         with operation_context("finalize_workflow", job_id):
-            try:
-                self.state_service.update_job_state(job_id, JobState.FINALIZE.value)
-                self.state_service.finalize_workflow(state)
-                time.sleep(FINALIZATION_SLEEP_SECONDS)
-                self.state_service.update_job_state(job_id, JobState.COMPLETE.value)
-                return Command(goto=END)
-            except Exception as e:
-                self.state_service.update_job_state(job_id, JobState.FAILED.value)
-                raise e
+            # The node is retried on transient errors, so it only releases the
+            # job's resources once its state writes succeeded. The handler
+            # marks the job FAILED when the retries are exhausted.
+            await self.state_service.update_job_state(job_id, JobState.FINALIZE.value)
+            await self.state_service.finalize_workflow(state)
+            await asyncio.sleep(FINALIZATION_SLEEP_SECONDS)
+            await self.state_service.update_job_state(
+                job_id, JobState.COMPLETE.value, accounting=self._accounting()
+            )
+
+            if self.prompt_cache is not None:
+                await self.prompt_cache.release(job_id)
+            if self.file_service is not None and state.get("image_uri"):
+                await self.file_service.delete(job_id, state["image_uri"])
+            await self._cache_result(state)
+            if self.stage_cache is not None:
+                self.stage_cache.report(job_id)
+            return Command(goto=END)
+
+    def _accounting(self) -> Optional[Dict[str, Any]]:
+        """Usage and latency summary of the job, logged and persisted."""
+        accounting = current_accounting()
+        if accounting is None:
+            return None
+
+        summary = accounting.summary()
+        logger.info("Job accounting", job_id=accounting.job_id, **summary)
+        return summary
+
+    async def _cache_result(self, state: AgentState) -> None:
+        """Store the results of a full run for identical resubmissions."""
+        cache_key = state.get("cache_key")
+        if self.result_cache is None or not cache_key:
+            return
+
+        # Results are keyed by the configured models, not by fallbacks
+        accounting = current_accounting()
+        if accounting is not None and accounting.totals["fallbacks"]:
+            logger.info(
+                "Result not cached, served by fallback models",
+                job_id=state["job_id"],
+            )
+            return
+
+        threat_list = state.get("threat_list")
+        result = {
+            "summary": state.get("summary"),
+            "assets": state["assets"].dict() if state.get("assets") else None,
+            "system_architecture": (
+                state["system_architecture"].dict()
+                if state.get("system_architecture")
+                else None
+            ),
+            "threats": (
+                [threat.dict() for threat in threat_list.threats] if threat_list else []
+            ),
+            "retry": state.get("retry"),
+        }
+        await asyncio.to_thread(
+            self.result_cache.put, CACHE_NAMESPACE_RESULT, cache_key, result
+        )
 
 
 class ReplayService:
@@ -379,20 +770,27 @@ class ReplayService:
     def __init__(self, state_service: StateService):
         self.state_service = state_service
 
-    def route_replay(self, state: AgentState) -> str:
-        """Route workflow based on replay flag."""
+    async def route_replay(self, state: AgentState) -> List[str]:
+        """Route workflow based on replay flag.
+
+        The summary node is scheduled alongside the first step of the run so it
+        never sits on the critical path. Replays skip it when a summary already
+        exists.
+        """
         if not state.get("replay", False):
-            return "full"
+            return [WORKFLOW_NODE_SUMMARY, WORKFLOW_NODE_ASSET]
 
         job_id = state.get("job_id", "unknown")
 
         with operation_context("replay_routing", job_id):
             try:
-                self.state_service.update_trail(
+                await self.state_service.update_trail(
                     job_id=job_id, threats=[], gaps=[], flush=FLUSH_MODE_REPLACE
                 )
-                self.state_service.update_with_backup(job_id)
-                return "replay"
+                await self.state_service.update_with_backup(job_id)
+                if state.get("summary"):
+                    return [WORKFLOW_NODE_THREATS]
+                return [WORKFLOW_NODE_SUMMARY, WORKFLOW_NODE_THREATS]
             except Exception as e:
                 logger.error(f"Replay routing failed: {e}")
                 raise e
@@ -0,0 +1,314 @@
+"""
+Local repair of structured model outputs that fail validation.
+
+Tool call arguments often miss their schema by a detail: a value in the wrong
+case, one mitigation too many, a list encoded as a JSON string, or the whole
+output written as (possibly truncated) JSON in the text content instead of a
+tool call. Such outputs are repaired deterministically, guided by the pydantic
+schema of the tool, before falling back to a second model call that
+restructures the output.
+"""
+
+import difflib
+import json
+import re
+from collections import Counter, defaultdict
+from typing import (Any, Dict, List, Literal, Optional, Type, Union, get_args,
+                    get_origin)
+
+from accounting import current_accounting
+from annotated_types import MaxLen, MinLen
+from langchain_core.messages import BaseMessage
+from monitoring import logger
+from pydantic import BaseModel, ValidationError
+
+# Minimum similarity for a misspelled value to match one of the choices
+_MATCH_CUTOFF = 0.75
+
+# Truncation points tried when recovering a partial JSON document
+_MAX_PARTIAL_CUTS = 50
+
+_TRUE_STRINGS = {"true", "yes", "1"}
+_FALSE_STRINGS = {"false", "no", "0"}
+
+_CODE_FENCE = re.compile(r"```(?:json)?")
+
+# Repair attempts and successes per tool class over the container's lifetime
+repair_stats: Dict[str, Counter] = defaultdict(Counter)
+
+
+class RepairError(ValueError):
+    """Raised when an output cannot be coerced to its schema."""
+
+
+def repair_tool_output(
+    tool_class: Type[BaseModel], response: BaseMessage
+) -> Optional[BaseModel]:
+    """Rebuild a tool's output from a response that failed validation.
+
+    Args:
+        tool_class: Pydantic model of the tool the model was asked to call.
+        response: Model response whose tool call could not be validated.
+
+    Returns:
+        Optional[BaseModel]: The repaired output, None when it cannot be repaired.
+    """
+    stats = repair_stats[tool_class.__name__]
+    stats["attempts"] += 1
+    try:
+        result = coerce_model(tool_class, _extract_arguments(response))
+    except (RepairError, ValidationError) as e:
+        logger.info(
+            "Local output repair failed",
+            tool=tool_class.__name__,
+            error=str(e),
+            **_rates(stats),
+        )
+        return None
+
+    stats["repaired"] += 1
+    accounting = current_accounting()
+    if accounting is not None:
+        accounting.increment("repairs")
+    logger.info(
+        "Structured output repaired locally",
+        tool=tool_class.__name__,
+        **_rates(stats),
+    )
+    return result
+
+
+def coerce_model(model: Type[BaseModel], value: Any) -> BaseModel:
+    """Coerce a parsed value to a pydantic model, field by field."""
+    if isinstance(value, str):
+        value = parse_json(value)
+    if isinstance(value, list):
+        list_fields = [
+            name
+            for name, field in model.model_fields.items()
+            if get_origin(field.annotation) is list
+        ]
+        if len(list_fields) == 1:
+            # The list the model should have wrapped in its only list field
+            value = {list_fields[0]: value}
+        elif len(value) == 1:
+            value = value[0]
+    if not isinstance(value, dict):
+        raise RepairError(f"Expected an object for {model.__name__}")
+
+    keys = {_normalize_key(key): key for key in value}
+    data = {}
+    for name, field in model.model_fields.items():
+        key = keys.get(_normalize_key(name))
+        if key is None:
+            if field.is_required():
+                raise RepairError(f"Missing field '{name}' in {model.__name__}")
+            continue
+        data[name] = _coerce(field.annotation, value[key], field.metadata, name)
+    return model(**data)
+
+
+def parse_json(text: str) -> Any:
+    """Parse the first JSON document in a text, recovering truncated ones."""
+    text = _CODE_FENCE.sub("", text)
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        raise RepairError("No JSON document in the output")
+    text = text[min(starts) :]
+
+    try:
+        return json.JSONDecoder().raw_decode(text)[0]
+    except json.JSONDecodeError:
+        return _parse_partial_json(text)
+
+
+def _coerce(annotation: Any, value: Any, metadata: List[Any], name: str) -> Any:
+    """Coerce a value to a field annotation."""
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+
+    if origin is Union:
+        if value is None and type(None) in args:
+            return None
+        annotation = next(arg for arg in args if arg is not type(None))
+        return _coerce(annotation, value, metadata, name)
+
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return coerce_model(annotation, value)
+
+    if origin is list:
+        return _coerce_list(args[0] if args else Any, value, metadata, name)
+
+    if origin is Literal:
+        return _match_choice(value, [str(arg) for arg in args], name)
+
+    if annotation is bool:
+        return _coerce_bool(value, name)
+
+    if annotation is str:
+        if value is None:
+            raise RepairError(f"Missing value for '{name}'")
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value)
+        return str(value).strip()
+
+    return value
+
+
+def _coerce_list(item_type: Any, value: Any, metadata: List[Any], name: str) -> list:
+    """Coerce a value to a list, dropping unrepairable items."""
+    if isinstance(value, str):
+        value = _parse_list(value)
+    elif isinstance(value, dict):
+        value = [value]
+    elif not isinstance(value, list):
+        raise RepairError(f"Expected a list for '{name}'")
+
+    items = []
+    for item in value:
+        try:
+            items.append(_coerce(item_type, item, [], name))
+        except (RepairError, ValidationError):
+            continue
+    if len(items) < len(value):
+        if not items:
+            raise RepairError(f"No valid item in '{name}'")
+        logger.info(
+            "Dropped unrepairable items", field=name, dropped=len(value) - len(items)
+        )
+
+    for constraint in metadata:
+        if isinstance(constraint, MaxLen):
+            items = items[: constraint.max_length]
+        elif isinstance(constraint, MinLen) and len(items) < constraint.min_length:
+            raise RepairError(
+                f"'{name}' needs at least {constraint.min_length} items, got {len(items)}"
+            )
+    return items
+
+
+def _parse_list(value: str) -> list:
+    """List from a JSON encoded list or from one item per line."""
+    try:
+        parsed = parse_json(value)
+    except RepairError:
+        parsed = None
+    if isinstance(parsed, list):
+        return parsed
+    if isinstance(parsed, dict):
+        # A single item encoded on its own
+        return [parsed]
+
+    lines = [line.strip().lstrip("-*•").strip() for line in value.splitlines()]
+    return [line for line in lines if line]
+
+
+def _coerce_bool(value: Any, name: str) -> bool:
+    """Boolean from its usual string spellings."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    normalized = str(value).strip().lower()
+    if normalized in _TRUE_STRINGS:
+        return True
+    if normalized in _FALSE_STRINGS:
+        return False
+    raise RepairError(f"Expected a boolean for '{name}', got {value!r}")
+
+
+def canonical_choice(value: Any, choices: List[str]) -> Optional[str]:
+    """The choice a value stands for, ignoring case, punctuation and typos.
+
+    Returns None when the value matches none of the choices.
+    """
+    if not isinstance(value, str):
+        return None
+
+    normalized = {_normalize_choice(choice): choice for choice in choices}
+    key = _normalize_choice(value)
+    if key in normalized:
+        return normalized[key]
+
+    matches = difflib.get_close_matches(key, normalized, n=1, cutoff=_MATCH_CUTOFF)
+    return normalized[matches[0]] if matches else None
+
+
+def _match_choice(value: Any, choices: List[str], name: str) -> str:
+    """The choice a value stands for, raising when there is none."""
+    choice = canonical_choice(value, choices)
+    if choice is None:
+        raise RepairError(f"Expected one of {choices} for '{name}', got {value!r}")
+    return choice
+
+
+def _normalize_choice(value: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", value.lower())
+
+
+def _normalize_key(key: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", str(key).lower()).strip("_")
+
+
+def _extract_arguments(response: BaseMessage) -> Any:
+    """Tool call arguments of a response, or the JSON in its text content."""
+    tool_calls = getattr(response, "tool_calls", None)
+    if tool_calls:
+        return tool_calls[0]["args"]
+
+    content = response.content
+    if isinstance(content, list):
+        content = "".join(
+            part if isinstance(part, str) else part.get("text", "")
+            for part in content
+            if isinstance(part, str) or part.get("type") == "text"
+        )
+    return parse_json(content)
+
+
+def _parse_partial_json(text: str) -> Any:
+    """Parse a truncated JSON document, keeping its complete elements.
+
+    The open strings, objects and arrays at the end of the text are closed. If
+    that does not yield valid JSON, the text is cut back after the last
+    complete elements, one separator at a time.
+    """
+    closers: List[str] = []
+    cuts = []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]" and closers:
+            closers.pop()
+        elif char == ",":
+            cuts.append((index, "".join(reversed(closers))))
+
+    candidates = [text + ('"' if in_string else "") + "".join(reversed(closers))]
+    candidates += [text[:index] + suffix for index, suffix in reversed(cuts)][
+        :_MAX_PARTIAL_CUTS
+    ]
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    raise RepairError("Unrecoverable JSON in the output")
+
+
+def _rates(stats: Counter) -> Dict[str, Any]:
+    """Repair counters of a tool and their success rate."""
+    return {
+        "repair_attempts": stats["attempts"],
+        "repaired": stats["repaired"],
+        "repair_success_rate": round(stats["repaired"] / stats["attempts"], 3),
+    }
@@ -0,0 +1,162 @@
+"""
+Provider-side caching of the prompt prefixes shared by a job's model calls.
+
+Every threat and gap analysis call starts with the same diagram, description
+and assumptions. The first call of a stage stores that prefix, together with
+the stage's system prompt and tools, as Gemini cached content. Later calls of
+the stage only send their own suffix and reference the cached content, so the
+prefix is neither uploaded nor billed at the full input rate again. Cached
+contents are deleted when the job finishes, fails or is handed over to a new
+invocation, and otherwise expire through their TTL. Caching is an optimization
+only: when a cached content cannot be created the calls send the full prompt.
+"""
+
+import asyncio
+import weakref
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional, Type
+
+import google.api_core.exceptions
+from config import ThreatModelingConfig
+from google.generativeai import protos
+from google.generativeai.client import get_default_cache_client
+from langchain_core.messages import BaseMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+from monitoring import logger
+
+# Gemini limits display names to 128 characters
+_MAX_DISPLAY_NAME_LENGTH = 128
+
+# Errors of calls referencing a cached content that expired or was deleted
+_CACHE_MISS_ERRORS = (
+    google.api_core.exceptions.NotFound,
+    google.api_core.exceptions.PermissionDenied,
+    google.api_core.exceptions.InvalidArgument,
+)
+
+
+def is_cache_miss_error(error: BaseException) -> bool:
+    """Whether an error, or one of its causes, reports a missing cached content."""
+    while error is not None:
+        if isinstance(error, _CACHE_MISS_ERRORS) and "cache" in str(error).lower():
+            return True
+        error = error.__cause__
+    return False
+
+
+class PromptCache:
+    """Cached contents of a job's prompt prefixes, one per workflow stage."""
+
+    def __init__(self, config: ThreatModelingConfig):
+        self.enabled = config.prompt_cache_enabled
+        self.ttl = timedelta(seconds=config.prompt_cache_ttl_seconds)
+        # Cached content name per job and stage, None when creation failed
+        self._entries: Dict[str, Dict[str, Optional[str]]] = defaultdict(dict)
+        # One lock per event loop: every invocation runs on a fresh loop.
+        self._locks = weakref.WeakKeyDictionary()
+
+    async def acquire(
+        self,
+        job_id: str,
+        stage: str,
+        model: ChatGoogleGenerativeAI,
+        prefix: List[BaseMessage],
+        tools: List[Type],
+        tool_choice: Optional[str],
+    ) -> Optional[str]:
+        """Return the cached content of a stage's prefix, creating it once.
+
+        Returns None when caching is disabled or the content could not be
+        created, in which case the caller sends the full prompt.
+        """
+        if not self.enabled:
+            return None
+
+        entries = self._entries[job_id]
+        if stage not in entries:
+            # Parallel branches of a stage wait for a single creation
+            async with self._get_lock():
+                if stage not in entries:
+                    entries[stage] = await self._create(
+                        job_id, stage, model, prefix, tools, tool_choice
+                    )
+        return entries[stage]
+
+    async def invalidate(self, job_id: str, stage: str) -> None:
+        """Stop using the cached content of a stage for the rest of the job.
+
+        The content is deleted, in case the provider still bills for it.
+        """
+        name = self._entries[job_id].get(stage)
+        self._entries[job_id][stage] = None
+        if name is not None:
+            await self._delete(job_id, stage, name)
+
+    async def release(self, job_id: str) -> None:
+        """Delete the cached contents of a finished job."""
+        entries = self._entries.pop(job_id, {})
+        for stage, name in entries.items():
+            if name is not None:
+                await self._delete(job_id, stage, name)
+
+    async def _delete(self, job_id: str, stage: str, name: str) -> None:
+        """Delete a cached content, logging failures."""
+        try:
+            await asyncio.to_thread(_delete_cached_content, name)
+        except Exception as e:
+            # The content expires through its TTL anyway
+            logger.warning(
+                "Failed to delete cached prompt prefix",
+                job_id=job_id,
+                stage=stage,
+                error=str(e),
+            )
+
+    def _get_lock(self) -> asyncio.Lock:
+        """Return the lock serializing cache creations on this loop."""
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[loop] = lock
+        return lock
+
+    async def _create(
+        self,
+        job_id: str,
+        stage: str,
+        model: ChatGoogleGenerativeAI,
+        prefix: List[BaseMessage],
+        tools: List[Type],
+        tool_choice: Optional[str],
+    ) -> Optional[str]:
+        """Create the cached content of a stage's prefix."""
+        try:
+            name = await asyncio.to_thread(
+                model.create_cached_content,
+                prefix,
+                display_name=f"{job_id}:{stage}"[:_MAX_DISPLAY_NAME_LENGTH],
+                tools=tools,
+                tool_choice=tool_choice,
+                ttl=self.ttl,
+            )
+        except Exception as e:
+            # E.g. prefixes below the provider's minimum cacheable size
+            logger.warning(
+                "Prompt prefix caching unavailable, sending full prompts",
+                job_id=job_id,
+                stage=stage,
+                error=str(e),
+            )
+            return None
+
+        logger.info("Prompt prefix cached", job_id=job_id, stage=stage, name=name)
+        return name
+
+
+def _delete_cached_content(name: str) -> None:
+    """Delete a cached content by name, without fetching it first."""
+    get_default_cache_client().delete_cached_content(
+        protos.DeleteCachedContentRequest(name=name)
+    )
@@ -0,0 +1,347 @@
+"""
+Client-side rate limiting and adaptive concurrency of model calls.
+
+Every job calls Gemini independently, so a burst of jobs exceeds the
+provider's quotas and calls fail with 429 errors. Calls are admitted through
+a token bucket per model id, with request and token per minute limits, and
+through an adaptive concurrency limit. The limit is halved when the provider
+throttles, shrinks slightly when calls get slow, and grows back by one slot
+per limit's worth of successful calls (AIMD). The buckets of a container can
+be complemented by a budget shared by all containers, counted in one-minute
+windows of the result cache table.
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import boto3
+import google.api_core.exceptions
+from botocore.exceptions import ClientError
+from config import ThreatModelingConfig
+from constants import (AWS_SERVICE_DYNAMODB, CACHE_NAMESPACE_RATE_LIMIT,
+                       DEFAULT_REGION, ENV_AWS_REGION,
+                       ENV_DYNAMODB_ENDPOINT_URL, ENV_RESULT_CACHE_TABLE,
+                       IMAGE_TOKEN_ESTIMATE, LATENCY_DECREASE_FACTOR,
+                       MODEL_CONCURRENCY_MIN, RATE_LIMIT_WINDOW_SECONDS,
+                       THROTTLE_DECREASE_FACTOR,
+                       TOKEN_ESTIMATE_CHARS_PER_TOKEN)
+from monitoring import logger
+
+_RATE_LIMIT_ERRORS = (
+    google.api_core.exceptions.ResourceExhausted,
+    google.api_core.exceptions.TooManyRequests,
+)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether an error, or one of its causes, is a provider 429."""
+    while error is not None:
+        if isinstance(error, _RATE_LIMIT_ERRORS):
+            return True
+        error = error.__cause__
+    return False
+
+
+def estimate_tokens(messages: List[Any]) -> int:
+    """Rough input token count of messages, before the provider reports it."""
+    characters = 0
+    images = 0
+    for message in messages:
+        content = getattr(message, "content", message)
+        for part in [content] if isinstance(content, str) else content:
+            if isinstance(part, str):
+                characters += len(part)
+            elif part.get("type") == "text":
+                characters += len(part.get("text", ""))
+            else:
+                images += 1
+    return characters // TOKEN_ESTIMATE_CHARS_PER_TOKEN + images * IMAGE_TOKEN_ESTIMATE
+
+
+class TokenBucket:
+    """Token bucket refilled continuously up to one minute's worth of tokens.
+
+    Takes are reservations: the bucket may go negative, and the caller waits
+    for the returned delay, so concurrent callers are served in order.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self, amount: float) -> float:
+        """Reserve tokens and return the seconds to wait before using them."""
+        self._refill()
+        # Larger amounts would never fit, they wait for a full bucket instead
+        self.tokens -= min(amount, self.capacity)
+        return max(-self.tokens / self.rate, 0.0)
+
+    def give(self, amount: float) -> None:
+        """Return unused tokens, or take more when ``amount`` is negative."""
+        self._refill()
+        self.tokens = min(self.tokens + amount, self.capacity)
+
+    def drain(self) -> None:
+        """Empty the bucket, e.g. after the provider throttled."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.capacity)
+        self.updated = now
+
+
+class AdaptiveConcurrency:
+    """Concurrency limit adjusted by additive increase, multiplicative decrease."""
+
+    def __init__(self, maximum: int, latency_threshold: float):
+        self.maximum = maximum
+        self.latency_threshold = latency_threshold
+        self.limit = float(maximum)
+        self.in_flight = 0
+        # One condition per event loop: every invocation runs on a fresh loop.
+        self._conditions = weakref.WeakKeyDictionary()
+
+    async def acquire(self) -> None:
+        """Wait for a free slot and take it."""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, throttled: bool, latency: Optional[float]) -> None:
+        """Free a slot and adapt the limit to the outcome of the call."""
+        if throttled:
+            self.limit *= THROTTLE_DECREASE_FACTOR
+        elif latency is not None and latency > self.latency_threshold:
+            self.limit *= LATENCY_DECREASE_FACTOR
+        elif latency is not None:
+            self.limit += 1 / self.limit
+        self.limit = min(max(self.limit, MODEL_CONCURRENCY_MIN), self.maximum)
+
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        condition = self._conditions.get(loop)
+        if condition is None:
+            condition = asyncio.Condition()
+            self._conditions[loop] = condition
+        return condition
+
+
+class SharedRateBudget:
+    """Request and token budget of a model shared by all containers.
+
+    Usage is counted in DynamoDB per model and fixed window. The budget is an
+    optimization only: when DynamoDB fails, calls are admitted.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None,
+    ):
+        dynamodb = boto3.resource(
+            AWS_SERVICE_DYNAMODB,
+            region_name=region_name or os.environ.get(ENV_AWS_REGION, DEFAULT_REGION),
+            endpoint_url=endpoint_url,
+        )
+        self.table = dynamodb.Table(table_name)
+
+    def reserve(self, model_id: str, tokens: int, rpm: int, tpm: int) -> float:
+        """Count a call in the current window.
+
+        Returns:
+            float: 0 when admitted, else the seconds until the next window
+        """
+        window = int(time.time() // RATE_LIMIT_WINDOW_SECONDS)
+        try:
+            self.table.update_item(
+                Key={"cache_key": _window_key(model_id, window)},
+                UpdateExpression="ADD requests :one, tokens :tokens "
+                "SET expires_at = :expires_at",
+                ConditionExpression="attribute_not_exists(requests) "
+                "OR (requests < :rpm AND tokens < :tpm)",
+                ExpressionAttributeValues={
+                    ":one": 1,
+                    ":tokens": tokens,
+                    ":rpm": rpm,
+                    ":tpm": tpm,
+                    ":expires_at": (window + 2) * RATE_LIMIT_WINDOW_SECONDS,
+                },
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return (
+                    RATE_LIMIT_WINDOW_SECONDS - time.time() % RATE_LIMIT_WINDOW_SECONDS
+                )
+            logger.warning(
+                "Shared rate budget unavailable, admitting call",
+                model_id=model_id,
+                error_code=e.response["Error"]["Code"],
+            )
+        return 0.0
+
+    def adjust(self, model_id: str, tokens: int) -> None:
+        """Correct the token count of the current window by the actual usage."""
+        window = int(time.time() // RATE_LIMIT_WINDOW_SECONDS)
+        try:
+            self.table.update_item(
+                Key={"cache_key": _window_key(model_id, window)},
+                UpdateExpression="ADD tokens :tokens",
+                ExpressionAttributeValues={":tokens": tokens},
+            )
+        except ClientError as e:
+            logger.warning(
+                "Shared rate budget adjustment failed",
+                model_id=model_id,
+                error_code=e.response["Error"]["Code"],
+            )
+
+
+def _window_key(model_id: str, window: int) -> str:
+    return f"{CACHE_NAMESPACE_RATE_LIMIT}#{model_id}#{window}"
+
+
+@dataclass
+class _ModelLimits:
+    """Limiter state of one model id."""
+
+    rpm: int
+    tpm: int
+    requests: TokenBucket
+    tokens: TokenBucket
+    concurrency: AdaptiveConcurrency
+
+
+class ModelRateLimiter:
+    """Admits model calls within the request, token and concurrency limits.
+
+    State is kept per model id for the lifetime of the container, so warm
+    invocations share the budget.
+    """
+
+    def __init__(
+        self,
+        config: ThreatModelingConfig,
+        shared: Optional[SharedRateBudget] = None,
+    ):
+        self.enabled = config.rate_limit_enabled
+        self.rpm = config.rate_limit_rpm
+        self.tpm = config.rate_limit_tpm
+        self.overrides = config.rate_limit_overrides
+        self.concurrency_max = config.model_concurrency_max
+        self.latency_threshold = config.model_latency_threshold_seconds
+        self.max_retries = config.throttle_retries
+        self.shared = shared
+        self._models: Dict[str, _ModelLimits] = {}
+
+    async def acquire(self, model_id: str, tokens: int) -> None:
+        """Wait until a call of ``tokens`` estimated input tokens may start."""
+        if not self.enabled:
+            return
+
+        limits = self._limits(model_id)
+        delay = max(limits.requests.take(1), limits.tokens.take(tokens))
+        if self.shared is not None:
+            while True:
+                shared_delay = await asyncio.to_thread(
+                    self.shared.reserve, model_id, tokens, limits.rpm, limits.tpm
+                )
+                if not shared_delay:
+                    break
+                await asyncio.sleep(shared_delay)
+        if delay:
+            logger.info(
+                "Model call delayed by rate limit",
+                model_id=model_id,
+                delay_seconds=round(delay, 2),
+            )
+            await asyncio.sleep(delay)
+        await limits.concurrency.acquire()
+
+    async def release(
+        self,
+        model_id: str,
+        estimated_tokens: int,
+        usage: Optional[Dict[str, Any]] = None,
+        latency: Optional[float] = None,
+        throttled: bool = False,
+    ) -> None:
+        """Record the outcome of a call admitted by ``acquire``.
+
+        Args:
+            model_id: Model that served the call
+            estimated_tokens: Input tokens reserved by ``acquire``
+            usage: Usage reported by the provider, corrects the estimate
+            latency: Duration of the call, None when it failed
+            throttled: Whether the provider rejected the call with a 429
+        """
+        if not self.enabled:
+            return
+
+        limits = self._limits(model_id)
+        if throttled:
+            limits.requests.drain()
+            limits.tokens.drain()
+        elif usage and usage.get("input_tokens"):
+            correction = estimated_tokens - usage["input_tokens"]
+            limits.tokens.give(correction)
+            if self.shared is not None and correction:
+                await asyncio.to_thread(self.shared.adjust, model_id, -correction)
+        await limits.concurrency.release(throttled, latency)
+
+        if throttled:
+            logger.warning(
+                "Model call throttled by provider",
+                model_id=model_id,
+                concurrency_limit=round(limits.concurrency.limit, 2),
+            )
+
+    def _limits(self, model_id: str) -> _ModelLimits:
+        limits = self._models.get(model_id)
+        if limits is None:
+            override = self.overrides.get(model_id, {})
+            rpm = override.get("rpm", self.rpm)
+            tpm = override.get("tpm", self.tpm)
+            limits = _ModelLimits(
+                rpm=rpm,
+                tpm=tpm,
+                requests=TokenBucket(rpm),
+                tokens=TokenBucket(tpm),
+                concurrency=AdaptiveConcurrency(
+                    self.concurrency_max, self.latency_threshold
+                ),
+            )
+            self._models[model_id] = limits
+        return limits
+
+
+def create_rate_limiter(config: ThreatModelingConfig) -> ModelRateLimiter:
+    """Create the model rate limiter, sharing its budget when configured.
+
+    The shared budget lives in the result cache table and is skipped when no
+    cache table is configured.
+    """
+    shared = None
+    table_name = os.environ.get(ENV_RESULT_CACHE_TABLE)
+    if config.rate_limit_enabled and config.rate_limit_shared:
+        if table_name:
+            shared = SharedRateBudget(
+                table_name, endpoint_url=os.environ.get(ENV_DYNAMODB_ENDPOINT_URL)
+            )
+        else:
+            logger.warning("Shared rate budget disabled, no cache table configured")
+    return ModelRateLimiter(config, shared)
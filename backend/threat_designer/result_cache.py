@@ -0,0 +1,257 @@
+"""
+Content-addressed cache of threat modeling results.
+
+Results are stored in DynamoDB under a SHA-256 fingerprint of every input that
+determines them, so resubmitting the same diagram with the same settings can
+reuse a previous run. Intermediate stage results (assets, flows) are memoized
+in the same table, so a job changing only the threat settings skips the stages
+it shares with an earlier job. Entries expire through a TTL attribute. The cache is an
+optimization only: lookup and store failures are logged and treated as misses.
+"""
+
+import hashlib
+import json
+import os
+import time
+import zlib
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+import boto3
+from botocore.exceptions import ClientError
+from constants import (AWS_SERVICE_DYNAMODB, CACHE_MAX_ITEM_BYTES,
+                       DEFAULT_REGION, ENV_AWS_REGION,
+                       ENV_DYNAMODB_ENDPOINT_URL, ENV_RESULT_CACHE_TABLE)
+from monitoring import logger
+from pydantic import BaseModel, ValidationError
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Lowercase a text and collapse its whitespace."""
+    return " ".join((value or "").lower().split())
+
+
+def fingerprint(**parts: Any) -> str:
+    """SHA-256 hex digest of JSON-serializable parts, independent of their order."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def result_cache_key(
+    image_hash: str,
+    description: Optional[str],
+    assumptions: Optional[Iterable[str]],
+    model_ids: List[str],
+    reasoning: int,
+    iteration: int,
+) -> str:
+    """Fingerprint of all inputs of a full threat modeling run."""
+    return fingerprint(
+        image=image_hash,
+        description=normalize_text(description),
+        assumptions=sorted(normalize_text(item) for item in assumptions or []),
+        models=model_ids,
+        reasoning=reasoning,
+        iteration=iteration,
+    )
+
+
+def stage_cache_key(
+    image_hash: str,
+    description: Optional[str],
+    assumptions: Optional[Iterable[str]],
+    model_ids: List[str],
+    **inputs: Any,
+) -> str:
+    """Fingerprint of the inputs of a single workflow stage."""
+    return fingerprint(
+        image=image_hash,
+        description=normalize_text(description),
+        assumptions=sorted(normalize_text(item) for item in assumptions or []),
+        models=model_ids,
+        **inputs,
+    )
+
+
+class ResultCache:
+    """DynamoDB table of cached values, namespaced by kind of result.
+
+    The table uses ``cache_key`` (S) as partition key and ``expires_at`` as TTL
+    attribute. Values are stored as compressed JSON.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        ttl_hours: int,
+        endpoint_url: Optional[str] = None,
+        region_name: Optional[str] = None,
+    ) -> None:
+        self.table_name = table_name
+        self.ttl_hours = ttl_hours
+        dynamodb = boto3.resource(
+            AWS_SERVICE_DYNAMODB,
+            region_name=region_name or os.environ.get(ENV_AWS_REGION, DEFAULT_REGION),
+            endpoint_url=endpoint_url,
+        )
+        self.table = dynamodb.Table(table_name)
+
+    def get(
+        self, namespace: str, key: str, job_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached value, or None on a miss."""
+        cache_key = f"{namespace}#{key}"
+        try:
+            response = self.table.get_item(Key={"cache_key": cache_key})
+        except ClientError as e:
+            logger.warning(
+                "Result cache lookup failed",
+                namespace=namespace,
+                job_id=job_id,
+                error_code=e.response["Error"]["Code"],
+            )
+            return None
+
+        item = response.get("Item")
+        # TTL deletion is lazy, expired items may still be returned
+        if not item or int(item.get("expires_at", 0)) < time.time():
+            logger.info("Result cache miss", namespace=namespace, job_id=job_id)
+            return None
+
+        try:
+            value = json.loads(zlib.decompress(bytes(item["value"])))
+        except (zlib.error, ValueError) as e:
+            logger.warning(
+                "Result cache entry unreadable, treated as a miss",
+                namespace=namespace,
+                job_id=job_id,
+                error=str(e),
+            )
+            return None
+
+        logger.info("Result cache hit", namespace=namespace, job_id=job_id)
+        return value
+
+    def put(self, namespace: str, key: str, value: Dict[str, Any]) -> None:
+        """Store a value, replacing any previous entry."""
+        payload = zlib.compress(json.dumps(value, default=str).encode("utf-8"))
+        if len(payload) > CACHE_MAX_ITEM_BYTES:
+            logger.warning(
+                "Result too large to cache",
+                namespace=namespace,
+                size_bytes=len(payload),
+            )
+            return
+
+        try:
+            self.table.put_item(
+                Item={
+                    "cache_key": f"{namespace}#{key}",
+                    "value": payload,
+                    "expires_at": int(time.time()) + self.ttl_hours * 3600,
+                }
+            )
+        except ClientError as e:
+            logger.warning(
+                "Result cache store failed",
+                namespace=namespace,
+                error_code=e.response["Error"]["Code"],
+            )
+            return
+
+        logger.info("Result cached", namespace=namespace, size_bytes=len(payload))
+
+
+class StageCache:
+    """Memoizes workflow stage results across jobs sharing the same inputs.
+
+    Hits and misses are counted per job and reported once the job finishes.
+    """
+
+    def __init__(self, result_cache: Optional[ResultCache]):
+        self.result_cache = result_cache
+        self._usage: Dict[str, Counter] = defaultdict(Counter)
+
+    def key(
+        self, state: Dict[str, Any], configurable: Dict[str, Any], **inputs: Any
+    ) -> Optional[str]:
+        """Fingerprint of a stage for a job, None when the stage is not cacheable."""
+        if (
+            self.result_cache is None
+            or configurable.get("bypass_cache", False)
+            or not state.get("image_hash")
+        ):
+            return None
+
+        return stage_cache_key(
+            state["image_hash"],
+            state.get("description"),
+            state.get("assumptions"),
+            [
+                _model_id(configurable.get(model))
+                for model in ["model_main", "model_struct"]
+            ],
+            **inputs,
+        )
+
+    def get(
+        self, namespace: str, key: str, model: Type[BaseModel], job_id: str
+    ) -> Optional[BaseModel]:
+        """Return the memoized stage result, or None on a miss.
+
+        Entries that no longer validate, e.g. after a schema change, are
+        misses.
+        """
+        value = self.result_cache.get(namespace, key, job_id)
+        result = None
+        if value is not None:
+            try:
+                result = model(**value)
+            except (ValidationError, TypeError) as e:
+                logger.warning(
+                    "Stage cache entry invalid, treated as a miss",
+                    namespace=namespace,
+                    job_id=job_id,
+                    error=str(e),
+                )
+        self._usage[job_id]["hits" if result is not None else "misses"] += 1
+        return result
+
+    def put(self, namespace: str, key: str, result: BaseModel) -> None:
+        """Memoize a stage result."""
+        self.result_cache.put(namespace, key, result.dict())
+
+    def report(self, job_id: str) -> None:
+        """Log the stage cache hits and misses of a finished job."""
+        usage = self._usage.pop(job_id, None)
+        if usage:
+            logger.info(
+                "Stage cache usage",
+                job_id=job_id,
+                hits=usage["hits"],
+                misses=usage["misses"],
+            )
+
+
+def _model_id(model: Any) -> Optional[str]:
+    """Identity of a chat model, including its thinking budget."""
+    if model is None:
+        return None
+    return f"{getattr(model, 'model', '')}:{getattr(model, 'thinking_budget', None)}"
+
+
+def create_result_cache(ttl_hours: int) -> Optional[ResultCache]:
+    """Create the result cache configured through the environment.
+
+    Returns None when no cache table is configured.
+    """
+    table_name = os.environ.get(ENV_RESULT_CACHE_TABLE)
+    if not table_name:
+        logger.info("Result cache disabled, no cache table configured")
+        return None
+
+    return ResultCache(
+        table_name,
+        ttl_hours=ttl_hours,
+        endpoint_url=os.environ.get(ENV_DYNAMODB_ENDPOINT_URL),
+    )
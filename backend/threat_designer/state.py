@@ -1,14 +1,22 @@
 """Module containing state classes and data models for the threat designer application."""
 
 import operator
+import re
 from datetime import datetime
-from typing import Annotated, List, Literal, Optional, TypedDict
+from typing import (Annotated, Any, Dict, FrozenSet, List, Literal, Optional,
+                    Set, Tuple, TypedDict, Union)
 
+from config import config
 from constants import (MITIGATION_MAX_ITEMS, MITIGATION_MIN_ITEMS,
                        SUMMARY_MAX_WORDS_DEFAULT, THREAT_DESCRIPTION_MAX_WORDS,
-                       THREAT_DESCRIPTION_MIN_WORDS, AssetType, StrideCategory)
+                       THREAT_DESCRIPTION_MIN_WORDS, AssetType,
+                       LikelihoodLevel, StrideCategory)
 from langchain_google_genai import ChatGoogleGenerativeAI
-from pydantic import BaseModel, Field
+from monitoring import logger
+from output_repair import canonical_choice
+from pydantic import (BaseModel, Field, PrivateAttr, ValidationInfo,
+                      field_validator, model_serializer)
+from threat_index import ThreatSimilarityIndex
 
 
 class ConfigSchema(TypedDict):
@@ -17,8 +25,12 @@ class ConfigSchema(TypedDict):
     model_main: ChatGoogleGenerativeAI
     model_struct: ChatGoogleGenerativeAI
     model_summary: ChatGoogleGenerativeAI
+    # Fallback chain of each of the models above, by key
+    model_fallbacks: Dict[str, List[ChatGoogleGenerativeAI]]
     start_time: datetime
     reasoning: bool
+    thread_id: str
+    bypass_cache: bool
 
 
 class SummaryState(BaseModel):
@@ -119,6 +131,46 @@ class FlowsList(BaseModel):
         List[ThreatSource], Field(description="The list of threat actors")
     ]
 
+    def partition(self, size: int) -> List["FlowsList"]:
+        """Split data flows and trust boundaries into chunks of about ``size`` items.
+
+        Flows and boundaries between the same pair of entities stay in the same
+        chunk, and every chunk keeps the full list of threat sources.
+        """
+        if len(self.data_flows) + len(self.trust_boundaries) <= size:
+            return [self]
+
+        groups: Dict[FrozenSet[str], tuple] = {}
+        for flow in self.data_flows:
+            key = frozenset((flow.source_entity, flow.target_entity))
+            groups.setdefault(key, ([], []))[0].append(flow)
+        for boundary in self.trust_boundaries:
+            key = frozenset((boundary.source_entity, boundary.target_entity))
+            groups.setdefault(key, ([], []))[1].append(boundary)
+
+        chunks = []
+        flows, boundaries = [], []
+        for group_flows, group_boundaries in groups.values():
+            group_size = len(group_flows) + len(group_boundaries)
+            if (flows or boundaries) and (
+                len(flows) + len(boundaries) + group_size > size
+            ):
+                chunks.append((flows, boundaries))
+                flows, boundaries = [], []
+            flows.extend(group_flows)
+            boundaries.extend(group_boundaries)
+        if flows or boundaries:
+            chunks.append((flows, boundaries))
+
+        return [
+            FlowsList(
+                data_flows=chunk_flows,
+                trust_boundaries=chunk_boundaries,
+                threat_sources=self.threat_sources,
+            )
+            for chunk_flows, chunk_boundaries in chunks
+        ]
+
 
 class Threat(BaseModel):
     """Model representing an identified security threat."""
@@ -150,16 +202,209 @@ class Threat(BaseModel):
         ),
     ]
 
+    @field_validator("stride_category", "likelihood", mode="before")
+    @classmethod
+    def _canonical_choice(cls, value: Any, info: ValidationInfo) -> Any:
+        """Spell known STRIDE categories and likelihood levels canonically."""
+        choices = (
+            StrideCategory if info.field_name == "stride_category" else LikelihoodLevel
+        )
+        return canonical_choice(value, [choice.value for choice in choices]) or value
+
+    def similarity_text(self) -> str:
+        """Text compared by the near-duplicate index."""
+        return f"{self.name} {self.target} {self.description}"
+
+    def identity_key(self) -> tuple:
+        """Normalized key identifying the same threat across generations."""
+        return (
+            _normalize_text(self.name),
+            _normalize_text(self.target),
+            _normalize_text(self.stride_category),
+        )
+
 
 class ThreatsList(BaseModel):
     """Collection of identified security threats."""
 
     threats: Annotated[List[Threat], Field(description="The list of threats")]
 
-    def __add__(self, other: "ThreatsList") -> "ThreatsList":
-        """Combine two ThreatsList instances."""
-        combined_threats = self.threats + other.threats
-        return ThreatsList(threats=combined_threats)
+
+def _normalize_text(value: str) -> str:
+    """Lowercase and collapse punctuation and whitespace."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", value.lower()).split())
+
+
+def _match_asset(target: str, names: List[str]) -> Optional[str]:
+    """The asset name a threat target stands for, or None."""
+    match = canonical_choice(target, names)
+    if match is not None:
+        return match
+
+    # Targets often qualify the asset, e.g. "Orders database (RDS)"
+    padded_target = f" {_normalize_text(target)} "
+    contained = [
+        name
+        for name in names
+        if _normalize_text(name) and f" {_normalize_text(name)} " in padded_target
+    ]
+    return max(contained, key=len) if contained else None
+
+
+class ThreatAccumulator(BaseModel):
+    """Append-only collection of threats used as the ``threat_list`` channel.
+
+    Merging appends to storage shared with the previous accumulator instead of
+    copying and re-validating the whole list. Each accumulator only sees the
+    first ``len(self)`` stored threats, so earlier snapshots never change. The
+    identity keys and similarity index are carried along the same way, so each
+    threat is indexed once per job. A validated ``ThreatsList`` is only built
+    on demand by ``materialize``.
+    """
+
+    _items: List[Threat] = PrivateAttr(default_factory=list)
+    _count: int = PrivateAttr(default=0)
+    _keys: Set[tuple] = PrivateAttr(default_factory=set)
+    _index: Optional[ThreatSimilarityIndex] = PrivateAttr(default=None)
+
+    def __init__(self, threats: Optional[List[Any]] = None, **data: Any):
+        super().__init__(**data)
+        if threats:
+            # Restored from a checkpoint: threats arrive as plain dicts
+            self._append(
+                [
+                    threat if isinstance(threat, Threat) else Threat(**threat)
+                    for threat in threats
+                ]
+            )
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def threats(self) -> List[Threat]:
+        """The threats of this accumulator."""
+        return self._items[: self._count]
+
+    @model_serializer
+    def _serialize(self) -> Dict[str, Any]:
+        return {"threats": [threat.model_dump() for threat in self.threats]}
+
+    def coverage(self, assets: Optional[AssetsList]) -> Set[Tuple[str, str]]:
+        """Distinct (asset, STRIDE category) cells covered by the threats.
+
+        Threat targets are free text, so each is mapped to the asset it names.
+        Targets naming no asset cover no cell, and rewording a target never
+        adds coverage.
+        """
+        if not assets:
+            return set()
+
+        names = [asset.name for asset in assets.assets]
+        resolved: Dict[str, Optional[str]] = {}
+        cells = set()
+        for threat in self.threats:
+            if threat.target not in resolved:
+                resolved[threat.target] = _match_asset(threat.target, names)
+            asset = resolved[threat.target]
+            if asset is not None:
+                cells.add((asset, threat.stride_category))
+        return cells
+
+    def materialize(self) -> ThreatsList:
+        """Build a validated ThreatsList of the accumulated threats."""
+        return ThreatsList(threats=self.threats)
+
+    def merge(self, threats: List[Threat]) -> "ThreatAccumulator":
+        """Return a new accumulator with the non-duplicate ``threats`` appended.
+
+        Threats whose normalized name, target and STRIDE category are already
+        present are dropped, as happens when parallel branches describe the
+        same threat. When de-duplication is enabled, threats re-emitted with
+        different wording are dropped too: a threat is a near duplicate when
+        its MinHash similarity to a threat of the same STRIDE category reaches
+        ``threat_dedup_threshold``.
+        """
+        merged = ThreatAccumulator()
+        if self._count == len(self._items):
+            # At the tip of the shared storage: extend it in place
+            merged._items = self._items
+            merged._keys = self._keys
+            merged._index = self._index
+            merged._count = self._count
+        else:
+            merged._append(self.threats)
+
+        merged._append(threats, log_duplicates=True)
+        return merged
+
+    def _append(self, threats: List[Threat], log_duplicates: bool = False) -> None:
+        """Append the non-duplicate ``threats`` to the shared storage."""
+        if config.threat_dedup_enabled and self._index is None:
+            self._index = ThreatSimilarityIndex(config.threat_dedup_threshold)
+            for threat in self.threats:
+                self._index.add(threat.similarity_text(), threat.identity_key()[2])
+
+        kept = 0
+        exact_duplicates = 0
+        near_duplicates = 0
+        for threat in threats:
+            key = threat.identity_key()
+            if key in self._keys:
+                exact_duplicates += 1
+                continue
+
+            if self._index is not None:
+                duplicate = self._index.add_unique(threat.similarity_text(), key[2])
+                if duplicate is not None:
+                    near_duplicates += 1
+                    logger.debug(
+                        "Near-duplicate threat dropped",
+                        threat=threat.name,
+                        duplicate_of=self._items[duplicate[0]].name,
+                        similarity=round(duplicate[1], 3),
+                    )
+                    continue
+
+            self._keys.add(key)
+            self._items.append(threat)
+            self._count += 1
+            kept += 1
+
+        if log_duplicates and (exact_duplicates or near_duplicates):
+            logger.info(
+                "Duplicate threats dropped",
+                received=len(threats),
+                kept=kept,
+                exact_duplicates=exact_duplicates,
+                near_duplicates=near_duplicates,
+                threshold=(
+                    config.threat_dedup_threshold if self._index is not None else None
+                ),
+            )
+
+
+def merge_threat_lists(
+    left: Optional[ThreatAccumulator],
+    right: Optional[Union[ThreatsList, ThreatAccumulator]],
+) -> ThreatAccumulator:
+    """Reducer for the ``threat_list`` channel.
+
+    Appends the threats of ``right`` to ``left``, see ``ThreatAccumulator.merge``.
+    """
+    if left is None:
+        left = ThreatAccumulator()
+    if right is None:
+        return left
+    return left.merge(right.threats)
+
+
+class ConvergenceState(BaseModel):
+    """Threat catalog growth tracked across gap analysis rounds."""
+
+    threats_count: int = 0
+    covered_cells: int = 0
+    stale_rounds: int = 0
 
 
 class AgentState(TypedDict):
@@ -167,13 +412,13 @@ class AgentState(TypedDict):
 
     summary: Optional[str] = None
     assets: Optional[AssetsList] = None
-    image_data: Optional[str] = None
+    image_uri: Optional[str] = None
     system_architecture: Optional[FlowsList] = None
     description: Optional[str] = None
     assumptions: Optional[List[str]] = None
     improvement: Optional[str] = None
     next_step: Optional[str] = None
-    threat_list: Annotated[ThreatsList, operator.add]
+    threat_list: Annotated[ThreatAccumulator, merge_threat_lists]
     job_id: Optional[str] = None
     retry: Optional[int] = 1
     iteration: Optional[int] = 1
@@ -182,4 +427,7 @@ class AgentState(TypedDict):
     owner: Optional[str] = None
     stop: Optional[bool] = False
     gap: Annotated[List[str], operator.add] = []
+    convergence: Optional[ConvergenceState] = None
+    image_hash: Optional[str] = None
+    cache_key: Optional[str] = None
     replay: Optional[bool] = False
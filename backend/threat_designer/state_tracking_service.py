@@ -1,13 +1,33 @@
-"""State management service for workflow operations."""
+"""State management service for workflow operations.
 
-from typing import Optional
+The underlying boto3 helpers are blocking, so every method hands them off to a
+worker thread to keep the event loop free while DynamoDB round-trips are in
+flight.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
 
 from constants import FLUSH_MODE_REPLACE, JobState
 from exceptions import StateUpdateError
-from monitoring import with_error_context
-from utils import (create_dynamodb_item, update_item_with_backup,
+from monitoring import logger, with_error_context
+from utils import (update_agent_item, update_item_with_backup,
                    update_job_state, update_trail)
 
+# Scalar attributes re-asserted at finalize; results are streamed beforehand.
+FINAL_METADATA_FIELDS = [
+    "summary",
+    "description",
+    "assumptions",
+    "title",
+    "owner",
+    "image_hash",
+]
+
+# Attributes restored from the result cache, besides the threats.
+CACHED_RESULT_FIELDS = ["summary", "assets", "system_architecture", "retry"]
+
 
 class StateService:
     """Service for managing workflow state operations."""
@@ -16,19 +36,29 @@ class StateService:
         self.agent_table = agent_table
 
     @with_error_context("job state update")
-    def update_job_state(
-        self, job_id: str, state: JobState, retry_count: Optional[int] = None
+    async def update_job_state(
+        self,
+        job_id: str,
+        state: JobState,
+        retry_count: Optional[int] = None,
+        accounting: Optional[Dict[str, Any]] = None,
     ) -> None:
         """Update job state with error handling."""
         try:
             # Convert enum to string value for the underlying utility function
             state_value = state.value if isinstance(state, JobState) else state
-            update_job_state(job_id, state_value, retry_count)
+            await asyncio.to_thread(
+                update_job_state,
+                job_id,
+                state_value,
+                retry_count,
+                accounting=accounting,
+            )
         except Exception as e:
-            raise StateUpdateError(f"Failed to update job state: {str(e)}")
+            raise StateUpdateError(f"Failed to update job state: {str(e)}") from e
 
     @with_error_context("trail update")
-    def update_trail(
+    async def update_trail(
         self,
         job_id: str,
         threats: Optional[str] = None,
@@ -49,22 +79,118 @@ class StateService:
             if flows is not None:
                 kwargs["flows"] = flows
 
-            update_trail(**kwargs)
+            await asyncio.to_thread(update_trail, **kwargs)
         except Exception as e:
-            raise StateUpdateError(f"Failed to update trail: {str(e)}")
+            raise StateUpdateError(f"Failed to update trail: {str(e)}") from e
+
+    @with_error_context("progress persistence")
+    async def persist_progress(
+        self,
+        job_id: str,
+        fields: Dict[str, Any],
+        threats: Optional[List[Dict[str, Any]]] = None,
+        replace_threats: bool = False,
+    ) -> None:
+        """Persist partial results on the job's agent state item."""
+        try:
+            await asyncio.to_thread(
+                update_agent_item,
+                job_id,
+                self.agent_table,
+                fields,
+                threats,
+                replace_threats,
+            )
+        except Exception as e:
+            raise StateUpdateError(f"Failed to persist progress: {str(e)}") from e
 
     @with_error_context("finalization")
-    def finalize_workflow(self, state: dict) -> None:
-        """Finalize workflow and persist state."""
+    async def finalize_workflow(self, state: dict) -> None:
+        """Finalize workflow metadata.
+
+        Assets, flows and threats were already streamed by ProgressPersister,
+        so only the scalar attributes are written here.
+        """
         try:
-            create_dynamodb_item(state, self.agent_table)
+            fields = {field: state.get(field) for field in FINAL_METADATA_FIELDS}
+            fields["retry"] = state.get("retry")
+            fields["timestamp"] = datetime.now(timezone.utc).isoformat()
+            await asyncio.to_thread(
+                update_agent_item, state["job_id"], self.agent_table, fields
+            )
         except Exception as e:
-            raise StateUpdateError(f"Failed to finalize workflow: {str(e)}")
+            raise StateUpdateError(f"Failed to finalize workflow: {str(e)}") from e
+
+    @with_error_context("results restore")
+    async def restore_results(self, state: dict, result: Dict[str, Any]) -> None:
+        """Write the cached results of an identical run as the job's results."""
+        try:
+            fields = {field: state.get(field) for field in FINAL_METADATA_FIELDS}
+            for field in CACHED_RESULT_FIELDS:
+                fields[field] = result.get(field)
+            fields["timestamp"] = datetime.now(timezone.utc).isoformat()
+            await asyncio.to_thread(
+                update_agent_item,
+                state["job_id"],
+                self.agent_table,
+                fields,
+                result.get("threats", []),
+                True,
+            )
+        except Exception as e:
+            raise StateUpdateError(f"Failed to restore results: {str(e)}") from e
 
     @with_error_context("backup update")
-    def update_with_backup(self, job_id: str) -> None:
+    async def update_with_backup(self, job_id: str) -> None:
         """Update item with backup."""
         try:
-            update_item_with_backup(job_id, self.agent_table)
+            await asyncio.to_thread(update_item_with_backup, job_id, self.agent_table)
         except Exception as e:
-            raise StateUpdateError(f"Failed to update with backup: {str(e)}")
+            raise StateUpdateError(f"Failed to update with backup: {str(e)}") from e
+
+
+class ProgressPersister:
+    """Streams partial results to the agent state item as the workflow runs.
+
+    Fed with every ``values`` snapshot of ``agent.astream``; only what changed
+    since the previous snapshot is written, and threats are appended rather
+    than rewritten.
+    """
+
+    def __init__(self, state_service: StateService, job_id: str):
+        self.state_service = state_service
+        self.job_id = job_id
+        self._persisted: Dict[str, Any] = {}
+        self._threats_count = 0
+
+    async def persist(self, snapshot: Dict[str, Any]) -> None:
+        """Persist the parts of ``snapshot`` that were not stored yet."""
+        fields = {}
+        for field in ["summary", "assets", "system_architecture"]:
+            value = snapshot.get(field)
+            if value is not None and value is not self._persisted.get(field):
+                fields[field] = value.dict() if hasattr(value, "dict") else value
+
+        threat_list = snapshot.get("threat_list")
+        all_threats = threat_list.threats if threat_list else []
+        new_threats = [threat.dict() for threat in all_threats[self._threats_count :]]
+        replace_threats = self._threats_count == 0 and bool(new_threats)
+
+        if not fields and not new_threats:
+            return
+
+        await self.state_service.persist_progress(
+            self.job_id, fields, new_threats, replace_threats
+        )
+
+        for field in fields:
+            self._persisted[field] = snapshot[field]
+        self._threats_count = len(all_threats)
+
+        logger.info(
+            "Progress persisted",
+            job_id=self.job_id,
+            fields=list(fields),
+            new_threats=len(new_threats),
+            total_threats=self._threats_count,
+        )
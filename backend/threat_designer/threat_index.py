@@ -0,0 +1,143 @@
+"""
+Near-duplicate detection for generated threats.
+
+Threats are compared through MinHash signatures over the word shingles of
+their name, target and description. Signatures are bucketed by
+locality-sensitive hashing bands, so a lookup only compares the few threats
+sharing a band. Candidates are confirmed against the similarity threshold
+using the estimated Jaccard similarity.
+"""
+
+import random
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from constants import (THREAT_INDEX_NUM_PERMUTATIONS,
+                       THREAT_INDEX_ROWS_PER_BAND, THREAT_INDEX_SEED)
+
+# Mersenne prime used by the universal hash family of the permutations
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Function words carrying no meaning in threat statements
+_STOP_WORDS = frozenset(
+    "a an and as at by can for from in into is it of on or the their this "
+    "through to which with".split()
+)
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercase words of a text, punctuation and stop words removed."""
+    words = re.sub(r"[^a-z0-9]+", " ", text.lower()).split()
+    return [word for word in words if word not in _STOP_WORDS]
+
+
+def _shingles(text: str) -> Set[int]:
+    """Hashed word bigrams of a text (unigrams for single-word texts)."""
+    words = _tokenize(text)
+    if len(words) < 2:
+        grams = words
+    else:
+        grams = [f"{first} {second}" for first, second in zip(words, words[1:])]
+    return {zlib.crc32(gram.encode("utf-8")) for gram in grams}
+
+
+class ThreatSimilarityIndex:
+    """MinHash/LSH index answering "was a similar threat already seen?"."""
+
+    def __init__(
+        self,
+        threshold: float,
+        num_permutations: int = THREAT_INDEX_NUM_PERMUTATIONS,
+        rows_per_band: int = THREAT_INDEX_ROWS_PER_BAND,
+    ):
+        self.threshold = threshold
+        self.rows_per_band = rows_per_band
+        rng = random.Random(THREAT_INDEX_SEED)
+        self._permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_permutations)
+        ]
+        self._signatures: List[Tuple[int, ...]] = []
+        self._buckets: Dict[Tuple, List[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """MinHash signature of a text."""
+        shingles = _shingles(text)
+        if not shingles:
+            return tuple(_MAX_HASH for _ in self._permutations)
+        return tuple(
+            min(
+                ((a * shingle + b) % _MERSENNE_PRIME) & _MAX_HASH
+                for shingle in shingles
+            )
+            for a, b in self._permutations
+        )
+
+    def find_duplicate(self, text: str, group: str = "") -> Optional[Tuple[int, float]]:
+        """Return the position and similarity of the closest indexed duplicate.
+
+        Only entries added with the same ``group`` are considered.
+        """
+        return self._find(self.signature(text), group)
+
+    def add(self, text: str, group: str = "") -> int:
+        """Index a text and return its position."""
+        return self._add(self.signature(text), group)
+
+    def add_unique(self, text: str, group: str = "") -> Optional[Tuple[int, float]]:
+        """Index a text unless it duplicates an entry of its group.
+
+        Returns the duplicate found, as ``find_duplicate``, or None when the
+        text was indexed.
+        """
+        signature = self.signature(text)
+        duplicate = self._find(signature, group)
+        if duplicate is None:
+            self._add(signature, group)
+        return duplicate
+
+    def _find(
+        self, signature: Tuple[int, ...], group: str
+    ) -> Optional[Tuple[int, float]]:
+        """Closest duplicate of a signature within its group."""
+        best: Optional[Tuple[int, float]] = None
+        for position in self._candidates(signature, group):
+            similarity = self._similarity(signature, self._signatures[position])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (position, similarity)
+        return best
+
+    def _add(self, signature: Tuple[int, ...], group: str) -> int:
+        """Index a signature and return its position."""
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        for band in self._bands(signature, group):
+            self._buckets[band].append(position)
+        return position
+
+    def _bands(self, signature: Tuple[int, ...], group: str) -> List[Tuple]:
+        """LSH band keys of a signature."""
+        rows = self.rows_per_band
+        return [
+            (group, start, signature[start : start + rows])
+            for start in range(0, len(signature), rows)
+        ]
+
+    def _candidates(self, signature: Tuple[int, ...], group: str) -> Set[int]:
+        """Positions sharing at least one band with a signature."""
+        candidates = set()
+        for band in self._bands(signature, group):
+            candidates.update(self._buckets.get(band, ()))
+        return candidates
+
+    @staticmethod
+    def _similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        matches = sum(1 for a, b in zip(first, second) if a == b)
+        return matches / len(first)
@@ -4,31 +4,35 @@ Provides functionality for state management, image processing, and error handlin
 in AWS Lambda environments. Includes tools for working with Amazon Bedrock and structured data.
 """
 
-import base64
 import copy
 import decimal
+import json
 import os
+import time
 import traceback
 from datetime import datetime, timezone
-from typing import (Any, Callable, Dict, List, Optional, ParamSpec, TypeVar,
-                    Union)
+from typing import (Any, Awaitable, Callable, Dict, List, Optional, ParamSpec,
+                    TypeVar, Union)
 
 import boto3
 import structlog
+from accounting import current_accounting
 from botocore.exceptions import ClientError
-from constants import (AWS_SERVICE_DYNAMODB, AWS_SERVICE_S3, DB_FIELD_ASSETS,
+from constants import (AWS_SERVICE_DYNAMODB, AWS_SERVICE_LAMBDA,
+                       AWS_SERVICE_S3, DB_FIELD_ACCOUNTING, DB_FIELD_ASSETS,
                        DB_FIELD_BACKUP, DB_FIELD_FLOWS, DB_FIELD_GAPS,
                        DB_FIELD_ID, DB_FIELD_JOB_ID, DB_FIELD_RETRY,
                        DB_FIELD_STATE, DB_FIELD_THREATS, DB_FIELD_TIMESTAMP,
                        DEFAULT_REGION, ENV_AGENT_TRAIL_TABLE, ENV_AWS_REGION,
                        ENV_JOB_STATUS_TABLE, ERROR_DYNAMODB_OPERATION_FAILED,
-                       ERROR_MISSING_ENV_VAR, ERROR_S3_OPERATION_FAILED,
-                       FLUSH_MODE_REPLACE)
-from exceptions import DynamoDBError, S3Error, ThreatModelingError
+                       ERROR_LAMBDA_INVOKE_FAILED, ERROR_MISSING_ENV_VAR,
+                       ERROR_S3_OPERATION_FAILED, FLUSH_MODE_REPLACE)
+from exceptions import DynamoDBError, LambdaError, S3Error, ThreatModelingError
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import BaseMessage
 from langchain_core.messages.human import HumanMessage
 from monitoring import operation_context, with_error_context
+from output_repair import repair_tool_output
 from prompts import structure_prompt
 from state import AgentState
 
@@ -81,6 +85,7 @@ def update_job_state(
     state: AgentState,
     retry: Optional[bool] = None,
     job_context_id: Optional[str] = None,
+    accounting: Optional[Dict[str, Any]] = None,
 ) -> Optional[Dict[str, Any]]:
     """
     Update job state in DynamoDB with proper error handling and logging.
@@ -90,6 +95,7 @@ def update_job_state(
         state: New state to set for the job.
         retry: Optional retry flag to set.
         job_context_id: Optional job context for operation tracking.
+        accounting: Optional usage and latency summary of the job to set.
 
     Returns:
         DynamoDB response or None if operation failed.
@@ -134,6 +140,11 @@ def update_job_state(
                 expr_names[f"#{DB_FIELD_RETRY}"] = DB_FIELD_RETRY
                 expr_values[f":{DB_FIELD_RETRY}"] = retry
 
+            if accounting is not None:
+                update_expr += f", #{DB_FIELD_ACCOUNTING} = :{DB_FIELD_ACCOUNTING}"
+                expr_names[f"#{DB_FIELD_ACCOUNTING}"] = DB_FIELD_ACCOUNTING
+                expr_values[f":{DB_FIELD_ACCOUNTING}"] = accounting
+
             response = table.update_item(
                 Key={DB_FIELD_ID: job_id},
                 UpdateExpression=update_expr,
@@ -161,7 +172,9 @@ def update_job_state(
                 error_message=error_message,
                 table=JOB_STATUS_TABLE,
             )
-            raise DynamoDBError(f"{ERROR_DYNAMODB_OPERATION_FAILED}: {error_message}")
+            raise DynamoDBError(
+                f"{ERROR_DYNAMODB_OPERATION_FAILED}: {error_message}"
+            ) from e
 
         except Exception as e:
             logger.error(
@@ -329,7 +342,9 @@ def update_trail(
                 error_message=error_message,
                 table=TRAIL_TABLE,
             )
-            raise DynamoDBError(f"{ERROR_DYNAMODB_OPERATION_FAILED}: {error_message}")
+            raise DynamoDBError(
+                f"{ERROR_DYNAMODB_OPERATION_FAILED}: {error_message}"
+            ) from e
 
         except Exception as e:
             logger.error(
@@ -341,91 +356,92 @@ def update_trail(
             raise
 
 
-@with_error_context("create DynamoDB item")
-def create_dynamodb_item(
-    agent_state: AgentState, table_name: str, job_context_id: Optional[str] = None
+@with_error_context("update agent DynamoDB item")
+def update_agent_item(
+    job_id: str,
+    table_name: str,
+    fields: Dict[str, Any],
+    threats: Optional[List[Dict[str, Any]]] = None,
+    replace_threats: bool = False,
+    job_context_id: Optional[str] = None,
 ) -> None:
     """
-    Create a new DynamoDB item from agent state.
+    Update top-level attributes of an agent state item and append threats.
 
     Args:
-        agent_state: Agent state containing all job information.
-        table_name: DynamoDB table name to insert into.
+        job_id: The primary key of the item to update.
+        table_name: The name of the DynamoDB table.
+        fields: Attributes to set, already converted to plain types.
+        threats: Threats to add to ``threat_list.threats``.
+        replace_threats: Whether ``threats`` replaces the stored list instead of
+            being appended to it.
         job_context_id: Optional job context for operation tracking.
 
     Raises:
-        DynamoDBError: If item creation fails.
+        DynamoDBError: If the update operation fails.
     """
-    context_id = job_context_id or f"create-item-{agent_state.get('job_id', 'unknown')}"
-
-    with operation_context("create_dynamodb_item", context_id):
-        try:
-            job_id = agent_state.get("job_id")
-            if not job_id:
-                raise ValueError("job_id is required in agent_state")
+    context_id = job_context_id or f"update-item-{job_id}"
+
+    with operation_context("update_agent_item", context_id):
+        update_parts = []
+        expr_names = {}
+        expr_values = {}
+
+        for field_name, field_value in fields.items():
+            if field_value is None:
+                continue
+            update_parts.append(f"#{field_name} = :{field_name}")
+            expr_names[f"#{field_name}"] = field_name
+            expr_values[f":{field_name}"] = field_value
+
+        if threats is not None and (threats or replace_threats):
+            expr_names["#threat_list"] = "threat_list"
+            if replace_threats:
+                update_parts.append("#threat_list = :threat_list")
+                expr_values[":threat_list"] = {"threats": threats}
+            else:
+                expr_names["#threats"] = "threats"
+                update_parts.append(
+                    "#threat_list.#threats = list_append(#threat_list.#threats, :threats)"
+                )
+                expr_values[":threats"] = threats
 
-            logger.info("Creating DynamoDB item", job_id=job_id, table=table_name)
+        if not update_parts:
+            logger.debug("No fields to update in agent item", job_id=job_id)
+            return
 
+        try:
             dynamodb = boto3.resource(AWS_SERVICE_DYNAMODB, region_name=REGION)
             table = dynamodb.Table(table_name)
 
-            current_utc = datetime.now(timezone.utc).isoformat()
-
-            # Convert agent state to DynamoDB item
-            item = {
-                DB_FIELD_JOB_ID: job_id,
-                "summary": agent_state.get("summary"),
-                "assets": agent_state["assets"].dict()
-                if hasattr(agent_state["assets"], "dict")
-                else agent_state["assets"],
-                "system_architecture": agent_state["system_architecture"].dict()
-                if hasattr(agent_state["system_architecture"], "dict")
-                else agent_state["system_architecture"],
-                "threat_list": agent_state["threat_list"].dict()
-                if hasattr(agent_state["threat_list"], "dict")
-                else agent_state["threat_list"],
-                "description": agent_state.get("description"),
-                "assumptions": agent_state.get("assumptions"),
-                "s3_location": agent_state["s3_location"],
-                "title": agent_state.get("title"),
-                "owner": agent_state.get("owner"),
-                "retry": agent_state.get("retry"),
-                "timestamp": current_utc,
-            }
-
-            # Remove None values to avoid DynamoDB issues
-            item = {k: v for k, v in item.items() if v is not None}
-
-            table.put_item(Item=item)
+            table.update_item(
+                Key={DB_FIELD_JOB_ID: job_id},
+                UpdateExpression="SET " + ", ".join(update_parts),
+                ExpressionAttributeNames=expr_names,
+                ExpressionAttributeValues=expr_values,
+            )
 
             logger.info(
-                "DynamoDB item created successfully",
+                "Agent item updated",
                 job_id=job_id,
                 table=table_name,
-                item_keys=list(item.keys()),
+                updated_fields=list(expr_names.values()),
+                threats_count=len(threats) if threats is not None else 0,
             )
 
         except ClientError as e:
             error_code = e.response["Error"]["Code"]
             error_message = e.response["Error"]["Message"]
             logger.error(
-                "DynamoDB client error during item creation",
-                job_id=agent_state.get("job_id"),
+                "DynamoDB client error during agent item update",
+                job_id=job_id,
                 error_code=error_code,
                 error_message=error_message,
                 table=table_name,
             )
-            raise DynamoDBError(f"{ERROR_DYNAMODB_OPERATION_FAILED}: {error_message}")
-
-        except Exception as e:
-            logger.error(
-                "Unexpected error during item creation",
-                job_id=agent_state.get("job_id"),
-                error=str(e),
-                table=table_name,
-                stack_trace=traceback.format_exc(),
-            )
-            raise
+            raise DynamoDBError(
+                f"{ERROR_DYNAMODB_OPERATION_FAILED}: {error_message}"
+            ) from e
 
 
 @with_error_context("update item with backup")
@@ -492,7 +508,9 @@ def update_item_with_backup(
                 error_message=error_message,
                 table=table_name,
             )
-            raise DynamoDBError(f"{ERROR_DYNAMODB_OPERATION_FAILED}: {error_message}")
+            raise DynamoDBError(
+                f"{ERROR_DYNAMODB_OPERATION_FAILED}: {error_message}"
+            ) from e
 
         except Exception as e:
             logger.error(
@@ -549,7 +567,9 @@ def fetch_results(job_id: str, table_name: str) -> Dict[str, Any]:
             error_message=error_message,
             table=table_name,
         )
-        raise DynamoDBError(f"{ERROR_DYNAMODB_OPERATION_FAILED}: {error_message}")
+        raise DynamoDBError(
+            f"{ERROR_DYNAMODB_OPERATION_FAILED}: {error_message}"
+        ) from e
 
     except Exception as e:
         logger.error(
@@ -566,39 +586,37 @@ def fetch_results(job_id: str, table_name: str) -> Dict[str, Any]:
 # ============================================================================
 
 
-@with_error_context("parse S3 image to base64")
-def parse_s3_image_to_base64(bucket_name: str, object_key: str) -> Optional[str]:
+@with_error_context("read S3 image")
+def read_s3_image(bucket_name: str, object_key: str) -> bytes:
     """
-    Download image from S3 and convert to base64.
+    Download image bytes from S3.
 
     Args:
         bucket_name: S3 bucket name.
         object_key: S3 object key.
 
     Returns:
-        Base64 encoded image string or None if operation failed.
+        Raw image bytes.
 
     Raises:
         S3Error: If S3 operation fails.
     """
     try:
-        logger.info("Converting S3 image to base64", bucket=bucket_name, key=object_key)
+        logger.info("Reading S3 image", bucket=bucket_name, key=object_key)
 
         s3_client = boto3.client(AWS_SERVICE_S3, region_name=REGION)
 
         response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
         image_content = response["Body"].read()
 
-        base64_encoded = base64.b64encode(image_content).decode("utf-8")
-
         logger.info(
-            "S3 image converted to base64 successfully",
+            "S3 image read successfully",
             bucket=bucket_name,
             key=object_key,
-            encoded_size=len(base64_encoded),
+            size_bytes=len(image_content),
         )
 
-        return base64_encoded
+        return image_content
 
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
@@ -613,12 +631,12 @@ def parse_s3_image_to_base64(bucket_name: str, object_key: str) -> Optional[str]
             )
             raise S3Error(
                 f"The object {object_key} does not exist in bucket {bucket_name}"
-            )
+            ) from e
         elif error_code == "NoSuchBucket":
             logger.error(
                 "S3 bucket not found", bucket=bucket_name, error_code=error_code
             )
-            raise S3Error(f"The bucket {bucket_name} does not exist")
+            raise S3Error(f"The bucket {bucket_name} does not exist") from e
         else:
             logger.error(
                 "S3 client error",
@@ -627,7 +645,7 @@ def parse_s3_image_to_base64(bucket_name: str, object_key: str) -> Optional[str]
                 error_code=error_code,
                 error_message=error_message,
             )
-            raise S3Error(f"{ERROR_S3_OPERATION_FAILED}: {error_message}")
+            raise S3Error(f"{ERROR_S3_OPERATION_FAILED}: {error_message}") from e
 
     except Exception as e:
         logger.error(
@@ -639,12 +657,54 @@ def parse_s3_image_to_base64(bucket_name: str, object_key: str) -> Optional[str]
         raise
 
 
+# ============================================================================
+# LAMBDA OPERATIONS
+# ============================================================================
+
+
+@with_error_context("invoke Lambda asynchronously")
+def invoke_lambda_async(function_name: str, payload: Dict[str, Any]) -> None:
+    """
+    Invoke a Lambda function without waiting for its result.
+
+    Args:
+        function_name: Name or ARN of the function to invoke.
+        payload: JSON-serializable event for the function.
+
+    Raises:
+        LambdaError: If the invocation is rejected.
+    """
+    try:
+        lambda_client = boto3.client(AWS_SERVICE_LAMBDA, region_name=REGION)
+        lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType="Event",
+            Payload=json.dumps(payload, default=str),
+        )
+
+        logger.info(
+            "Lambda invoked asynchronously",
+            function_name=function_name,
+            job_id=payload.get("id"),
+        )
+
+    except ClientError as e:
+        error_message = e.response["Error"]["Message"]
+        logger.error(
+            "Lambda client error",
+            function_name=function_name,
+            error_code=e.response["Error"]["Code"],
+            error_message=error_message,
+        )
+        raise LambdaError(f"{ERROR_LAMBDA_INVOKE_FAILED}: {error_message}") from e
+
+
 # ============================================================================
 # AI MODEL UTILITIES
 # ============================================================================
 
 
-def _retry_with_structure(
+async def _retry_with_structure(
     model: ChatGoogleGenerativeAI, response: BaseMessage, struct: ChatGoogleGenerativeAI
 ) -> BaseMessage:
     """
@@ -672,12 +732,22 @@ def _retry_with_structure(
 
         reasoning = response.content[0].get("reasoning_content", {}).get("text", None)
         struct_message = [structure_prompt(reasoning), human_structure]
-        model_with_tools = model.with_structured_output(struct)
-
-        result = model_with_tools.invoke(struct_message)
+        model_with_tools = model.with_structured_output(struct, include_raw=True)
+
+        accounting = current_accounting()
+        if accounting is not None:
+            accounting.increment("retries")
+        start_time = time.monotonic()
+        result = await model_with_tools.ainvoke(struct_message)
+        if accounting is not None:
+            accounting.record_call(
+                model, result["raw"].usage_metadata, time.monotonic() - start_time
+            )
+        if result["parsing_error"] is not None:
+            raise result["parsing_error"]
 
         logger.debug("Structured output retry successful")
-        return result
+        return result["parsed"]
 
     except Exception as e:
         logger.error("Error during structured output retry", error=str(e))
@@ -686,21 +756,28 @@ def _retry_with_structure(
 
 def handle_asset_error(
     model: ChatGoogleGenerativeAI, struct: ChatGoogleGenerativeAI, thinking: bool = True
-) -> Callable[[Callable[P, R]], Callable[P, R]]:
+) -> Callable[[Callable[P, R]], Callable[P, Awaitable[R]]]:
     """
     Decorator to handle asset processing errors with optional retry logic.
 
+    The decorated function stays synchronous; the returned wrapper is a
+    coroutine function so the structured-output retry can be awaited.
+    Outputs that fail validation are first repaired locally, the retry only
+    runs when that repair fails.
+
     Args:
         model: Main AI model instance.
         struct: Structured output model.
-        thinking: Whether to retry with structured output on error.
+        thinking: Whether to retry with structured output when local repair fails.
 
     Returns:
         Decorator function for error handling.
     """
 
-    def decorator(func: Callable[P, R]) -> Callable[P, R]:
-        def wrapper(response: BaseMessage, *args: P.args, **kwargs: P.kwargs) -> R:
+    def decorator(func: Callable[P, R]) -> Callable[P, Awaitable[R]]:
+        async def wrapper(
+            response: BaseMessage, *args: P.args, **kwargs: P.kwargs
+        ) -> R:
             try:
                 logger.debug("Processing asset response", function=func.__name__)
                 result = func(response, *args, **kwargs)
@@ -715,12 +792,16 @@ def handle_asset_error(
                     thinking_enabled=thinking,
                 )
 
+                repaired = repair_tool_output(struct, response)
+                if repaired is not None:
+                    return repaired
+
                 if thinking:
                     logger.info(
                         "Attempting structured output retry", function=func.__name__
                     )
                     try:
-                        return _retry_with_structure(model, response, struct)
+                        return await _retry_with_structure(model, response, struct)
                     except Exception as retry_error:
                         logger.error(
                             "Structured output retry failed",
@@ -729,9 +810,11 @@ def handle_asset_error(
                         )
                         raise ThreatModelingError(
                             f"Asset processing failed after retry: {str(retry_error)}"
-                        )
+                        ) from retry_error
                 else:
-                    raise ThreatModelingError(f"Asset processing failed: {str(e)}")
+                    raise ThreatModelingError(
+                        f"Asset processing failed: {str(e)}"
+                    ) from e
 
         return wrapper
 
@@ -1,21 +1,37 @@
 """
 This module defines the state graph and orchestrates the threat modeling workflow.
+
+All nodes are coroutines, so the compiled graph is driven with ``agent.ainvoke``.
 """
 
-from typing import Any, Dict
+from typing import Any, Dict, List
 
+from accounting import current_accounting
+from call_policy import CallPolicy, remaining_seconds
+from checkpointer import create_checkpointer
+from circuit_breaker import ModelRouter
 from config import ThreatModelingConfig, config
-from constants import (WORKFLOW_NODE_ASSET, WORKFLOW_NODE_FINALIZE,
-                       WORKFLOW_NODE_FLOWS, WORKFLOW_NODE_GAP_ANALYSIS,
-                       WORKFLOW_NODE_IMAGE_TO_BASE64, WORKFLOW_NODE_THREATS,
-                       WORKFLOW_ROUTE_FULL, WORKFLOW_ROUTE_REPLAY)
+from constants import (NODE_RETRY_BACKOFF_FACTOR,
+                       NODE_RETRY_INITIAL_INTERVAL_SECONDS,
+                       NODE_RETRY_MAX_INTERVAL_SECONDS, WORKFLOW_NODE_ASSET,
+                       WORKFLOW_NODE_FINALIZE, WORKFLOW_NODE_FLOWS,
+                       WORKFLOW_NODE_GAP_ANALYSIS, WORKFLOW_NODE_SUMMARY,
+                       WORKFLOW_NODE_THREATS, WORKFLOW_NODE_THREATS_BRANCH,
+                       WORKFLOW_NODE_THREATS_MERGE)
+from exceptions import is_transient
+from file_service import ImageFileService
+from image_store import ImageStore
 from langchain_core.runnables.config import RunnableConfig
-from langgraph.graph import StateGraph
-from langgraph.types import Command
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command, RetryPolicy
 from model_service import ModelService
+from monitoring import logger
 from nodes import (AssetDefinitionService, FlowDefinitionService,
                    GapAnalysisService, ReplayService, SummaryService,
                    ThreatDefinitionService, WorkflowFinalizationService)
+from prompt_cache import PromptCache
+from rate_limiter import create_rate_limiter
+from result_cache import StageCache, create_result_cache
 from state import AgentState, ConfigSchema
 from state_tracking_service import StateService
 
@@ -24,55 +40,125 @@ class ThreatModelingOrchestrator:
     """Main orchestrator for the threat modeling workflow."""
 
     def __init__(self, config: ThreatModelingConfig):
-        self.model_service = ModelService()
+        self.prompt_cache = PromptCache(config)
+        self.file_service = ImageFileService(config)
+        self.image_store = ImageStore(config)
+        self.model_service = ModelService(
+            self.prompt_cache,
+            create_rate_limiter(config),
+            CallPolicy(config),
+            ModelRouter(config),
+        )
         self.state_service = StateService(config.agent_state_table)
+        self.result_cache = create_result_cache(config.result_cache_ttl_hours)
+        self.stage_cache = StageCache(self.result_cache)
 
         # Initialize business logic services
-        self.summary_service = SummaryService(self.model_service, config)
+        self.summary_service = SummaryService(
+            self.model_service, config, self.image_store
+        )
         self.asset_service = AssetDefinitionService(
-            self.model_service, self.state_service
+            self.model_service,
+            self.state_service,
+            self.stage_cache,
+            self.image_store,
         )
         self.flow_service = FlowDefinitionService(
-            self.model_service, self.state_service
+            self.model_service,
+            self.state_service,
+            self.stage_cache,
+            self.image_store,
         )
         self.threat_service = ThreatDefinitionService(
-            self.model_service, self.state_service, config
+            self.model_service, self.state_service, config, self.image_store
+        )
+        self.gap_service = GapAnalysisService(
+            self.model_service, self.state_service, config, self.image_store
+        )
+        self.finalization_service = WorkflowFinalizationService(
+            self.state_service,
+            self.result_cache,
+            self.stage_cache,
+            self.prompt_cache,
+            self.file_service,
         )
-        self.gap_service = GapAnalysisService(self.model_service, self.state_service)
-        self.finalization_service = WorkflowFinalizationService(self.state_service)
         self.replay_service = ReplayService(self.state_service)
 
-    def image_to_base64(
+    async def generate_summary(
         self, state: AgentState, config: RunnableConfig
     ) -> Dict[str, Any]:
-        """Convert image data and generate summary if needed."""
-        return self.summary_service.generate_summary(state, config)
+        """Generate the architecture summary if needed."""
+        return await self.summary_service.generate_summary(state, config)
 
-    def define_assets(
+    async def define_assets(
         self, state: AgentState, config: RunnableConfig
     ) -> Dict[str, Any]:
         """Define assets from architecture analysis."""
-        return self.asset_service.define_assets(state, config)
+        return await self.asset_service.define_assets(state, config)
 
-    def define_flows(self, state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+    async def define_flows(
+        self, state: AgentState, config: RunnableConfig
+    ) -> Dict[str, Any]:
         """Define data flows between assets."""
-        return self.flow_service.define_flows(state, config)
+        return await self.flow_service.define_flows(state, config)
 
-    def define_threats(self, state: AgentState, config: RunnableConfig) -> Command:
+    async def define_threats(
+        self, state: AgentState, config: RunnableConfig
+    ) -> Command:
         """Define threats and mitigations."""
-        return self.threat_service.define_threats(state, config)
+        return await self.threat_service.define_threats(state, config)
+
+    async def define_threat_branch(
+        self, state: Dict[str, Any], config: RunnableConfig
+    ) -> Dict[str, Any]:
+        """Define threats for a single fan-out branch."""
+        return await self.threat_service.define_threat_branch(state, config)
 
-    def gap_analysis(self, state: AgentState, config: RunnableConfig) -> Command:
+    async def merge_threat_branches(self, state: AgentState) -> Command:
+        """Join the threat fan-out branches."""
+        return await self.threat_service.merge_threat_branches(state)
+
+    async def gap_analysis(
+        self, state: AgentState, config: RunnableConfig
+    ) -> Command:
         """Analyze gaps in threat model."""
-        return self.gap_service.analyze_gaps(state, config)
+        return await self.gap_service.analyze_gaps(state, config)
 
-    def finalize(self, state: AgentState) -> Command:
+    async def finalize(self, state: AgentState) -> Command:
         """Finalize the workflow."""
-        return self.finalization_service.finalize_workflow(state)
+        return await self.finalization_service.finalize_workflow(state)
 
-    def route_replay(self, state: AgentState) -> str:
+    async def route_replay(self, state: AgentState) -> List[str]:
         """Route based on replay flag."""
-        return self.replay_service.route_replay(state)
+        return await self.replay_service.route_replay(state)
+
+
+def _retry_policy(node: str) -> RetryPolicy:
+    """Retry policy of a node: transient errors only, with backoff and jitter.
+
+    Nodes are not retried once the invocation's time for model calls is up.
+    """
+
+    def retry_on(error: Exception) -> bool:
+        remaining = remaining_seconds()
+        if not is_transient(error) or (remaining is not None and remaining <= 0):
+            return False
+
+        # Also counts a last failure that exhausted the node's attempts
+        accounting = current_accounting()
+        if accounting is not None:
+            accounting.increment("transient_failures", operation=node)
+        logger.warning("Transient node failure", node=node, error=str(error))
+        return True
+
+    return RetryPolicy(
+        initial_interval=NODE_RETRY_INITIAL_INTERVAL_SECONDS,
+        backoff_factor=NODE_RETRY_BACKOFF_FACTOR,
+        max_interval=NODE_RETRY_MAX_INTERVAL_SECONDS,
+        max_attempts=config.node_retry_attempts,
+        jitter=True,
+        retry_on=retry_on,
+    )
 
 
 # Initialize the orchestrator
@@ -81,26 +167,61 @@ orchestrator = ThreatModelingOrchestrator(config)
 # Create workflow graph
 workflow = StateGraph(AgentState, ConfigSchema)
 
-# Add nodes
-workflow.add_node(WORKFLOW_NODE_IMAGE_TO_BASE64, orchestrator.image_to_base64)
-workflow.add_node(WORKFLOW_NODE_ASSET, orchestrator.define_assets)
-workflow.add_node(WORKFLOW_NODE_FLOWS, orchestrator.define_flows)
-workflow.add_node(WORKFLOW_NODE_THREATS, orchestrator.define_threats)
-workflow.add_node(WORKFLOW_NODE_GAP_ANALYSIS, orchestrator.gap_analysis)
-workflow.add_node(WORKFLOW_NODE_FINALIZE, orchestrator.finalize)
+# Add nodes, retried on transient errors
+workflow.add_node(
+    WORKFLOW_NODE_SUMMARY,
+    orchestrator.generate_summary,
+    retry_policy=_retry_policy(WORKFLOW_NODE_SUMMARY),
+)
+workflow.add_node(
+    WORKFLOW_NODE_ASSET,
+    orchestrator.define_assets,
+    retry_policy=_retry_policy(WORKFLOW_NODE_ASSET),
+)
+workflow.add_node(
+    WORKFLOW_NODE_FLOWS,
+    orchestrator.define_flows,
+    retry_policy=_retry_policy(WORKFLOW_NODE_FLOWS),
+)
+workflow.add_node(
+    WORKFLOW_NODE_THREATS,
+    orchestrator.define_threats,
+    retry_policy=_retry_policy(WORKFLOW_NODE_THREATS),
+)
+workflow.add_node(
+    WORKFLOW_NODE_THREATS_BRANCH,
+    orchestrator.define_threat_branch,
+    retry_policy=_retry_policy(WORKFLOW_NODE_THREATS_BRANCH),
+)
+workflow.add_node(
+    WORKFLOW_NODE_THREATS_MERGE,
+    orchestrator.merge_threat_branches,
+    retry_policy=_retry_policy(WORKFLOW_NODE_THREATS_MERGE),
+)
+workflow.add_node(
+    WORKFLOW_NODE_GAP_ANALYSIS,
+    orchestrator.gap_analysis,
+    retry_policy=_retry_policy(WORKFLOW_NODE_GAP_ANALYSIS),
+)
+workflow.add_node(
+    WORKFLOW_NODE_FINALIZE,
+    orchestrator.finalize,
+    retry_policy=_retry_policy(WORKFLOW_NODE_FINALIZE),
+)
 
-# Set entry point and edges
-workflow.set_entry_point(WORKFLOW_NODE_IMAGE_TO_BASE64)
+# Set entry point and edges. The summary runs as a parallel branch next to the
+# asset (or replayed threat) step; since every node of a superstep completes
+# before the next one starts, it has always joined by the time finalize runs.
 workflow.add_conditional_edges(
-    WORKFLOW_NODE_IMAGE_TO_BASE64,
+    START,
     orchestrator.route_replay,
-    {
-        WORKFLOW_ROUTE_REPLAY: WORKFLOW_NODE_THREATS,
-        WORKFLOW_ROUTE_FULL: WORKFLOW_NODE_ASSET,
-    },
+    [WORKFLOW_NODE_SUMMARY, WORKFLOW_NODE_ASSET, WORKFLOW_NODE_THREATS],
 )
+workflow.add_edge(WORKFLOW_NODE_SUMMARY, END)
 workflow.add_edge(WORKFLOW_NODE_ASSET, WORKFLOW_NODE_FLOWS)
 workflow.add_edge(WORKFLOW_NODE_FLOWS, WORKFLOW_NODE_THREATS)
+workflow.add_edge(WORKFLOW_NODE_THREATS_BRANCH, WORKFLOW_NODE_THREATS_MERGE)
 
-# Compile the workflow
-agent = workflow.compile()
+# Compile the workflow, checkpointing after every step when a table is configured
+checkpointer = create_checkpointer(config.checkpoint_ttl_hours)
+agent = workflow.compile(checkpointer=checkpointer)
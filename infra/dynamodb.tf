@@ -50,4 +50,48 @@ resource "aws_dynamodb_table" "threat_designer_trail" {
     name = "id"
     type = "S"
   }
-}
\ No newline at end of file
+}
+
+resource "aws_dynamodb_table" "threat_designer_checkpoints" {
+  #checkov:skip=CKV_AWS_119
+  #checkov:skip=CKV_AWS_28
+  billing_mode                = "PAY_PER_REQUEST"
+  hash_key                    = "thread_id"
+  range_key                   = "sk"
+  name                        = "${local.prefix}-checkpoints"
+  deletion_protection_enabled = var.deletion_protection_enabled
+
+  attribute {
+    name = "thread_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "sk"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
+
+resource "aws_dynamodb_table" "threat_designer_cache" {
+  #checkov:skip=CKV_AWS_119
+  #checkov:skip=CKV_AWS_28
+  billing_mode                = "PAY_PER_REQUEST"
+  hash_key                    = "cache_key"
+  name                        = "${local.prefix}-cache"
+  deletion_protection_enabled = var.deletion_protection_enabled
+
+  attribute {
+    name = "cache_key"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
@@ -18,6 +18,8 @@ resource "aws_lambda_function" "threat_designer" {
       AGENT_STATE_TABLE   = aws_dynamodb_table.threat_designer_state.id,
       JOB_STATUS_TABLE    = aws_dynamodb_table.threat_designer_status.id,
       AGENT_TRAIL_TABLE   = aws_dynamodb_table.threat_designer_trail.id,
+      CHECKPOINT_TABLE    = aws_dynamodb_table.threat_designer_checkpoints.id,
+      RESULT_CACHE_TABLE  = aws_dynamodb_table.threat_designer_cache.id,
       REGION              = var.region,
       LOG_LEVEL           = var.log_level,
       TRACEBACK_ENABLED   = var.traceback_enabled,
@@ -59,6 +61,9 @@ resource "aws_iam_role_policy" "lambda_tm_policy" {
     state_table_arn = aws_dynamodb_table.threat_designer_state.arn,
     trail_table_arn = aws_dynamodb_table.threat_designer_trail.arn,
     status_table_arn = aws_dynamodb_table.threat_designer_status.arn,
+    checkpoint_table_arn = aws_dynamodb_table.threat_designer_checkpoints.arn,
+    cache_table_arn = aws_dynamodb_table.threat_designer_cache.arn,
+    function_arn = aws_lambda_function.threat_designer.arn,
     architecture_bucket = aws_s3_bucket.architecture_bucket.arn
   })
 }
@@ -89,6 +94,7 @@ resource "aws_lambda_function" "backend" {
       AGENT_STATE_TABLE      = aws_dynamodb_table.threat_designer_state.id,
       AGENT_TRAIL_TABLE      = aws_dynamodb_table.threat_designer_trail.id,
       JOB_STATUS_TABLE       = aws_dynamodb_table.threat_designer_status.id,
+      CHECKPOINT_TABLE       = aws_dynamodb_table.threat_designer_checkpoints.id,
       ARCHITECTURE_BUCKET    = aws_s3_bucket.architecture_bucket.id
     }
   }
@@ -122,6 +128,7 @@ resource "aws_iam_role_policy" "lambda_threat_designer_api_policy" {
   policy = templatefile("${path.module}/templates/backend_lambda_execution_role_policy.json", {
     state_table_arn = aws_dynamodb_table.threat_designer_state.arn,
     status_table_arn = aws_dynamodb_table.threat_designer_status.arn,
+    checkpoint_table_arn = aws_dynamodb_table.threat_designer_checkpoints.arn,
     architecture_bucket = aws_s3_bucket.architecture_bucket.arn,
     threat_modeling_lambda = aws_lambda_function.threat_designer.arn,
     trail_table_arn = aws_dynamodb_table.threat_designer_trail.arn